@@ -0,0 +1,96 @@
+"""
+Measures how many lines per second a Follower yields from a synthetic window of
+100k documents, comparing pruning the entry tracker once per poll with the former
+behaviour of pruning it once per line.
+
+Run from the repository root with ``python -m benchmarks.bench_follower_pruning``.
+"""
+
+import heapq
+import time
+
+import elasticsearch_follow
+from elasticsearch_follow.timestamps import to_epoch_millis
+
+NUMBER_OF_DOCUMENTS = 100000
+POLLS = 3
+
+
+class FakeElasticsearch:
+    def __init__(self, number_of_documents):
+        now = int(time.time() * 1000)
+        self.response = {
+            "_scroll_id": "scroll",
+            "hits": {
+                "hits": [
+                    {
+                        "_id": "id_{}".format(i),
+                        "_source": {"@timestamp": now, "msg": "line {}".format(i)},
+                        "sort": [now - number_of_documents + i, i],
+                    }
+                    for i in range(number_of_documents)
+                ]
+            },
+        }
+
+    def search(self, **kwargs):
+        return self.response
+
+    def scroll(self, **kwargs):
+        return {"_scroll_id": "scroll", "hits": {"hits": []}}
+
+    def clear_scroll(self, **kwargs):
+        pass
+
+
+class PerLinePruningEntryTracker(elasticsearch_follow.EntryTracker):
+    def prune_before(self, timestamp):
+        timestamp = to_epoch_millis(timestamp)
+        while len(self.entries_by_timestamp) > 0:
+            oldest_entry = heapq.heappop(self.entries_by_timestamp)
+            if oldest_entry[0] <= timestamp:
+                self.added_entries.remove(oldest_entry[1])
+            else:
+                heapq.heappush(self.entries_by_timestamp, oldest_entry)
+                return
+
+
+class PerLinePruningFollower(elasticsearch_follow.Follower):
+    def new_lines(self):
+        for line in super().new_lines():
+            self.elasticsearch_follow.prune_before(
+                int(time.time() * 1000) - self.time_delta * 1000
+            )
+            yield line
+
+
+def run(follower_class, entry_tracker):
+    es_follow = elasticsearch_follow.ElasticsearchFollow(
+        FakeElasticsearch(NUMBER_OF_DOCUMENTS), entry_tracker=entry_tracker
+    )
+    follower = follower_class(es_follow, "benchmark", time_delta=3600)
+
+    number_of_lines = 0
+    start = time.perf_counter()
+    for _ in range(POLLS):
+        for _ in follower.generator():
+            number_of_lines += 1
+    elapsed = time.perf_counter() - start
+    return (POLLS * NUMBER_OF_DOCUMENTS) / elapsed, number_of_lines
+
+
+def main():
+    for name, follower_class, entry_tracker in [
+        ("prune per line", PerLinePruningFollower, PerLinePruningEntryTracker()),
+        ("prune per poll", elasticsearch_follow.Follower, None),
+    ]:
+        lines_per_second, number_of_lines = run(follower_class, entry_tracker)
+        print(
+            "{:<16} {:>12,.0f} lines/s ({} lines yielded)".format(
+                name, lines_per_second, number_of_lines
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures how many lines per second the FormattingProcessor formats, comparing the
+compiled renderer with formatting each line through ``string.Formatter``.
+
+Run from the repository root with ``python -m benchmarks.bench_formatting_processor``.
+"""
+
+import string
+import time
+
+from elasticsearch_follow import FormattingProcessor
+
+NUMBER_OF_LINES = 200000
+FORMAT_STRINGS = [
+    "{@timestamp} {message}",
+    "{@timestamp} {level:>5} [{kubernetes[pod][name]}] {message} {unknown}",
+]
+LINE = {
+    "@timestamp": "2019-01-01T10:01:00.000Z",
+    "level": "INFO",
+    "message": "Some log line with a few more words in it",
+    "kubernetes": {"pod": {"name": "some-pod-5d8f7c9b4-x2x7q"}},
+}
+
+
+class DefaultValueFormatter(string.Formatter):
+    def get_field(self, field_name, args, kwargs):
+        try:
+            val = super(DefaultValueFormatter, self).get_field(field_name, args, kwargs)
+        except (KeyError, AttributeError):
+            val = "", field_name
+        return val
+
+
+class StringFormatterProcessor:
+    def __init__(self, format_string):
+        self.fmt = DefaultValueFormatter()
+        self.format_string = format_string
+
+    def process_line(self, line):
+        if self.format_string:
+            return self.fmt.format(self.format_string, **line)
+
+
+def run(processor):
+    start = time.perf_counter()
+    for _ in range(NUMBER_OF_LINES):
+        processor.process_line(LINE)
+    return NUMBER_OF_LINES / (time.perf_counter() - start)
+
+
+def main():
+    for format_string in FORMAT_STRINGS:
+        print(format_string)
+        for name, processor_class in [
+            ("string.Formatter", StringFormatterProcessor),
+            ("compiled", FormattingProcessor),
+        ]:
+            processor = processor_class(format_string)
+            print("  {:<18} {:>12,.0f} lines/s".format(name, run(processor)))
+
+
+if __name__ == "__main__":
+    main()
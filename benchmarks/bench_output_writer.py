@@ -0,0 +1,58 @@
+"""
+Measures how many lines per second the CLI writes to a file, comparing one
+``print`` per line with the batches of the OutputWriter.
+
+Run from the repository root with ``python -m benchmarks.bench_output_writer``.
+"""
+
+import os
+import tempfile
+import time
+
+from elasticsearch_follow.output_writer import OutputWriter
+
+NUMBER_OF_LINES = 500000
+LINE = "2019-01-01T10:01:00.000Z Some log line with a few more words in it"
+
+
+def print_per_line(stream):
+    for _ in range(NUMBER_OF_LINES):
+        print(LINE, file=stream)
+    stream.flush()
+
+
+def output_writer(stream):
+    with OutputWriter(stream=stream) as output:
+        for _ in range(NUMBER_OF_LINES):
+            output.write_line(LINE)
+
+
+def run(write_lines, buffering):
+    file_descriptor, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(file_descriptor, "w", buffering=buffering) as stream:
+            start = time.perf_counter()
+            write_lines(stream)
+            elapsed = time.perf_counter() - start
+    finally:
+        os.unlink(path)
+    return NUMBER_OF_LINES / elapsed
+
+
+def main():
+    # Line buffering is what stdout uses on a terminal, block buffering is used
+    # when it is piped or redirected to a file.
+    for buffering_name, buffering in [("line buffered", 1), ("block buffered", -1)]:
+        for name, write_lines in [
+            ("print per line", print_per_line),
+            ("output writer", output_writer),
+        ]:
+            print(
+                "{:<16} {:<16} {:>12,.0f} lines/s".format(
+                    buffering_name, name, run(write_lines, buffering)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
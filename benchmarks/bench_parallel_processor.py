@@ -0,0 +1,79 @@
+"""
+Measures how many lines per second a CPU-heavy processor handles when run inline
+by the Follower and when run by a ParallelProcessor on worker processes.
+
+Run from the repository root with ``python -m benchmarks.bench_parallel_processor``.
+"""
+
+import json
+import os
+import re
+import time
+
+import elasticsearch_follow
+
+NUMBER_OF_LINES = 100000
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+KEY_VALUE = re.compile(r"(\w+)=(\S+)")
+
+
+class MaskingProcessor:
+    fields = None
+
+    def process_line(self, line):
+        message = EMAIL.sub("<masked>", line["message"])
+        return json.dumps(
+            {
+                "@timestamp": line["@timestamp"],
+                "message": message,
+                "kv": dict(KEY_VALUE.findall(message)),
+            },
+            sort_keys=True,
+        )
+
+
+class FakeElasticsearchFollow:
+    def __init__(self, number_of_lines):
+        self.lines = [
+            {
+                "@timestamp": "2019-01-01T10:01:00.000Z",
+                "message": "user=user{0} mail=user{0}@example.com took={0}ms "
+                "status=ok path=/api/v1/items/{0}".format(i),
+            }
+            for i in range(number_of_lines)
+        ]
+
+    def prune_before(self, timestamp):
+        pass
+
+    def get_new_lines(self, index, timestamp):
+        return iter(self.lines)
+
+
+def run(processor):
+    follower = elasticsearch_follow.Follower(
+        FakeElasticsearchFollow(NUMBER_OF_LINES), "benchmark", processor=processor
+    )
+    start = time.perf_counter()
+    number_of_lines = sum(1 for _ in follower.generator())
+    elapsed = time.perf_counter() - start
+    assert number_of_lines == NUMBER_OF_LINES
+    return NUMBER_OF_LINES / elapsed
+
+
+def main():
+    print("{:<22} {:>12,.0f} lines/s".format("inline", run(MaskingProcessor())))
+    for workers in sorted({2, 4, os.cpu_count() or 1}):
+        with elasticsearch_follow.ParallelProcessor(
+            MaskingProcessor(), workers=workers
+        ) as processor:
+            lines_per_second = run(processor)
+        print(
+            "{:<22} {:>12,.0f} lines/s".format(
+                "{} worker processes".format(workers), lines_per_second
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
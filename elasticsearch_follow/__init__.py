@@ -1,17 +1,47 @@
 name = "elasticsearch_follow"
 
 from ._version import version as __version__
+from .async_elasticsearch_fetch import AsyncElasticsearchFetch
+from .async_elasticsearch_follow import AsyncElasticsearchFollow
+from .async_follower import AsyncFollower
+from .checkpoint import Checkpoint
 from .default_processor import DefaultProcessor
 from .elasticsearch_fetch import ElasticsearchFetch
 from .elasticsearch_follow import ElasticsearchFollow
 from .follower import Follower
+from .entry_tracker import CompactEntryTracker, EntryTracker
+from .export import CsvWriter, Exporter, NdjsonWriter, ParquetWriter
 from .formatting_processor import FormattingProcessor
+from .hit_cache import HitCache
+from .multi_follower import MultiFollower
+from .page_size import AdaptivePageSize, PageSize
+from .parallel_processor import ParallelProcessor
+from .poll_scheduler import AdaptivePollScheduler, PollScheduler
+from .rate_meter import RateMeter
 
 __all__ = [
     "__version__",
     "ElasticsearchFollow",
     "ElasticsearchFetch",
     "Follower",
+    "MultiFollower",
+    "Checkpoint",
+    "EntryTracker",
+    "CompactEntryTracker",
     "FormattingProcessor",
+    "Exporter",
+    "NdjsonWriter",
+    "CsvWriter",
+    "ParquetWriter",
     "DefaultProcessor",
+    "ParallelProcessor",
+    "PollScheduler",
+    "AdaptivePollScheduler",
+    "RateMeter",
+    "PageSize",
+    "AdaptivePageSize",
+    "HitCache",
+    "AsyncElasticsearchFollow",
+    "AsyncElasticsearchFetch",
+    "AsyncFollower",
 ]
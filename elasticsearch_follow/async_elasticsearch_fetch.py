@@ -0,0 +1,132 @@
+import logging
+
+from . import page_queue
+from .elasticsearch_fetch import BaseElasticsearchFetch, FILTER_PATH, page_hits
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncElasticsearchFetch(BaseElasticsearchFetch):
+    """
+    Counterpart of ElasticsearchFetch for ``AsyncElasticsearch``. Only searching and
+    paging through all hits are available asynchronously.
+    """
+
+    async def search(self, index, query_string=None, from_time=None, to_time=None):
+        """
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :return: The first page of results of the query.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        search_result = await self._execute_search(index, query)
+        self._remember_pit_query(search_result, query)
+        return search_result
+
+    async def search_hits(self, index, query_string=None, from_time=None, to_time=None):
+        """
+        Searches and yields all resulting documents.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :return: Yields the resulting documents one by one.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        search_result = await self._execute_search(index, query)
+        async for hit in self.get_hits(search_result, query):
+            yield hit
+
+    async def _execute_search(self, index, query):
+        if not self.use_pit:
+            return await self.es.search(
+                index=index, scroll="2m", body=query, filter_path=FILTER_PATH
+            )
+
+        pit = await self.es.open_point_in_time(
+            index=index, keep_alive=self.pit_keep_alive
+        )
+        self._add_pit_to_query(query, pit["id"])
+        return await self.es.search(body=query, filter_path=FILTER_PATH)
+
+    async def get_hits(self, search_result, query=None):
+        """
+        Fetches all hits from a search_result. Iterates through all pages via the scroll_id
+        or, for searches within a point in time, via ``search_after``.
+
+        :param search_result: The result of an AsyncElasticsearch.search-request.
+        :param query: The query used for the search. Only needed for searches within
+            a point in time, where it is reused for fetching the following pages.
+        :return: Yields the resulting documents one by one.
+        """
+        async for hits in self.get_hit_pages(search_result, query):
+            for hit in hits:
+                yield hit
+
+    async def get_hit_pages(self, search_result, query=None):
+        """
+        Like ``get_hits``, but yields the documents page by page.
+
+        :param search_result: The result of an AsyncElasticsearch.search-request.
+        :param query: The query used for the search. Only needed for searches within
+            a point in time, where it is reused for fetching the following pages.
+        :return: Yields a non-empty list of documents per page.
+        """
+        if "pit_id" in search_result:
+            query = self._pit_query(search_result, query)
+            if query is None:
+                await self.es.close_point_in_time(body={"id": search_result["pit_id"]})
+                raise ValueError("Paging through a point in time requires the query.")
+            pages = self._get_pit_pages(search_result, query)
+        else:
+            pages = self._get_scroll_pages(search_result)
+
+        if self.prefetch_pages > 0:
+            pages = page_queue.prefetch_async(pages, max_pending=self.prefetch_pages)
+        async for hits in pages:
+            yield hits
+
+    async def _get_scroll_pages(self, search_result):
+        res = search_result
+        scroll_id = res["_scroll_id"]
+
+        try:
+            while True:
+                hits = page_hits(res)
+                logger.debug("Got {} hits".format(len(hits)))
+                if not hits:
+                    break
+                self.page_size.record_page(res, hits)
+                yield hits
+
+                res = await self.es.scroll(
+                    scroll_id=scroll_id, scroll="2m", filter_path=FILTER_PATH
+                )
+                scroll_id = res["_scroll_id"]
+        finally:
+            logger.debug("No more hits. Clearing scroll.")
+            await self.es.clear_scroll(scroll_id=scroll_id)
+
+    async def _get_pit_pages(self, search_result, query):
+        res = search_result
+        try:
+            while True:
+                query["pit"]["id"] = res["pit_id"]
+                hits = page_hits(res)
+                logger.debug("Got {} hits from point in time".format(len(hits)))
+                self.page_size.record_page(res, hits)
+
+                if hits:
+                    yield hits
+
+                if len(hits) < query["size"]:
+                    break
+                query["search_after"] = hits[-1]["sort"]
+                query["size"] = self.page_size.next_size()
+                res = await self.es.search(body=query, filter_path=FILTER_PATH)
+        finally:
+            logger.debug("No more hits. Closing point in time.")
+            await self.es.close_point_in_time(body={"id": query["pit"]["id"]})
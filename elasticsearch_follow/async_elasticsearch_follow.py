@@ -0,0 +1,158 @@
+import logging
+
+from .async_elasticsearch_fetch import AsyncElasticsearchFetch
+from .elasticsearch_fetch import FILTER_PATH, page_hits
+from .elasticsearch_follow import DEFAULT_CURSOR_OVERLAP, BaseElasticsearchFollow
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncElasticsearchFollow(BaseElasticsearchFollow):
+    def __init__(
+        self,
+        elasticsearch,
+        timestamp_field="@timestamp",
+        query_string=None,
+        use_cursor=False,
+        cursor_overlap=DEFAULT_CURSOR_OVERLAP,
+        source_fields=None,
+        entry_tracker=None,
+        page_size=None,
+    ):
+        """
+        Counterpart of ElasticsearchFollow for ``AsyncElasticsearch``. Deduplication
+        and cursor handling are shared with ElasticsearchFollow.
+
+        :param elasticsearch: AsyncElasticsearch instance from the ``elasticsearch``-library.
+        :param timestamp_field: Denotes which field in the elasticsearch-index is used
+            as the timestamp.
+        :param query_string: The query used to fetch data from Elasticsearch.
+        :param use_cursor: If True, only fetch entries after the newest entry seen so far.
+        :param cursor_overlap: Number of seconds before the cursor which are fetched
+            again to pick up entries which arrived late. Only used with ``use_cursor``.
+            Defaults to 5 seconds.
+        :param source_fields: The fields of ``_source`` to fetch. All fields are fetched
+            if None.
+        :param entry_tracker: Keeps track of the entries already returned. Defaults to
+            an EntryTracker.
+        :param page_size: Number of hits per page, or a PageSize deciding it.
+        """
+        super().__init__(
+            elasticsearch,
+            timestamp_field=timestamp_field,
+            query_string=query_string,
+            use_cursor=use_cursor,
+            cursor_overlap=cursor_overlap,
+            source_fields=source_fields,
+            entry_tracker=entry_tracker,
+            page_size=page_size,
+        )
+        self.es_fetch = AsyncElasticsearchFetch(
+            elasticsearch=elasticsearch,
+            timestamp_field=timestamp_field,
+            page_size=self.page_size,
+        )
+
+    async def get_entries_since(self, index, timestamp):
+        """
+        Yield all entries since ``timestamp`` until now from ``index``.
+
+        :param index: Elasticsearch index from which new entries should
+            be retrieved. Wildcards are supported.
+        :param timestamp: Timestamp from which to start fetching lines.
+        :return: Yields entries until no entries are left.
+        """
+        async for entries in self.get_entry_pages_since(index, timestamp):
+            for entry in entries:
+                yield entry
+
+    async def get_entry_pages_since(self, index, timestamp):
+        """
+        Like ``get_entries_since``, but yields the entries page by page.
+
+        :param index: Elasticsearch index from which new entries should
+            be retrieved. Wildcards are supported.
+        :param timestamp: Timestamp from which to start fetching lines.
+        :return: Yields a non-empty list of entries per page.
+        """
+        query_since = self._query_since(timestamp)
+
+        if self.use_cursor and self.cursor is not None:
+            pages = self._get_entry_pages_after_cursor(index, query_since)
+        else:
+            res = await self.es.search(
+                index=index, scroll="2m", body=query_since, filter_path=FILTER_PATH
+            )
+            pages = self.es_fetch.get_hit_pages(res)
+
+        async for hits in pages:
+            self._update_cursor_from(hits)
+            yield hits
+
+    async def _get_entry_pages_after_cursor(self, index, query):
+        """
+        Pages through all entries from the cursor on via ``search_after``.
+        """
+        self._restrict_to_cursor(query)
+        boundary = {"timestamp": None, "ids": set()}
+        while True:
+            res = await self.es.search(index=index, body=query, filter_path=FILTER_PATH)
+            hits = page_hits(res)
+            self.page_size.record_page(res, hits)
+            new_hits = self._skip_boundary(hits, boundary)
+            if new_hits:
+                yield new_hits
+
+            if len(hits) < query["size"]:
+                return
+            self._continue_after_page(query, hits, boundary)
+
+    async def get_new_lines(self, index, timestamp):
+        """
+        Retrieves new lines starting with timestamp until now.
+        Only yield entries which have not yet been fetched from elasticsearch.
+
+        :param index: Elasticsearch index from which new entries should
+            be retrieved. Wildcards are supported.
+        :param timestamp: Timestamp from which to start fetching lines.
+        :return: Yields the new lines until the list is empty.
+        """
+        async for new_lines in self.get_new_line_pages(index, timestamp):
+            for new_line in new_lines:
+                yield new_line
+
+    async def get_new_line_pages(self, index, timestamp):
+        """
+        Like ``get_new_lines``, but yields the new lines page by page, so they can be
+        processed in batches.
+
+        :param index: Elasticsearch index from which new entries should
+            be retrieved. Wildcards are supported.
+        :param timestamp: Timestamp from which to start fetching lines.
+        :return: Yields a non-empty list of new lines per page.
+        """
+        async for entries in self.get_entry_pages_since(index, timestamp):
+            new_lines = self._track_new_entries(entries)
+            if new_lines:
+                yield new_lines
+
+    async def get_last_lines(self, index, number_of_lines):
+        """
+        Retrieves the newest ``number_of_lines`` lines with a single descending,
+        size-limited query, see ``ElasticsearchFollow.get_last_lines``.
+
+        :param index: Elasticsearch index from which the lines should be retrieved.
+            Wildcards are supported.
+        :param number_of_lines: The number of lines to retrieve.
+        :return: Yields the lines ordered from oldest to newest.
+        """
+        if number_of_lines <= 0:
+            return
+
+        res = await self.es.search(
+            index=index,
+            body=self._query_last(number_of_lines),
+            filter_path=FILTER_PATH,
+        )
+        for new_line in self._track_last_entries(page_hits(res)):
+            yield new_line
@@ -0,0 +1,56 @@
+from .follower import BaseFollower
+from .processing import batched_async
+
+
+class AsyncFollower(BaseFollower):
+    """
+    Counterpart of Follower for AsyncElasticsearchFollow. Many instances can follow
+    different indices concurrently within one event loop.
+    """
+
+    async def generator(self):
+        """
+        Creates an asynchronous generator which will yield new lines until the most
+        recent query has no more lines.
+        :return: An asynchronous generator.
+        """
+        self.lines_in_poll = 0
+        async for lines in batched_async(self.new_lines(), self.batch_size):
+            for processed_line in self._process_lines(self._count_lines(lines)):
+                yield processed_line
+
+        self.scheduler.record_poll(self.lines_in_poll)
+
+    async def new_lines(self):
+        """
+        Yields the new, unprocessed lines of one poll. Entries which left the time
+        window are pruned once before polling.
+        :return: An asynchronous generator.
+        """
+        timestamp = self._poll_start()
+        async for line in self.elasticsearch_follow.get_new_lines(
+            self.index, timestamp
+        ):
+            yield line
+
+    async def last_lines(self, number_of_lines):
+        """
+        Yields the newest ``number_of_lines`` lines, regardless of ``time_delta``.
+        Subsequent generators only yield lines newer than these.
+        :param number_of_lines: The number of lines to yield.
+        :return: An asynchronous generator.
+        """
+        lines = [
+            line
+            async for line in self.elasticsearch_follow.get_last_lines(
+                self.index, number_of_lines
+            )
+        ]
+        for processed_line in self._process_lines(lines):
+            yield processed_line
+
+    async def wait(self):
+        """
+        Waits until the next generator should be created, as decided by the scheduler.
+        """
+        await self.scheduler.wait_async()
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 2
+
+
+class Checkpoint:
+    def __init__(self, path, interval=10):
+        """
+        Persists the state of an ElasticsearchFollow to a local file, so following
+        can resume after a restart without emitting lines twice. The index and the
+        query string are saved along with it, a checkpoint of another index or query
+        is refused.
+
+        :param path: The file the checkpoint is written to.
+        :param interval: Minimum number of seconds between two writes of the checkpoint.
+        """
+        self.path = path
+        self.interval = interval
+        self.last_save = None
+
+    def save(self, elasticsearch_follow, index=None, force=False):
+        """
+        Writes the state of ``elasticsearch_follow`` if at least ``interval`` seconds
+        passed since the last write. The file is replaced atomically.
+
+        :param elasticsearch_follow: The ElasticsearchFollow whose state should be saved.
+        :param index: The index ``elasticsearch_follow`` follows.
+        :param force: Write the checkpoint regardless of the interval.
+        :return: True if the checkpoint was written.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self.last_save is not None
+            and now - self.last_save < self.interval
+        ):
+            return False
+
+        checkpoint = elasticsearch_follow.get_checkpoint()
+        checkpoint["arguments"] = _arguments(elasticsearch_follow, index)
+        checkpoint["version"] = CHECKPOINT_VERSION
+
+        write_json_atomically(self.path, checkpoint)
+        self.last_save = now
+        logger.debug(
+            "Saved checkpoint with {} entries to '{}'".format(
+                len(checkpoint["entries"]), self.path
+            )
+        )
+        return True
+
+    def restore(self, elasticsearch_follow, index=None):
+        """
+        Restores the state of ``elasticsearch_follow`` from the checkpoint file.
+
+        :param elasticsearch_follow: The ElasticsearchFollow whose state should be restored.
+        :param index: The index ``elasticsearch_follow`` follows.
+        :return: True if a checkpoint was found and restored.
+        :raises ValueError: If the checkpoint was saved for another index or query.
+        """
+        try:
+            with open(self.path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except FileNotFoundError:
+            logger.debug("No checkpoint found at '{}'".format(self.path))
+            return False
+
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            logger.warning(
+                "Ignoring checkpoint '{}' with unknown version '{}'".format(
+                    self.path, checkpoint.get("version")
+                )
+            )
+            return False
+
+        if checkpoint.get("arguments") != _arguments(elasticsearch_follow, index):
+            raise ValueError(
+                "Checkpoint '{}' belongs to another index or query, "
+                "remove it to start again.".format(self.path)
+            )
+
+        elasticsearch_follow.restore_checkpoint(checkpoint)
+        logger.debug(
+            "Restored checkpoint with {} entries from '{}'".format(
+                len(checkpoint["entries"]), self.path
+            )
+        )
+        return True
+
+
+def _arguments(elasticsearch_follow, index):
+    return {"index": index, "query_string": elasticsearch_follow.query_string}
+
+
+def write_json_atomically(path, data):
+    """
+    Writes ``data`` as JSON to a temporary file next to ``path`` and replaces ``path``
+    with it, so ``path`` never holds a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix=".checkpoint-"
+    )
+    try:
+        with os.fdopen(file_descriptor, "w") as json_file:
+            json.dump(data, json_file, separators=(",", ":"))
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
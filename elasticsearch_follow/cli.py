@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-import time
 from urllib.parse import urlparse
 import logging
 
@@ -8,10 +7,21 @@ import certifi
 import click
 import elasticsearch
 
+from .checkpoint import Checkpoint
 from .elasticsearch_fetch import ElasticsearchFetch
-from .elasticsearch_follow import ElasticsearchFollow
+from .elasticsearch_follow import DEFAULT_CURSOR_OVERLAP, ElasticsearchFollow
+from .entry_tracker import CompactEntryTracker
 from .follower import Follower
+from .export import CsvWriter, Exporter, NdjsonWriter, ParquetWriter
 from .formatting_processor import FormattingProcessor
+from .histogram import render_histogram
+from .hit_cache import HitCache
+from .output_writer import DEFAULT_BUFFER_SIZE, OutputWriter
+from .page_size import DEFAULT_PAGE_SIZE, AdaptivePageSize
+from .parallel_processor import ParallelProcessor
+from .poll_scheduler import AdaptivePollScheduler, PollScheduler
+from .processing import process_batches
+from .rate_meter import RateMeter
 
 CONTEXT_SETTINGS = dict(
     help_option_names=["-h", "--help"], auto_envvar_prefix="ES_TAIL"
@@ -98,6 +108,19 @@ def cli(config, username, password, cookie, connect, verbose):
         configure_logger()
 
 
+def create_processor(format_string, workers):
+    processor = FormattingProcessor(format_string=format_string)
+    if workers > 0:
+        return ParallelProcessor(processor, workers=workers)
+    return processor
+
+
+def create_page_size(page_size, adaptive_page_size):
+    if adaptive_page_size:
+        return AdaptivePageSize(size=page_size)
+    return page_size
+
+
 def configure_logger():
     logging.basicConfig(level=logging.INFO)
     for handler in logging.getLogger().handlers:
@@ -110,6 +133,34 @@ def configure_logger():
     logging.getLogger().addHandler(console_handler)
 
 
+def print_counts(es, index, query, from_time, to_time, interval):
+    es_fetch = ElasticsearchFetch(elasticsearch=es)
+    with OutputWriter() as output:
+        if not interval:
+            output.write_line(
+                es_fetch.count(
+                    index=index,
+                    query_string=query,
+                    from_time=from_time,
+                    to_time=to_time,
+                )
+            )
+            return
+
+        buckets = es_fetch.histogram(
+            index=index,
+            interval=interval,
+            query_string=query,
+            from_time=from_time,
+            to_time=to_time,
+        )
+        for line in render_histogram(buckets):
+            output.write_line(line)
+        output.write_line(
+            "Total: {}".format(sum(bucket["doc_count"] for bucket in buckets))
+        )
+
+
 @cli.command()
 @click.option(
     "--format-string",
@@ -154,29 +205,330 @@ def configure_logger():
     type=str,
     help="From which point in time to start the query. Takes an elasticsearch time format. (e.g. now, now-1h). ",
 )
+@click.option(
+    "--count",
+    "count_only",
+    is_flag=True,
+    default=False,
+    help="Only print the number of matching lines, without fetching them.",
+)
+@click.option(
+    "--histogram",
+    metavar="<INTERVAL>",
+    help="Only print the number of matching lines per <INTERVAL> (e.g. 5m, 1h, day) "
+    "as a histogram, without fetching them. Requires Elasticsearch 7.2 or newer.",
+)
+@click.option(
+    "--prefetch",
+    default=0,
+    type=int,
+    metavar="<NUM>",
+    help="Fetch up to <NUM> pages ahead in the background while lines are printed.",
+)
+@click.option(
+    "--slices",
+    default=1,
+    type=int,
+    show_default=True,
+    metavar="<NUM>",
+    help="Fetch <NUM> slices of the results concurrently, one per shard works best. "
+    "Only used without context lines.",
+)
+@click.option(
+    "--unordered",
+    is_flag=True,
+    default=False,
+    help="Print the lines of several slices as they arrive instead of ordered by time.",
+)
+@click.option(
+    "--partitions",
+    default=1,
+    type=int,
+    show_default=True,
+    metavar="<NUM>",
+    help="Split the time range into <NUM> parts of about the same number of lines and "
+    "fetch them concurrently, keeping the lines ordered by time. "
+    "Only used without context lines, takes precedence over --slices.",
+)
+@click.option(
+    "--merge-context",
+    is_flag=True,
+    default=False,
+    help="Merge matches whose context overlaps into one block, like grep does.",
+)
+@click.option(
+    "--pit",
+    is_flag=True,
+    default=False,
+    help="Page through the results with a point in time instead of a scroll.",
+)
+@click.option(
+    "--output-buffer",
+    default=DEFAULT_BUFFER_SIZE,
+    type=int,
+    show_default=True,
+    metavar="<CHARACTERS>",
+    help="Collect <CHARACTERS> characters of output before writing them. "
+    "A terminal is still updated after every poll, 0 writes every line immediately.",
+)
+@click.option(
+    "--workers",
+    default=0,
+    type=int,
+    metavar="<NUM>",
+    help="Format lines on <NUM> worker processes while fetching continues.",
+)
+@click.option(
+    "--page-size",
+    default=DEFAULT_PAGE_SIZE,
+    type=int,
+    show_default=True,
+    metavar="<NUM>",
+    help="Fetch <NUM> lines per request.",
+)
+@click.option(
+    "--adaptive-page-size",
+    is_flag=True,
+    default=False,
+    help="Adapt the page size to the size and latency of the responses, starting at --page-size.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Keep the lines of time ranges which ended more than an hour ago in this "
+    "directory and read them from there when fetched again. "
+    "Not used with context lines, --slices or --partitions.",
+)
+@click.option(
+    "--cache-size",
+    default=1024,
+    type=int,
+    show_default=True,
+    metavar="<MEGABYTES>",
+    help="Remove the least recently used lines from the cache beyond <MEGABYTES> megabytes.",
+)
 @pass_config
 def fetch(
-    config, format_string, index, num_after, num_before, query, from_time, to_time
+    config,
+    format_string,
+    index,
+    num_after,
+    num_before,
+    query,
+    from_time,
+    to_time,
+    count_only,
+    histogram,
+    prefetch,
+    slices,
+    unordered,
+    partitions,
+    merge_context,
+    pit,
+    output_buffer,
+    workers,
+    page_size,
+    adaptive_page_size,
+    cache_dir,
+    cache_size,
 ):
     es = initialize_es_instance(
         config.connect, config.username, config.password, config.cookie
     )
-    es_fetch = ElasticsearchFetch(elasticsearch=es)
-    processor = FormattingProcessor(format_string=format_string)
+    if count_only or histogram:
+        print_counts(es, index, query, from_time, to_time, histogram)
+        return
+
+    processor = create_processor(format_string, workers)
+    es_fetch = ElasticsearchFetch(
+        elasticsearch=es,
+        use_pit=pit,
+        source_fields=processor.fields,
+        page_size=create_page_size(page_size, adaptive_page_size),
+        prefetch_pages=prefetch,
+        cache=(
+            HitCache(cache_dir, max_bytes=cache_size * 1024 * 1024)
+            if cache_dir
+            else None
+        ),
+    )
 
-    entries = es_fetch.search_surrounding(
-        index=index,
-        query_string=query,
-        num_before=num_before,
-        num_after=num_after,
-        from_time=from_time,
-        to_time=to_time,
+    if num_before > 0 or num_after > 0:
+        entries = es_fetch.search_surrounding(
+            index=index,
+            query_string=query,
+            num_before=num_before,
+            num_after=num_after,
+            from_time=from_time,
+            to_time=to_time,
+            merge_context=merge_context,
+        )
+    elif partitions > 1:
+        entries = (
+            [hit["_source"] for hit in hits]
+            for hits in es_fetch.search_partitioned_hit_pages(
+                index=index,
+                query_string=query,
+                from_time=from_time,
+                to_time=to_time,
+                partitions=partitions,
+            )
+        )
+    elif slices > 1:
+        entries = (
+            [hit["_source"] for hit in hits]
+            for hits in es_fetch.search_sliced_hit_pages(
+                index=index,
+                query_string=query,
+                from_time=from_time,
+                to_time=to_time,
+                slices=slices,
+                ordered=not unordered,
+            )
+        )
+    else:
+        entries = (
+            [hit["_source"] for hit in hits]
+            for hits in es_fetch.search_hit_pages(
+                index=index, query_string=query, from_time=from_time, to_time=to_time
+            )
+        )
+
+    try:
+        with OutputWriter(buffer_size=output_buffer) as output:
+            for lines in process_batches(processor, entries):
+                if num_before > 0 or num_after > 0:
+                    output.write_line("#########")
+                for line in lines:
+                    output.write_line(line)
+    finally:
+        if workers > 0:
+            processor.close()
+
+
+@cli.command()
+@click.option(
+    "--index",
+    "-i",
+    help="Determines which indexes to search. Using wildcards is possible.",
+)
+@click.option(
+    "--query", "-q", type=str, help="The query in the Elasticsearch query language."
+)
+@click.option(
+    "--from-time",
+    "-F",
+    type=str,
+    help="From which point in time to start the query. Takes an elasticsearch time format. (e.g. now, now-1h).",
+)
+@click.option(
+    "--to-time",
+    "-T",
+    type=str,
+    help="Up to which point in time to query. Takes an elasticsearch time format. (e.g. now, now-1h).",
+)
+@click.option(
+    "--output",
+    "-O",
+    "output_path",
+    required=True,
+    type=click.Path(dir_okay=False),
+    help="The file to export to.",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["ndjson", "csv", "parquet"]),
+    default="ndjson",
+    show_default=True,
+    help="Write one JSON document per line, a CSV row per document or Parquet row groups.",
+)
+@click.option(
+    "--compression",
+    type=click.Choice(["gzip", "zstd"]),
+    help="Compress NDJSON output.",
+)
+@click.option(
+    "--columns",
+    metavar="<FIELDS>",
+    help="Comma separated fields to write as CSV columns. "
+    "Defaults to the fields of the first batch.",
+)
+@click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False),
+    help="Save the progress to this file, so an interrupted export resumes from it. "
+    "Defaults to the output file with the suffix .state. The state of an export "
+    "with other arguments is refused. Parquet exports cannot be resumed.",
+)
+@click.option(
+    "--batch-size",
+    default=10000,
+    type=int,
+    show_default=True,
+    metavar="<NUM>",
+    help="Hold at most <NUM> documents in memory and write them at once.",
+)
+@click.option(
+    "--pit",
+    is_flag=True,
+    default=False,
+    help="Page through the results with a point in time instead of a scroll.",
+)
+@click.option(
+    "--page-size",
+    default=DEFAULT_PAGE_SIZE,
+    type=int,
+    show_default=True,
+    metavar="<NUM>",
+    help="Fetch <NUM> documents per request.",
+)
+@click.option(
+    "--prefetch",
+    default=0,
+    type=int,
+    metavar="<NUM>",
+    help="Fetch up to <NUM> pages ahead in the background while documents are written.",
+)
+@pass_config
+def export(
+    config,
+    index,
+    query,
+    from_time,
+    to_time,
+    output_path,
+    output_format,
+    compression,
+    columns,
+    state_file,
+    batch_size,
+    pit,
+    page_size,
+    prefetch,
+):
+    es = initialize_es_instance(
+        config.connect, config.username, config.password, config.cookie
+    )
+    if output_format == "csv":
+        writer = CsvWriter(output_path, columns=columns.split(",") if columns else None)
+    elif output_format == "parquet":
+        writer = ParquetWriter(output_path)
+    else:
+        writer = NdjsonWriter(output_path, compression=compression)
+
+    es_fetch = ElasticsearchFetch(
+        elasticsearch=es, use_pit=pit, page_size=page_size, prefetch_pages=prefetch
+    )
+    exporter = Exporter(
+        es_fetch,
+        writer,
+        state_path=state_file if state_file else output_path + ".state",
+        batch_size=batch_size,
+    )
+    written = exporter.export(
+        index=index, query_string=query, from_time=from_time, to_time=to_time
     )
-    for entry in entries:
-        if num_before > 0 or num_after > 0:
-            print("#########")
-        for line in entry:
-            print(processor.process_line(line))
+    logger.info("Exported {} documents to '{}'.".format(written, output_path))
 
 
 @cli.command()
@@ -214,27 +566,243 @@ def fetch(
     metavar="<SECONDS>",
     help="Look <SECONDS> seconds into the past to update loglines.",
 )
+@click.option(
+    "--cursor",
+    is_flag=True,
+    default=False,
+    help="Only fetch lines after the newest line seen so far instead of the whole timedelta.",
+)
+@click.option(
+    "--cursor-overlap",
+    default=DEFAULT_CURSOR_OVERLAP,
+    type=float,
+    show_default=True,
+    metavar="<SECONDS>",
+    help="Fetch <SECONDS> seconds before the cursor again to catch late lines.",
+)
+@click.option(
+    "--poll-interval",
+    default=0.1,
+    type=float,
+    show_default=True,
+    metavar="<SECONDS>",
+    help="Wait <SECONDS> seconds between two polls.",
+)
+@click.option(
+    "--max-poll-interval",
+    type=float,
+    metavar="<SECONDS>",
+    help="Back off up to <SECONDS> seconds between polls while no new lines arrive.",
+)
+@click.option(
+    "--max-requests-per-second",
+    type=float,
+    metavar="<NUM>",
+    help="Never poll more than <NUM> times per second.",
+)
+@click.option(
+    "--checkpoint-file",
+    type=click.Path(dir_okay=False),
+    help="Save the progress to this file and resume from it on the next start.",
+)
+@click.option(
+    "--checkpoint-interval",
+    default=10,
+    type=float,
+    show_default=True,
+    metavar="<SECONDS>",
+    help="Save the checkpoint at most every <SECONDS> seconds.",
+)
+@click.option(
+    "--max-tracked-entries",
+    type=int,
+    metavar="<NUM>",
+    help="Remember at most <NUM> already printed lines, using hashed ids.",
+)
+@click.option(
+    "--tracker-false-positive-rate",
+    type=float,
+    metavar="<RATE>",
+    help="Remember already printed lines in Bloom filters with this false positive rate.",
+)
+@click.option(
+    "--output-buffer",
+    default=DEFAULT_BUFFER_SIZE,
+    type=int,
+    show_default=True,
+    metavar="<CHARACTERS>",
+    help="Collect <CHARACTERS> characters of output before writing them. "
+    "A terminal is still updated after every poll, 0 writes every line immediately.",
+)
+@click.option(
+    "--workers",
+    default=0,
+    type=int,
+    metavar="<NUM>",
+    help="Format lines on <NUM> worker processes while fetching continues.",
+)
+@click.option(
+    "--page-size",
+    default=DEFAULT_PAGE_SIZE,
+    type=int,
+    show_default=True,
+    metavar="<NUM>",
+    help="Fetch <NUM> lines per request.",
+)
+@click.option(
+    "--adaptive-page-size",
+    is_flag=True,
+    default=False,
+    help="Adapt the page size to the size and latency of the responses, starting at --page-size.",
+)
+@click.option(
+    "--rate",
+    is_flag=True,
+    default=False,
+    help="Print the number of new lines per second instead of the lines, counted "
+    "by Elasticsearch over the last --timedelta seconds. Requires Elasticsearch 7.2 "
+    "or newer.",
+)
+@click.option(
+    "--rate-interval",
+    default=10,
+    type=float,
+    show_default=True,
+    metavar="<SECONDS>",
+    help="Print the rate of every <SECONDS> seconds.",
+)
+@click.option(
+    "--rate-split",
+    metavar="<FIELD>",
+    help="Additionally split the rate by the values of <FIELD>, e.g. level.",
+)
+@click.option(
+    "--rate-settle-delay",
+    type=float,
+    metavar="<SECONDS>",
+    help="Print the rate of an interval <SECONDS> seconds after it ended, so late "
+    "lines are counted. Defaults to --timedelta minus --rate-interval.",
+)
 @pass_config
-def tail(config, format_string, index, query, number_of_lines, timedelta):
+def tail(
+    config,
+    format_string,
+    index,
+    query,
+    number_of_lines,
+    timedelta,
+    cursor,
+    cursor_overlap,
+    poll_interval,
+    max_poll_interval,
+    max_requests_per_second,
+    checkpoint_file,
+    checkpoint_interval,
+    max_tracked_entries,
+    tracker_false_positive_rate,
+    output_buffer,
+    workers,
+    page_size,
+    adaptive_page_size,
+    rate,
+    rate_interval,
+    rate_split,
+    rate_settle_delay,
+):
     es = initialize_es_instance(
         config.connect, config.username, config.password, config.cookie
     )
 
-    es_follow = ElasticsearchFollow(es, query_string=query)
+    if rate:
+        rate_meter = RateMeter(
+            es,
+            index=index,
+            query_string=query,
+            interval=rate_interval,
+            window=timedelta,
+            settle_delay=rate_settle_delay,
+            split_field=rate_split,
+        )
+        with OutputWriter(buffer_size=output_buffer) as output:
+            while True:
+                for line in rate_meter.generator():
+                    output.write_line(line)
+                output.poll_finished()
+                rate_meter.wait()
+
+    if tracker_false_positive_rate and checkpoint_file:
+        raise click.UsageError(
+            "--tracker-false-positive-rate cannot be combined with --checkpoint-file, "
+            "as lines tracked in Bloom filters cannot be saved."
+        )
+
+    entry_tracker = None
+    if max_tracked_entries or tracker_false_positive_rate:
+        entry_tracker = CompactEntryTracker(
+            max_entries=max_tracked_entries,
+            false_positive_rate=tracker_false_positive_rate,
+        )
+
+    processor = create_processor(format_string, workers)
+    es_follow = ElasticsearchFollow(
+        es,
+        query_string=query,
+        use_cursor=cursor,
+        cursor_overlap=cursor_overlap,
+        source_fields=processor.fields,
+        entry_tracker=entry_tracker,
+        page_size=create_page_size(page_size, adaptive_page_size),
+    )
+    if max_poll_interval:
+        scheduler = AdaptivePollScheduler(
+            min_interval=poll_interval,
+            max_interval=max_poll_interval,
+            max_requests_per_second=max_requests_per_second,
+        )
+    else:
+        scheduler = PollScheduler(
+            interval=poll_interval, max_requests_per_second=max_requests_per_second
+        )
+
+    checkpoint = None
+    if checkpoint_file:
+        checkpoint = Checkpoint(checkpoint_file, interval=checkpoint_interval)
+
     follower = Follower(
         elasticsearch_follow=es_follow,
         index=index,
         time_delta=timedelta,
-        processor=FormattingProcessor(format_string=format_string),
+        processor=processor,
+        scheduler=scheduler,
+        checkpoint=checkpoint,
     )
 
-    if number_of_lines > 0:
-        for entry in list(follower.generator())[-number_of_lines:]:
-            print(entry)
-
-    while True:
-        entries = follower.generator()
-        for entry in entries:
-            if entry:
-                print(entry)
-        time.sleep(0.1)
+    # The checkpoint is only saved after all lines of a poll were flushed, so lines
+    # it marks as seen are not lost while they are still buffered.
+    try:
+        with OutputWriter(buffer_size=output_buffer) as output:
+            poll_written = False
+            try:
+                for entry in follower.last_lines(number_of_lines):
+                    output.write_line(entry)
+                output.poll_finished()
+                poll_written = True
+
+                while True:
+                    poll_written = False
+                    for entry in follower.generator():
+                        if entry:
+                            output.write_line(entry)
+                    output.poll_finished()
+                    if checkpoint:
+                        output.flush()
+                        follower.save_checkpoint()
+                    poll_written = True
+                    follower.wait()
+            finally:
+                if checkpoint and poll_written:
+                    output.flush()
+                    follower.save_checkpoint(force=True)
+    finally:
+        if workers > 0:
+            processor.close()
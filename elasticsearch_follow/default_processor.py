@@ -1,4 +1,10 @@
 class DefaultProcessor:
+    fields = None
+
     def process_line(self, line):
         entries = [str(line[key]) for key in sorted(line.keys())]
         return " ".join(entries)
+
+    def process_lines(self, lines):
+        process_line = self.process_line
+        return [process_line(line) for line in lines]
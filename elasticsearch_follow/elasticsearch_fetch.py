@@ -1,31 +1,121 @@
 import logging
+from copy import deepcopy
+
+from elasticsearch import TransportError
+
+from . import page_queue
+from .histogram import date_histogram_interval
+from .page_size import as_page_size
+from .processing import batched
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_BATCH_SIZE = 100
+HISTOGRAM_BUCKETS_PER_PARTITION = 10
+MAX_CONTEXT_RANGE = 10000
+
+FILTER_PATH = [
+    "took",
+    "_scroll_id",
+    "pit_id",
+    "hits.hits._id",
+    "hits.hits._source",
+    "hits.hits.sort",
+]
+
+MSEARCH_FILTER_PATH = [
+    "responses.status",
+    "responses.error",
+    "responses.hits.hits._id",
+    "responses.hits.hits._source",
+]
+
+COUNT_FILTER_PATH = ["responses.status", "responses.error", "responses.hits.total"]
+
+HISTOGRAM_FILTER_PATH = [
+    "aggregations.histogram.buckets.key",
+    "aggregations.histogram.buckets.key_as_string",
+    "aggregations.histogram.buckets.doc_count",
+]
+
 
-class ElasticsearchFetch:
-    def __init__(self, elasticsearch, timestamp_field="@timestamp"):
+def page_hits(response):
+    """
+    :param response: A response to a search or scroll request.
+    :return: The hits of the response. Responses restricted by ``FILTER_PATH`` do not
+        contain the ``hits`` at all if there were none.
+    """
+    return response.get("hits", {}).get("hits", [])
+
+
+class BaseElasticsearchFetch:
+    def __init__(
+        self,
+        elasticsearch,
+        timestamp_field="@timestamp",
+        use_pit=False,
+        pit_keep_alive="2m",
+        source_fields=None,
+        page_size=None,
+        prefetch_pages=0,
+    ):
         """
+        Configuration and query building shared by ElasticsearchFetch and
+        AsyncElasticsearchFetch.
+
         :param elasticsearch: elasticsearch instance from the ``elasticsearch``-library.
         :param timestamp_field: Denotes which field in the elasticsearch-index is used
             as the timestamp.
+        :param use_pit: If True, page through results with a point in time and
+            ``search_after`` instead of a scroll context.
+        :param pit_keep_alive: How long the point in time is kept alive between requests.
+        :param source_fields: The fields of ``_source`` to fetch, e.g. the ``fields`` of
+            a processor. All fields are fetched if None.
+        :param page_size: Number of hits per page, or a PageSize deciding it, e.g. an
+            AdaptivePageSize. Defaults to 1000 hits.
+        :param prefetch_pages: Number of pages fetched ahead in the background while the
+            current page is consumed. Pages are fetched on demand if 0.
         """
         self.es = elasticsearch
         self.timestamp_field = timestamp_field
+        self.use_pit = use_pit
+        self.pit_keep_alive = pit_keep_alive
+        self.source_fields = source_fields
+        self.tiebreaker = "_shard_doc" if use_pit else "_doc"
+        self.page_size = as_page_size(page_size)
+        self.prefetch_pages = prefetch_pages
+        self.pit_queries = {}
 
-    def search(self, index, query_string=None, from_time=None, to_time=None):
+    def _remember_pit_query(self, search_result, query):
         """
-        :param index: The index to search in. May contain wildcards.
-        :param query_string: The query string.
-        :param to_time: Upper bound of time to query.
-        :param from_time: Lower bound of time to query.
-        :return: A list with results of the query, including the sort-parameter which
-        can be used with search_nearby.
+        Remembers the query of a search within a point in time, so ``get_hits`` can
+        continue it when only given the result of ``search``.
+        """
+        if "pit_id" in search_result:
+            self.pit_queries[search_result["pit_id"]] = query
+
+    def _pit_query(self, search_result, query):
         """
+        :return: The query to continue the search of ``search_result`` with.
+        """
+        if query is None:
+            query = self.pit_queries.get(search_result["pit_id"])
+        self.pit_queries.pop(search_result["pit_id"], None)
+        return query
+
+    def _add_pit_to_query(self, query, pit_id):
+        logger.debug("Opened point in time '{}'".format(pit_id))
+        query["pit"] = {"id": pit_id, "keep_alive": self.pit_keep_alive}
+
+    def _build_query(
+        self, query_string=None, from_time=None, to_time=None, from_millis=None
+    ):
         query = {
-            "sort": [{self.timestamp_field: "asc"}, {"_doc": "desc"}],
+            "sort": [{self.timestamp_field: "asc"}, {self.tiebreaker: "desc"}],
             "query": {"bool": {"must": []}},
+            "size": self.page_size.next_size(),
         }
+        self._add_source_fields(query)
 
         if query_string:
             query["query"]["bool"]["must"].append(
@@ -42,9 +132,397 @@ class ElasticsearchFetch:
 
             query["query"]["bool"]["must"].append({"range": query_range})
 
-        return self.es.search(index=index, scroll="2m", body=query)
+        if from_millis is not None:
+            query["query"]["bool"]["must"].append(
+                {
+                    "range": {
+                        self.timestamp_field: {
+                            "gte": from_millis,
+                            "format": "epoch_millis",
+                        }
+                    }
+                }
+            )
+
+        return query
+
+    def _add_source_fields(self, query):
+        if self.source_fields:
+            query["_source"] = {"includes": list(self.source_fields)}
+
+
+class ElasticsearchFetch(BaseElasticsearchFetch):
+    def __init__(
+        self,
+        elasticsearch,
+        timestamp_field="@timestamp",
+        use_pit=False,
+        pit_keep_alive="2m",
+        source_fields=None,
+        page_size=None,
+        prefetch_pages=0,
+        cache=None,
+    ):
+        """
+        :param elasticsearch: elasticsearch instance from the ``elasticsearch``-library.
+        :param timestamp_field: Denotes which field in the elasticsearch-index is used
+            as the timestamp.
+        :param use_pit: If True, page through results with a point in time and
+            ``search_after`` instead of a scroll context.
+        :param pit_keep_alive: How long the point in time is kept alive between requests.
+        :param source_fields: The fields of ``_source`` to fetch, e.g. the ``fields`` of
+            a processor. All fields are fetched if None.
+        :param page_size: Number of hits per page, or a PageSize deciding it, e.g. an
+            AdaptivePageSize. Defaults to 1000 hits.
+        :param prefetch_pages: Number of pages fetched ahead in the background while the
+            current page is consumed. Pages are fetched on demand if 0.
+        :param cache: A HitCache storing the results of ``search_hits`` and
+            ``search_hit_pages`` over time ranges which ended in the past. Nothing is
+            cached if None.
+        """
+        super().__init__(
+            elasticsearch,
+            timestamp_field=timestamp_field,
+            use_pit=use_pit,
+            pit_keep_alive=pit_keep_alive,
+            source_fields=source_fields,
+            page_size=page_size,
+            prefetch_pages=prefetch_pages,
+        )
+        self.cache = cache
+        self.cluster = None
+
+    def search(self, index, query_string=None, from_time=None, to_time=None):
+        """
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :return: A list with results of the query, including the sort-parameter which
+        can be used with search_nearby. The hits only contain their ``_id``, ``_source``
+        and ``sort``. Pass it to ``get_hits`` to fetch the following pages, which also
+        closes the point in time if ``use_pit`` is set.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        search_result = self._execute_search(index, query)
+        self._remember_pit_query(search_result, query)
+        return search_result
+
+    def count(self, index, query_string=None, from_time=None, to_time=None):
+        """
+        Counts the matching documents without fetching any of them.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :return: The number of matching documents.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        res = self.es.count(
+            index=index, body={"query": query["query"]}, filter_path=["count"]
+        )
+        return res["count"]
+
+    def histogram(
+        self, index, interval, query_string=None, from_time=None, to_time=None
+    ):
+        """
+        Counts the matching documents per time interval without fetching any of them.
+        Requires Elasticsearch 7.2 or newer.
+
+        :param index: The index to search in. May contain wildcards.
+        :param interval: The interval of the buckets, e.g. ``5m``, ``1h`` or ``month``.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :return: The buckets of a ``date_histogram`` aggregation, each with the
+            ``key`` in epoch milliseconds, ``key_as_string`` and ``doc_count``. Empty
+            buckets between the first and the last match are included.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        aggregation = {"field": self.timestamp_field, "min_doc_count": 0}
+        aggregation.update(date_histogram_interval(interval))
+        body = {
+            "size": 0,
+            "query": query["query"],
+            "aggs": {"histogram": {"date_histogram": aggregation}},
+        }
+        res = self.es.search(index=index, body=body, filter_path=HISTOGRAM_FILTER_PATH)
+        return res.get("aggregations", {}).get("histogram", {}).get("buckets", [])
+
+    def search_hits(
+        self, index, query_string=None, from_time=None, to_time=None, from_millis=None
+    ):
+        """
+        Searches and yields all resulting documents, regardless of whether a scroll
+        context or a point in time is used for paging.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :param from_millis: Additional lower bound of time to query, in milliseconds
+            since the epoch, e.g. the timestamp of a sort value.
+        :return: Yields the resulting documents one by one.
+        """
+        pages = self.search_hit_pages(
+            index, query_string, from_time, to_time, from_millis=from_millis
+        )
+        for hits in pages:
+            yield from hits
+
+    def search_hit_pages(
+        self, index, query_string=None, from_time=None, to_time=None, from_millis=None
+    ):
+        """
+        Like ``search_hits``, but yields the resulting documents page by page.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :param from_millis: Additional lower bound of time to query, in milliseconds
+            since the epoch, e.g. the timestamp of a sort value.
+        :return: Yields a non-empty list of documents per page.
+        """
+        query = self._build_query(query_string, from_time, to_time, from_millis)
+        if not self.cache or not self.cache.is_cacheable(from_time, to_time):
+            search_result = self._execute_search(index, query)
+            yield from self.get_hit_pages(search_result, query)
+            return
+
+        key = self.cache.key(self._cluster_uuid(), index, query)
+        cached_pages = self.cache.get_pages(key)
+        if cached_pages is not None:
+            yield from cached_pages
+            return
+
+        search_result = self._execute_search(index, query)
+        yield from self.cache.store_pages(key, self.get_hit_pages(search_result, query))
+
+    def _cluster_uuid(self):
+        if self.cluster is None:
+            self.cluster = self.es.info(filter_path=["cluster_uuid"])["cluster_uuid"]
+        return self.cluster
+
+    def search_sliced_hit_pages(
+        self,
+        index,
+        query_string=None,
+        from_time=None,
+        to_time=None,
+        slices=2,
+        ordered=True,
+        max_pending_pages=None,
+    ):
+        """
+        Like ``search_hit_pages``, but splits the search into ``slices`` sliced scrolls
+        or, with ``use_pit``, sliced searches within one point in time, which are
+        fetched concurrently. Slicing is most effective with one slice per shard.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :param slices: Number of slices fetched concurrently.
+        :param ordered: If True, the documents are merged into one stream ordered by
+            timestamp. Otherwise the pages are yielded in the order they arrive, which
+            is faster.
+        :param max_pending_pages: Maximum number of pages buffered per slice if
+            ``ordered``, or in total otherwise. Defaults to two pages per slice.
+        :return: Yields a non-empty list of documents per page.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        pit_id = self._open_shared_pit(index, query)
+
+        slice_pages = [
+            self._get_slice_pages(index, query, slice_id, slices)
+            for slice_id in range(slices)
+        ]
+        logger.debug(
+            "Fetching {} slices {}".format(
+                slices, "ordered" if ordered else "unordered"
+            )
+        )
+        try:
+            if ordered:
+                hits = page_queue.merge_ordered(
+                    slice_pages,
+                    key=self._hit_timestamp,
+                    max_pending=max_pending_pages if max_pending_pages else 2,
+                )
+                try:
+                    yield from batched(hits, query["size"])
+                finally:
+                    # Stops the threads of the slices before the point in time they
+                    # search in is closed, as batched does not close the merge.
+                    hits.close()
+            else:
+                yield from page_queue.interleave(
+                    slice_pages,
+                    max_pending=(
+                        max_pending_pages if max_pending_pages else 2 * slices
+                    ),
+                )
+        finally:
+            self._close_shared_pit(pit_id)
+
+    def search_partitioned_hit_pages(
+        self,
+        index,
+        query_string=None,
+        from_time=None,
+        to_time=None,
+        partitions=4,
+        max_pending_pages=2,
+    ):
+        """
+        Like ``search_hit_pages``, but splits the time range into ``partitions``
+        consecutive sub-ranges holding about the same number of documents, which are
+        fetched concurrently. The sub-ranges are derived from a date histogram of the
+        results, fetched beforehand.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :param partitions: Number of sub-ranges fetched concurrently.
+        :param max_pending_pages: Maximum number of pages buffered per sub-range ahead
+            of the sub-range which is currently yielded.
+        :return: Yields a non-empty list of documents per page, ordered by timestamp.
+        """
+        query = self._build_query(query_string, from_time, to_time)
+        boundaries = self._partition_boundaries(index, query, partitions)
+        if not boundaries:
+            logger.debug("Too few results for partitioning, fetching them at once.")
+            yield from self.get_hit_pages(self._execute_search(index, query), query)
+            return
 
-    def search_nearby(self, index, timestamp, doc_id, after=True, number=0):
+        pit_id = self._open_shared_pit(index, query)
+        lower_bounds = [None] + boundaries
+        upper_bounds = boundaries + [None]
+        partition_pages = [
+            self._get_partition_pages(index, query, lower_bound, upper_bound)
+            for lower_bound, upper_bound in zip(lower_bounds, upper_bounds)
+        ]
+        logger.debug(
+            "Fetching {} partitions split at {}".format(
+                len(partition_pages), boundaries
+            )
+        )
+        try:
+            yield from page_queue.concatenate(
+                partition_pages, max_pending=max_pending_pages
+            )
+        finally:
+            self._close_shared_pit(pit_id)
+
+    def _partition_boundaries(self, index, query, partitions):
+        """
+        :return: The timestamps in epoch milliseconds splitting the results of
+            ``query`` into at most ``partitions`` parts of about the same size.
+        """
+        if partitions <= 1:
+            return []
+
+        preflight = {
+            "size": 0,
+            "query": query["query"],
+            "aggs": {
+                "histogram": {
+                    "auto_date_histogram": {
+                        "field": self.timestamp_field,
+                        "buckets": partitions * HISTOGRAM_BUCKETS_PER_PARTITION,
+                    }
+                }
+            },
+        }
+        res = self.es.search(
+            index=index, body=preflight, filter_path=["aggregations.histogram.buckets"]
+        )
+        buckets = res.get("aggregations", {}).get("histogram", {}).get("buckets", [])
+        total = sum(bucket["doc_count"] for bucket in buckets)
+
+        boundaries = []
+        cumulative = 0
+        for bucket in buckets:
+            if len(boundaries) == partitions - 1:
+                break
+            if (
+                0 < cumulative < total
+                and cumulative >= total * (len(boundaries) + 1) / partitions
+            ):
+                boundaries.append(bucket["key"])
+            cumulative += bucket["doc_count"]
+        return boundaries
+
+    def _get_partition_pages(self, index, query, lower_bound, upper_bound):
+        query = deepcopy(query)
+        partition_range = {"format": "epoch_millis"}
+        if lower_bound is not None:
+            partition_range["gte"] = lower_bound
+        if upper_bound is not None:
+            partition_range["lt"] = upper_bound
+        query["query"]["bool"]["must"].append(
+            {"range": {self.timestamp_field: partition_range}}
+        )
+        yield from self._get_sub_search_pages(index, query)
+
+    def _get_slice_pages(self, index, query, slice_id, slices):
+        query = deepcopy(query)
+        query["slice"] = {"id": slice_id, "max": slices}
+        yield from self._get_sub_search_pages(index, query)
+
+    def _get_sub_search_pages(self, index, query):
+        """
+        Pages through ``query``. If it is part of a search within a point in time,
+        the point in time is not closed afterwards, as it is shared.
+
+        Sub-searches are fetched concurrently, so each decides its page size with its
+        own copy of ``page_size``.
+        """
+        page_size = deepcopy(self.page_size)
+        if "pit" in query:
+            res = self.es.search(body=query, filter_path=FILTER_PATH)
+            yield from self._page_through_pit(res, query, page_size)
+        else:
+            res = self.es.search(
+                index=index, scroll="2m", body=query, filter_path=FILTER_PATH
+            )
+            yield from self._get_scroll_pages(res, page_size)
+
+    def _open_shared_pit(self, index, query):
+        if not self.use_pit:
+            return None
+        pit_id = self.es.open_point_in_time(
+            index=index, keep_alive=self.pit_keep_alive
+        )["id"]
+        self._add_pit_to_query(query, pit_id)
+        return pit_id
+
+    def _close_shared_pit(self, pit_id):
+        if pit_id:
+            logger.debug("Closing shared point in time.")
+            self.es.close_point_in_time(body={"id": pit_id})
+
+    @staticmethod
+    def _hit_timestamp(hit):
+        return hit["sort"][0]
+
+    def _execute_search(self, index, query):
+        if not self.use_pit:
+            return self.es.search(
+                index=index, scroll="2m", body=query, filter_path=FILTER_PATH
+            )
+
+        pit = self.es.open_point_in_time(index=index, keep_alive=self.pit_keep_alive)
+        self._add_pit_to_query(query, pit["id"])
+        return self.es.search(body=query, filter_path=FILTER_PATH)
+
+    def search_nearby(
+        self, index, timestamp, doc_id, after=True, number=0, pit_id=None
+    ):
         """
         Fetching
         :param index: The index to search in. May contain wildcards.
@@ -52,6 +530,8 @@ class ElasticsearchFetch:
         :param doc_id: The number returned as the second parameter in 'sort' return from search.
         :param after: If after=True, search after the baseline. If after=False, search after baseline.
         :param number: Number of lines after the entry defined by timestamp and doc_id
+        :param pit_id: The point in time to search in. Required if ``use_pit`` is set,
+            as ``doc_id`` is then only valid within this point in time.
         :return: Returns the result of the Elasticsearch query.
         """
 
@@ -63,29 +543,35 @@ class ElasticsearchFetch:
                 number, after, doc_id
             )
         )
+        query = self._nearby_query(timestamp, doc_id, after, number, pit_id)
+        if pit_id:
+            return self.es.search(body=query, filter_path=FILTER_PATH)
+        return self.es.search(index=index, body=query, filter_path=FILTER_PATH)
+
+    def _nearby_query(self, timestamp, doc_id, after, number, pit_id=None):
         if after:
             query = {
                 "search_after": [timestamp, doc_id],
                 "size": number,
-                "sort": [{self.timestamp_field: "asc"}, {"_doc": "desc"}],
+                "sort": [{self.timestamp_field: "asc"}, {self.tiebreaker: "desc"}],
             }
         else:
             query = {
                 "search_after": [timestamp, doc_id],
                 "size": number,
-                "sort": [{self.timestamp_field: "desc"}, {"_doc": "asc"}],
+                "sort": [{self.timestamp_field: "desc"}, {self.tiebreaker: "asc"}],
             }
+        self._add_source_fields(query)
 
-        return self.es.search(index=index, body=query)
+        if pit_id:
+            query["pit"] = {"id": pit_id, "keep_alive": self.pit_keep_alive}
+        return query
 
     @staticmethod
     def _extract_source(line):
         if not line:
             return []
-        if line["hits"]["hits"]:
-            return list(map(lambda x: x["_source"], line["hits"]["hits"]))
-        else:
-            return []
+        return [hit["_source"] for hit in page_hits(line)]
 
     def search_surrounding(
         self,
@@ -95,6 +581,7 @@ class ElasticsearchFetch:
         to_time=None,
         num_before=0,
         num_after=0,
+        merge_context=False,
     ):
         """
         Fetches the line found by query_string as well as lines before and after as given
@@ -106,6 +593,9 @@ class ElasticsearchFetch:
         :param from_time: Lower bound of time to query.
         :param num_before: Number of lines to fetch before a hit.
         :param num_after: Number of lines to fetch after a hit.
+        :param merge_context: If True, hits whose surrounding lines overlap or touch
+            are merged into one list like ``grep`` does, and their lines are fetched
+            as one contiguous range.
         :return: Returns a list of lists, where the sublists contain the found and
         the surrounding documents.
         """
@@ -114,56 +604,299 @@ class ElasticsearchFetch:
                 from_time, to_time, num_before, num_after
             )
         )
-        search_result = self.search(
-            index, query_string, from_time=from_time, to_time=to_time
-        )
+        query = self._build_query(query_string, from_time=from_time, to_time=to_time)
+        search_result = self._execute_search(index, query)
+        if "pit_id" not in search_result:
+            hits = self.get_hits(search_result, query)
+            yield from self._with_context(
+                index, hits, query, num_before, num_after, merge_context
+            )
+            return
+
+        # The lines around the hits are searched in the same point in time, so it is
+        # only closed once the context of the last batch was fetched.
+        try:
+            hits = (
+                hit
+                for page in self._page_through_pit(search_result, query)
+                for hit in page
+            )
+            yield from self._with_context(
+                index, hits, query, num_before, num_after, merge_context
+            )
+        finally:
+            logger.debug("Closing point in time of surrounding search.")
+            self.es.close_point_in_time(body={"id": query["pit"]["id"]})
+
+    def _with_context(self, index, hits, query, num_before, num_after, merge_context):
+        for hits in batched(hits, CONTEXT_BATCH_SIZE):
+            pit_id = query["pit"]["id"] if "pit" in query else None
+            if merge_context and len(hits) > 1 and (num_before > 0 or num_after > 0):
+                yield from self._search_merged_context(
+                    index, hits, num_before, num_after, pit_id
+                )
+                continue
+
+            lines_before, lines_after = self._search_context(
+                index, hits, num_before, num_after, pit_id
+            )
+
+            for hit, before, after in zip(hits, lines_before, lines_after):
+                yield list(reversed(before)) + [hit["_source"]] + after
+
+    def _search_context(self, index, hits, num_before, num_after, pit_id=None):
+        """
+        Fetches the lines before and after each of ``hits`` with a single multi search.
+
+        :return: Two lists holding the sources of the lines before, from the nearest
+            to the farthest, and after each hit.
+        """
+        lines_before = [[] for _ in hits]
+        lines_after = [[] for _ in hits]
+        if num_before <= 0 and num_after <= 0:
+            return lines_before, lines_after
 
-        for hit in self.get_hits(search_result):
-            line = hit["_source"]
+        header = {} if pit_id else {"index": index}
+        body = []
+        targets = []
+        for hit, before, after in zip(hits, lines_before, lines_after):
             line_timestamp, line_doc_id = hit["sort"]
+            for lines, is_after, number in [
+                (before, False, num_before),
+                (after, True, num_after),
+            ]:
+                if number > 0:
+                    body.append(header)
+                    body.append(
+                        self._nearby_query(
+                            line_timestamp, line_doc_id, is_after, number, pit_id
+                        )
+                    )
+                    targets.append(lines)
 
-            lines_before = self.search_nearby(
-                index=index,
-                timestamp=line_timestamp,
-                doc_id=line_doc_id,
-                after=False,
-                number=num_before,
+        logger.debug(
+            "Searching the context of {} hits with {} searches".format(
+                len(hits), len(targets)
             )
-            lines_after = self.search_nearby(
-                index=index,
-                timestamp=line_timestamp,
-                doc_id=line_doc_id,
-                after=True,
-                number=num_after,
+        )
+        responses = self._msearch(body, MSEARCH_FILTER_PATH)
+        for lines, response in zip(targets, responses):
+            lines.extend(self._extract_source(response))
+        return lines_before, lines_after
+
+    def _search_merged_context(self, index, hits, num_before, num_after, pit_id=None):
+        """
+        Fetches the context of ``hits`` like ``_search_context``, but merges hits
+        whose surrounding lines overlap or touch into runs. The lines of a run are
+        fetched as one contiguous range after its first hit.
+
+        :return: Yields one list of lines per run.
+        """
+        runs = self._dense_runs(
+            hits, self._count_gaps(index, hits, pit_id), num_before, num_after
+        )
+
+        header = {} if pit_id else {"index": index}
+        body = []
+        for run, span in runs:
+            line_timestamp, line_doc_id = run[0]["sort"]
+            if num_before > 0:
+                body.append(header)
+                body.append(
+                    self._nearby_query(
+                        line_timestamp, line_doc_id, False, num_before, pit_id
+                    )
+                )
+            if span + num_after > 0:
+                body.append(header)
+                body.append(
+                    self._nearby_query(
+                        line_timestamp, line_doc_id, True, span + num_after, pit_id
+                    )
+                )
+
+        logger.debug(
+            "Searching the context of {} hits merged into {} runs".format(
+                len(hits), len(runs)
             )
+        )
+        responses = iter(self._msearch(body, MSEARCH_FILTER_PATH))
+        for run, span in runs:
+            lines_before = []
+            if num_before > 0:
+                lines_before = self._extract_source(next(responses))
+            hits_after = []
+            if span + num_after > 0:
+                hits_after = page_hits(next(responses))
+
+            if len(run) > 1:
+                ids_after = [hit.get("_id") for hit in hits_after]
+                last_id = run[-1]["_id"]
+                if last_id not in ids_after:
+                    logger.debug(
+                        "Hit '{}' is not within the fetched range, falling back to "
+                        "searching the context of every hit".format(last_id)
+                    )
+                    lines_before, lines_after = self._search_context(
+                        index, run, num_before, num_after, pit_id
+                    )
+                    for hit, before, after in zip(run, lines_before, lines_after):
+                        yield list(reversed(before)) + [hit["_source"]] + after
+                    continue
+                hits_after = hits_after[: ids_after.index(last_id) + 1 + num_after]
 
-            yield list(reversed(self._extract_source(lines_before))) + [
-                line
-            ] + self._extract_source(lines_after)
+            yield list(reversed(lines_before)) + [run[0]["_source"]] + [
+                hit["_source"] for hit in hits_after
+            ]
 
-    def get_hits(self, search_result):
+    def _count_gaps(self, index, hits, pit_id=None):
         """
-        Fetches all hits from a search_result. Iterates through all pages via the scroll_id.
+        :return: For each pair of consecutive hits, an upper bound of the number of
+            documents between them. It is counted by timestamp, so documents sharing
+            the timestamp of either hit are included.
+        """
+        header = {} if pit_id else {"index": index}
+        body = []
+        for hit, next_hit in zip(hits, hits[1:]):
+            query = {
+                "size": 0,
+                "query": {
+                    "range": {
+                        self.timestamp_field: {
+                            "gte": hit["sort"][0],
+                            "lte": next_hit["sort"][0],
+                            "format": "epoch_millis",
+                        }
+                    }
+                },
+            }
+            if pit_id:
+                query["pit"] = {"id": pit_id, "keep_alive": self.pit_keep_alive}
+            body.append(header)
+            body.append(query)
+
+        return [
+            max(response["hits"]["total"]["value"] - 2, 0)
+            for response in self._msearch(body, COUNT_FILTER_PATH)
+        ]
+
+    @staticmethod
+    def _dense_runs(hits, gaps, num_before, num_after):
+        """
+        Groups consecutive hits into runs if at most ``num_before + num_after``
+        documents lie between them, so their surrounding lines overlap or touch.
+
+        :return: A list of (run, span)-tuples, where span is the number of documents
+            after the first hit of the run up to and including its last hit.
+        """
+        runs = [([hits[0]], 0)]
+        for hit, gap in zip(hits[1:], gaps):
+            run, span = runs[-1]
+            if (
+                gap <= num_before + num_after
+                and span + gap + 1 + num_after <= MAX_CONTEXT_RANGE
+            ):
+                run.append(hit)
+                runs[-1] = (run, span + gap + 1)
+            else:
+                runs.append(([hit], 0))
+        return runs
+
+    def _msearch(self, body, filter_path):
+        """
+        :return: The responses of the multi search. A failed search raises a
+            TransportError, as a failed single search would.
+        """
+        res = self.es.msearch(body=body, filter_path=filter_path)
+        responses = res["responses"]
+        for response in responses:
+            if "error" in response:
+                raise TransportError(
+                    response.get("status", "N/A"),
+                    response["error"].get("type", "unknown"),
+                    response["error"],
+                )
+        return responses
+
+    def get_hits(self, search_result, query=None):
+        """
+        Fetches all hits from a search_result. Iterates through all pages via the scroll_id
+        or, for searches within a point in time, via ``search_after``.
 
         :param search_result: The result of an ElasticSearch.search-request.
+        :param query: The query used for the search. Only needed for searches within
+            a point in time, where it is reused for fetching the following pages.
         :return: Yields the resulting documents one by one.
         """
+        for hits in self.get_hit_pages(search_result, query):
+            yield from hits
+
+    def get_hit_pages(self, search_result, query=None):
+        """
+        Like ``get_hits``, but yields the documents page by page, so they can be
+        processed in batches.
+
+        :param search_result: The result of an ElasticSearch.search-request.
+        :param query: The query used for the search. Only needed for searches within
+            a point in time, where it is reused for fetching the following pages.
+        :return: Yields a non-empty list of documents per page.
+        """
+        if "pit_id" in search_result:
+            query = self._pit_query(search_result, query)
+            if query is None:
+                self.es.close_point_in_time(body={"id": search_result["pit_id"]})
+                raise ValueError("Paging through a point in time requires the query.")
+            pages = self._get_pit_pages(search_result, query)
+        else:
+            pages = self._get_scroll_pages(search_result)
+
+        if self.prefetch_pages > 0:
+            pages = page_queue.prefetch(pages, max_pending=self.prefetch_pages)
+        yield from pages
+
+    def _get_scroll_pages(self, search_result, page_size=None):
+        page_size = page_size if page_size else self.page_size
         res = search_result
         scroll_id = res["_scroll_id"]
-        hits = res["hits"]["hits"]
+        hits = page_hits(res)
         logger.debug("Got {} hits".format(len(hits)))
 
-        for hit in hits:
-            yield hit
+        try:
+            while hits:
+                page_size.record_page(res, hits)
+                yield hits
 
-        while res["hits"]["hits"]:
-            res = self.es.scroll(scroll_id=scroll_id, scroll="2m")
-            logger.debug("Fetching further pages. Got {} hits".format(len(hits)))
+                res = self.es.scroll(
+                    scroll_id=scroll_id, scroll="2m", filter_path=FILTER_PATH
+                )
+                scroll_id = res["_scroll_id"]
+                hits = page_hits(res)
+                logger.debug("Fetching further pages. Got {} hits".format(len(hits)))
+        finally:
+            logger.debug("No more hits. Clearing scroll.")
+            self.es.clear_scroll(scroll_id=scroll_id)
+
+    def _get_pit_pages(self, search_result, query):
+        try:
+            yield from self._page_through_pit(search_result, query)
+        finally:
+            logger.debug("No more hits. Closing point in time.")
+            self.es.close_point_in_time(body={"id": query["pit"]["id"]})
+
+    def _page_through_pit(self, search_result, query, page_size=None):
+        page_size = page_size if page_size else self.page_size
+        res = search_result
+        while True:
+            query["pit"]["id"] = res["pit_id"]
+            hits = page_hits(res)
+            logger.debug("Got {} hits from point in time".format(len(hits)))
+            page_size.record_page(res, hits)
 
-            scroll_id = res["_scroll_id"]
-            current_hits = res["hits"]["hits"]
-            for hit in current_hits:
-                yield hit
+            if hits:
+                yield hits
 
-        logger.debug("No more hits. Clearing scroll.")
-        self.es.clear_scroll(scroll_id=scroll_id)
+            if len(hits) < query["size"]:
+                break
+            query["search_after"] = hits[-1]["sort"]
+            query["size"] = page_size.next_size()
+            res = self.es.search(body=query, filter_path=FILTER_PATH)
@@ -1,40 +1,298 @@
 from copy import deepcopy
 
-from dateutil.parser import parse
-
-from .elasticsearch_fetch import ElasticsearchFetch
+from .elasticsearch_fetch import ElasticsearchFetch, FILTER_PATH, page_hits
 from .entry_tracker import EntryTracker
+from .page_size import as_page_size
+from .timestamps import to_epoch_millis
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CURSOR_OVERLAP = 5
+
 
-class ElasticsearchFollow:
-    def __init__(self, elasticsearch, timestamp_field="@timestamp", query_string=None):
+class BaseElasticsearchFollow:
+    def __init__(
+        self,
+        elasticsearch,
+        timestamp_field="@timestamp",
+        query_string=None,
+        use_cursor=False,
+        cursor_overlap=DEFAULT_CURSOR_OVERLAP,
+        source_fields=None,
+        entry_tracker=None,
+        page_size=None,
+    ):
         """
+        Configuration, query building, deduplication and cursor handling shared by
+        ElasticsearchFollow and AsyncElasticsearchFollow.
+
         :param elasticsearch: elasticsearch instance from the ``elasticsearch``-library.
         :param timestamp_field: Denotes which field in the elasticsearch-index is used
             as the timestamp.
         :param query_string: The query used to fetch data from Elasticsearch.
+        :param use_cursor: If True, remember the timestamp of the newest entry and only
+            fetch entries from it on, paging via ``search_after``, instead of scrolling
+            through the whole time window on every call. Entries fetched again are
+            skipped by the ``entry_tracker``.
+        :param cursor_overlap: Number of seconds before the cursor which are fetched
+            again to pick up entries which arrived late. Only used with ``use_cursor``.
+            Defaults to 5 seconds, it should be shorter than the time the entries are
+            tracked.
+        :param source_fields: The fields of ``_source`` to fetch, e.g. the ``fields`` of
+            a processor. The timestamp field is always fetched. All fields are fetched
+            if None.
+        :param entry_tracker: Keeps track of the entries already returned. Defaults to
+            an EntryTracker, a CompactEntryTracker needs less memory for busy indices.
+        :param page_size: Number of hits per page, or a PageSize deciding it, e.g. an
+            AdaptivePageSize. Defaults to 1000 hits.
         """
         self.es = elasticsearch
-        self.es_fetch = ElasticsearchFetch(
-            elasticsearch=elasticsearch, timestamp_field=timestamp_field
-        )
+        self.page_size = as_page_size(page_size)
         self.timestamp_field = timestamp_field
+        self.query_string = query_string
+
+        self.entry_tracker = EntryTracker() if entry_tracker is None else entry_tracker
 
-        self.entry_tracker = EntryTracker()
+        self.use_cursor = use_cursor
+        self.cursor_overlap = cursor_overlap
+        self.cursor = None
+        self.horizon = None
 
         self.base_query = {
             "sort": [{self.timestamp_field: "asc"}],
             "query": {"bool": {"must": []}},
         }
 
+        if source_fields:
+            # The timestamp is always fetched, so lines of several indices can be
+            # merged by it, e.g. by a MultiFollower.
+            includes = list(source_fields)
+            if self.timestamp_field not in includes:
+                includes.append(self.timestamp_field)
+            self.base_query["_source"] = {"includes": includes}
+
         if query_string:
             self.base_query["query"]["bool"]["must"].append(
                 {"query_string": {"query": query_string}}
             )
 
+    def _query_since(self, timestamp):
+        query_since = deepcopy(self.base_query)
+        query_since["query"]["bool"]["must"].append(
+            {"range": {self.timestamp_field: {"gt": timestamp}}}
+        )
+        query_since["size"] = self.page_size.next_size()
+        return query_since
+
+    def _continue_after_page(self, query, hits, boundary):
+        """
+        Continues ``query`` with the page after ``hits``. Neither ``_doc`` nor
+        ``_shard_doc`` without a point in time identify a hit across the shards, so
+        the next page starts again at the timestamp of the last hit. The ids of the
+        hits of that timestamp are collected in ``boundary`` to skip them.
+        """
+        timestamp = hits[-1]["sort"][0]
+        if timestamp != boundary["timestamp"]:
+            boundary["timestamp"] = timestamp
+            boundary["ids"] = set()
+        boundary["ids"].update(
+            hit["_id"] for hit in hits if hit["sort"][0] == timestamp
+        )
+
+        size = self.page_size.next_size()
+        if hits[0]["sort"][0] == timestamp:
+            # All hits share one timestamp, only a larger page gets past it.
+            size = max(size, 2 * query["size"])
+        query["size"] = size
+        query["search_after"] = [timestamp - 1]
+
+    @staticmethod
+    def _skip_boundary(hits, boundary):
+        """
+        :return: The ``hits`` which were not yielded with the previous page, see
+            ``_continue_after_page``.
+        """
+        return [hit for hit in hits if hit["_id"] not in boundary["ids"]]
+
+    def _restrict_to_cursor(self, query):
+        """
+        Restricts ``query`` to entries from ``cursor_overlap`` seconds before the
+        cursor on, so late arrivals and entries sharing the timestamp of the cursor
+        are found as well.
+        """
+        lower_bound = self.cursor[0] - int(self.cursor_overlap * 1000)
+        query["query"]["bool"]["must"].append(
+            {
+                "range": {
+                    self.timestamp_field: {
+                        "gte": lower_bound,
+                        "format": "epoch_millis",
+                    }
+                }
+            }
+        )
+
+        logger.debug(
+            "Fetching entries after cursor '{}' with an overlap of '{}' seconds".format(
+                self.cursor, self.cursor_overlap
+            )
+        )
+
+    def _update_cursor(self, hit):
+        if not self.use_cursor or "sort" not in hit:
+            return
+        if self.cursor is None or hit["sort"][0] > self.cursor[0]:
+            self.cursor = hit["sort"]
+
+    def _update_cursor_from(self, hits):
+        for hit in hits:
+            self._update_cursor(hit)
+
+    def _query_last(self, number_of_lines):
+        query_last = deepcopy(self.base_query)
+        query_last["sort"] = [{self.timestamp_field: "desc"}, {"_doc": "desc"}]
+        query_last["size"] = number_of_lines
+        return query_last
+
+    def _track_last_entries(self, hits):
+        """
+        Tracks the newest-first ``hits`` of ``get_last_lines`` and moves the horizon
+        to the oldest of them.
+
+        :return: Yields the new lines ordered from oldest to newest.
+        """
+        entries = list(reversed(hits))
+        if entries and "sort" in entries[0]:
+            self.horizon = entries[0]["sort"]
+        logger.debug(
+            "Fetched the last {} lines, setting the horizon to '{}'".format(
+                len(entries), self.horizon
+            )
+        )
+
+        for entry in entries:
+            self._update_cursor(entry)
+            new_line = self._track_new_entry(entry)
+            if new_line is not None:
+                yield new_line
+
+    def _track_new_entries(self, entries):
+        """
+        :return: The sources of the ``entries`` which are new, see
+            ``_track_new_entry``.
+        """
+        track_new_entry = self._track_new_entry
+        new_lines = [track_new_entry(entry) for entry in entries]
+        return [new_line for new_line in new_lines if new_line is not None]
+
+    def _track_new_entry(self, entry):
+        """
+        Adds ``entry`` to the entry tracker if it has not been seen yet. The timestamp
+        is taken from the sort values, which hold it in epoch milliseconds, and only
+        parsed from the source if they are missing.
+
+        Entries sorting before the horizon set by ``get_last_lines`` are skipped.
+
+        :return: The source of the entry if it is new, None otherwise.
+        """
+        entry_id = entry["_id"]
+        if entry_id in self.entry_tracker:
+            return None
+        if (
+            self.horizon is not None
+            and "sort" in entry
+            and entry["sort"][0] < self.horizon[0]
+        ):
+            return None
+
+        new_line = entry["_source"]
+        if "sort" in entry:
+            entry_timestamp = entry["sort"][0]
+        else:
+            entry_timestamp = to_epoch_millis(new_line[self.timestamp_field])
+        self.entry_tracker.add(entry_id, entry_timestamp)
+        return new_line
+
+    def get_checkpoint(self):
+        """
+        :return: The state needed to resume following without emitting lines twice,
+            as a JSON-serializable dictionary.
+        """
+        return {
+            "cursor": self.cursor,
+            "entries": [
+                [entry_id, entry_timestamp]
+                for entry_id, entry_timestamp in self.entry_tracker.items()
+            ],
+        }
+
+    def restore_checkpoint(self, checkpoint):
+        """
+        Restores a state created by ``get_checkpoint``.
+        :param checkpoint: The dictionary returned by ``get_checkpoint``.
+        """
+        self.cursor = checkpoint.get("cursor")
+        for entry_id, entry_timestamp in checkpoint.get("entries", []):
+            self.entry_tracker.add(entry_id, entry_timestamp)
+
+    def prune_before(self, timestamp):
+        """
+        Removes All entries before  ``timestamp`` from the internal buffer.
+        :param timestamp: All entries in the internal before this timestamp will be removed.
+        """
+        self.entry_tracker.prune_before(timestamp)
+
+
+class ElasticsearchFollow(BaseElasticsearchFollow):
+    def __init__(
+        self,
+        elasticsearch,
+        timestamp_field="@timestamp",
+        query_string=None,
+        use_cursor=False,
+        cursor_overlap=DEFAULT_CURSOR_OVERLAP,
+        source_fields=None,
+        entry_tracker=None,
+        page_size=None,
+    ):
+        """
+        :param elasticsearch: elasticsearch instance from the ``elasticsearch``-library.
+        :param timestamp_field: Denotes which field in the elasticsearch-index is used
+            as the timestamp.
+        :param query_string: The query used to fetch data from Elasticsearch.
+        :param use_cursor: If True, remember the timestamp of the newest entry and only
+            fetch entries from it on, paging via ``search_after``, instead of scrolling
+            through the whole time window on every call. Entries fetched again are
+            skipped by the ``entry_tracker``.
+        :param cursor_overlap: Number of seconds before the cursor which are fetched
+            again to pick up entries which arrived late. Only used with ``use_cursor``.
+            Defaults to 5 seconds, it should be shorter than the time the entries are
+            tracked.
+        :param source_fields: The fields of ``_source`` to fetch, e.g. the ``fields`` of
+            a processor. The timestamp field is always fetched. All fields are fetched
+            if None.
+        :param entry_tracker: Keeps track of the entries already returned. Defaults to
+            an EntryTracker, a CompactEntryTracker needs less memory for busy indices.
+        :param page_size: Number of hits per page, or a PageSize deciding it, e.g. an
+            AdaptivePageSize. Defaults to 1000 hits.
+        """
+        super().__init__(
+            elasticsearch,
+            timestamp_field=timestamp_field,
+            query_string=query_string,
+            use_cursor=use_cursor,
+            cursor_overlap=cursor_overlap,
+            source_fields=source_fields,
+            entry_tracker=entry_tracker,
+            page_size=page_size,
+        )
+        self.es_fetch = ElasticsearchFetch(
+            elasticsearch=elasticsearch,
+            timestamp_field=timestamp_field,
+            page_size=self.page_size,
+        )
+
     def get_entries_since(self, index, timestamp):
         """
         Yield all entries since ``timestamp`` until now from ``index``.
@@ -44,13 +302,49 @@ class ElasticsearchFollow:
         :param timestamp: Timestamp from whoch to start fetching lines.
         :return: Yields entries until no entries are left.
         """
-        query_since = deepcopy(self.base_query)
-        query_since["query"]["bool"]["must"].append(
-            {"range": {self.timestamp_field: {"gt": timestamp}}}
-        )
+        for entries in self.get_entry_pages_since(index, timestamp):
+            yield from entries
+
+    def get_entry_pages_since(self, index, timestamp):
+        """
+        Like ``get_entries_since``, but yields the entries page by page.
+
+        :param index: Elasticsearch index from which new entries should
+            be retrieved. Wildcards are supported.
+        :param timestamp: Timestamp from which to start fetching lines.
+        :return: Yields a non-empty list of entries per page.
+        """
+        query_since = self._query_since(timestamp)
+
+        if self.use_cursor and self.cursor is not None:
+            pages = self._get_entry_pages_after_cursor(index, query_since)
+        else:
+            res = self.es.search(
+                index=index, scroll="2m", body=query_since, filter_path=FILTER_PATH
+            )
+            pages = self.es_fetch.get_hit_pages(res)
+
+        for hits in pages:
+            self._update_cursor_from(hits)
+            yield hits
+
+    def _get_entry_pages_after_cursor(self, index, query):
+        """
+        Pages through all entries from the cursor on via ``search_after``.
+        """
+        self._restrict_to_cursor(query)
+        boundary = {"timestamp": None, "ids": set()}
+        while True:
+            res = self.es.search(index=index, body=query, filter_path=FILTER_PATH)
+            hits = page_hits(res)
+            self.page_size.record_page(res, hits)
+            new_hits = self._skip_boundary(hits, boundary)
+            if new_hits:
+                yield new_hits
 
-        res = self.es.search(index=index, scroll="2m", body=query_since)
-        yield from self.es_fetch.get_hits(res)
+            if len(hits) < query["size"]:
+                return
+            self._continue_after_page(query, hits, boundary)
 
     def get_new_lines(self, index, timestamp):
         """
@@ -62,27 +356,48 @@ class ElasticsearchFollow:
         :param timestamp: Timestamp from whoch to start fetching lines.
         :return: Yields the new lines until the list is empty.
         """
+        for new_lines in self.get_new_line_pages(index, timestamp):
+            yield from new_lines
+
+    def get_new_line_pages(self, index, timestamp):
+        """
+        Like ``get_new_lines``, but yields the new lines page by page, so they can be
+        processed in batches.
+
+        :param index: Elasticsearch index from which new entries should
+            be retrieved. Wildcards are supported.
+        :param timestamp: Timestamp from which to start fetching lines.
+        :return: Yields a non-empty list of new lines per page.
+        """
         logger.debug(
             "Entering get_new_lines for index '{}' amd timestamp '{}'".format(
                 index, timestamp
             )
         )
-        entries = self.get_entries_since(index, timestamp)
-
-        for entry in entries:
-            entry_id = entry["_id"]
-            if entry_id not in self.entry_tracker:
-                new_line = entry["_source"]
-
-                entry_timestamp = parse(new_line[self.timestamp_field])
-
-                self.entry_tracker.add(entry_id, entry_timestamp)
-                yield new_line
+        for entries in self.get_entry_pages_since(index, timestamp):
+            new_lines = self._track_new_entries(entries)
+            if new_lines:
+                yield new_lines
         logger.debug("Finished yielding new lines.")
 
-    def prune_before(self, timestamp):
+    def get_last_lines(self, index, number_of_lines):
         """
-        Removes All entries before  ``timestamp`` from the internal buffer.
-        :param timestamp: All entries in the internal before this timestamp will be removed.
+        Retrieves the newest ``number_of_lines`` lines with a single descending,
+        size-limited query. The lines are tracked like the lines of ``get_new_lines``
+        and entries older than them are skipped by subsequent calls of
+        ``get_new_lines``, so following can continue seamlessly.
+
+        :param index: Elasticsearch index from which the lines should be retrieved.
+            Wildcards are supported.
+        :param number_of_lines: The number of lines to retrieve.
+        :return: Yields the lines ordered from oldest to newest.
         """
-        self.entry_tracker.prune_before(timestamp)
+        if number_of_lines <= 0:
+            return
+
+        res = self.es.search(
+            index=index,
+            body=self._query_last(number_of_lines),
+            filter_path=FILTER_PATH,
+        )
+        yield from self._track_last_entries(page_hits(res))
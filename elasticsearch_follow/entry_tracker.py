@@ -1,20 +1,9 @@
+import hashlib
 import heapq
-from functools import total_ordering
+import math
+from array import array
 
-import pytz
-
-
-@total_ordering
-class Entry:
-    def __init__(self, timestamp, entry_id):
-        self.timestamp = timestamp
-        self.entry_id = entry_id
-
-    def __eq__(self, other):
-        return (self.timestamp, self.entry_id) == (other.timestamp, other.entry_id)
-
-    def __lt__(self, other):
-        return self.timestamp < other.timestamp
+from .timestamps import to_epoch_millis
 
 
 class EntryTracker:
@@ -22,30 +11,286 @@ class EntryTracker:
         self.added_entries = set()
         self.entries_by_timestamp = []
 
-    def _update_entries_by_timestamp(self, entry_id, entry_timestamp):
-        if not entry_timestamp.tzinfo:
-            entry_timestamp = pytz.utc.localize(entry_timestamp)
-        heapq.heappush(
-            self.entries_by_timestamp,
-            Entry(timestamp=entry_timestamp, entry_id=entry_id),
-        )
-
     def prune_before(self, timestamp):
         """
         Removes All entries before  ``timestamp`` from the internal buffer.
         :param timestamp: All entries in the internal before this timestamp will be removed.
+            Either a datetime or milliseconds since the epoch.
         """
-        while len(self.entries_by_timestamp) > 0:
-            oldest_entry = heapq.heappop(self.entries_by_timestamp)
-            if oldest_entry.timestamp <= timestamp:
-                self.added_entries.remove(oldest_entry.entry_id)
-            else:
-                heapq.heappush(self.entries_by_timestamp, oldest_entry)
-                return
+        timestamp = to_epoch_millis(timestamp)
+        entries_by_timestamp = self.entries_by_timestamp
+        while entries_by_timestamp and entries_by_timestamp[0][0] <= timestamp:
+            _, entry_id = heapq.heappop(entries_by_timestamp)
+            self.added_entries.remove(entry_id)
 
     def add(self, entry_id, entry_timestamp):
+        """
+        :param entry_id: The id of the entry.
+        :param entry_timestamp: The timestamp of the entry. Either milliseconds since the
+            epoch, as returned in the sort values by Elasticsearch, or a datetime.
+        """
         self.added_entries.add(entry_id)
-        self._update_entries_by_timestamp(entry_id, entry_timestamp)
+        heapq.heappush(
+            self.entries_by_timestamp, (to_epoch_millis(entry_timestamp), entry_id)
+        )
+
+    def items(self):
+        """
+        :return: All tracked entries as (entry_id, timestamp)-tuples, where the
+            timestamp is given in milliseconds since the epoch.
+        """
+        return [
+            (entry_id, entry_timestamp)
+            for entry_timestamp, entry_id in self.entries_by_timestamp
+        ]
 
     def __contains__(self, key):
         return key in self.added_entries
+
+
+class CompactEntryTracker:
+    def __init__(
+        self,
+        bucket_millis=1000,
+        max_entries=None,
+        false_positive_rate=None,
+        expected_entries_per_bucket=10000,
+    ):
+        """
+        Tracks entries by 64-bit hashes of their ids, grouped into buckets of
+        ``bucket_millis`` milliseconds which are dropped as a whole when pruning.
+        Entries are kept up to one bucket longer than with the EntryTracker.
+
+        :param bucket_millis: Width of a time bucket in milliseconds.
+        :param max_entries: Upper bound of tracked entries. If it is exceeded, the
+            oldest buckets are evicted and counted in ``evictions``. Neither the newest
+            bucket nor the bucket an entry was just added to are evicted, so they may
+            exceed the bound on their own. Unbounded if None.
+        :param false_positive_rate: If given, every bucket stores its entries in a
+            Bloom filter with this false positive rate instead of storing the hashes.
+            Membership is checked against every bucket, so the overall rate grows
+            with the number of buckets. Such a tracker cannot be listed by ``items``
+            and therefore not be saved in a Checkpoint.
+        :param expected_entries_per_bucket: Number of entries each Bloom filter is
+            sized for. Only used with ``false_positive_rate``.
+        """
+        self.bucket_millis = bucket_millis
+        self.max_entries = max_entries
+        self.false_positive_rate = false_positive_rate
+        self.expected_entries_per_bucket = expected_entries_per_bucket
+
+        self.buckets = {}
+        self.bucket_sizes = {}
+        self.hashes = HashCounter()
+        self.size = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _hash(entry_id):
+        if isinstance(entry_id, int):
+            return entry_id
+        digest = hashlib.blake2b(entry_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    def add(self, entry_id, entry_timestamp):
+        """
+        :param entry_id: The id of the entry. Integers are taken as already hashed ids,
+            as returned by ``items``.
+        :param entry_timestamp: The timestamp of the entry. Either milliseconds since the
+            epoch or a datetime.
+        """
+        entry_hash = self._hash(entry_id)
+        bucket_key = to_epoch_millis(entry_timestamp) // self.bucket_millis
+
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._new_bucket()
+            self.buckets[bucket_key] = bucket
+            self.bucket_sizes[bucket_key] = 0
+
+        if self.false_positive_rate:
+            bucket.add(entry_hash)
+        else:
+            bucket.append(entry_hash)
+            self.hashes.add(entry_hash)
+        self.bucket_sizes[bucket_key] += 1
+        self.size += 1
+
+        if self.max_entries:
+            newest = max(self.buckets)
+            while self.size > self.max_entries:
+                oldest = min(
+                    (key for key in self.buckets if key not in (bucket_key, newest)),
+                    default=None,
+                )
+                if oldest is None:
+                    break
+                self.evictions += self._drop_bucket(oldest)
+
+    def _new_bucket(self):
+        if self.false_positive_rate:
+            return BloomFilter(
+                self.expected_entries_per_bucket, self.false_positive_rate
+            )
+        return array("Q")
+
+    def _drop_bucket(self, bucket_key):
+        bucket = self.buckets.pop(bucket_key)
+        bucket_size = self.bucket_sizes.pop(bucket_key)
+        if not self.false_positive_rate:
+            for entry_hash in bucket:
+                self.hashes.remove(entry_hash)
+        self.size -= bucket_size
+        return bucket_size
+
+    def prune_before(self, timestamp):
+        """
+        Removes all buckets which only contain entries before ``timestamp``.
+        :param timestamp: Either a datetime or milliseconds since the epoch.
+        """
+        last_bucket_to_drop = (to_epoch_millis(timestamp) + 1) // self.bucket_millis - 1
+        for bucket_key in sorted(self.buckets):
+            if bucket_key > last_bucket_to_drop:
+                return
+            self._drop_bucket(bucket_key)
+
+    def items(self):
+        """
+        :return: All tracked entries as (hashed entry_id, timestamp)-tuples. The
+            timestamp is the start of the bucket of the entry.
+        :raises ValueError: If the entries are tracked in Bloom filters, which cannot
+            be listed.
+        """
+        if self.false_positive_rate:
+            raise ValueError(
+                "Entries tracked in Bloom filters cannot be listed or checkpointed."
+            )
+        return [
+            (entry_hash, bucket_key * self.bucket_millis)
+            for bucket_key, bucket in sorted(self.buckets.items())
+            for entry_hash in bucket
+        ]
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        entry_hash = self._hash(key)
+        if not self.false_positive_rate:
+            return entry_hash in self.hashes
+        return any(entry_hash in bucket for bucket in self.buckets.values())
+
+
+class HashCounter:
+    EMPTY = 0
+    MIN_CAPACITY = 1024
+    MAX_LOAD = 0.75
+
+    def __init__(self, capacity=MIN_CAPACITY):
+        """
+        Counts 64-bit hashes in an open addressing hash table backed by arrays, which
+        needs 16 to 32 bytes per hash instead of the objects of a ``set``. A hash
+        stays a member until it was removed as often as it was added.
+
+        :param capacity: Initial number of slots, a power of two.
+        """
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.mask = capacity - 1
+        self.keys = array("Q", bytes(8 * capacity))
+        self.counts = array("I", bytes(4 * capacity))
+        self.resize_at = int(capacity * HashCounter.MAX_LOAD)
+        self.used_slots = 0
+        self.members = 0
+
+    def _find(self, key):
+        """
+        :return: The slot holding ``key``, or the empty slot ending its probe sequence.
+        """
+        keys = self.keys
+        mask = self.mask
+        slot = key & mask
+        current = keys[slot]
+        while current != key and current != HashCounter.EMPTY:
+            slot = (slot + 1) & mask
+            current = keys[slot]
+        return slot
+
+    def add(self, entry_hash):
+        # Zero marks an empty slot, so it is stored as one.
+        key = entry_hash or 1
+        slot = self._find(key)
+        if self.keys[slot] == HashCounter.EMPTY:
+            self.keys[slot] = key
+            self.used_slots += 1
+        counts = self.counts
+        if not counts[slot]:
+            self.members += 1
+        counts[slot] += 1
+
+        if self.used_slots > self.resize_at:
+            self._resize()
+
+    def remove(self, entry_hash):
+        """
+        Removes one occurrence of ``entry_hash``. Emptied slots stay occupied by the
+        key, so probe sequences are not interrupted, until the table is resized.
+        """
+        slot = self._find(entry_hash or 1)
+        counts = self.counts
+        if counts[slot]:
+            counts[slot] -= 1
+            if not counts[slot]:
+                self.members -= 1
+
+    def _resize(self):
+        entries = [(key, count) for key, count in zip(self.keys, self.counts) if count]
+        capacity = HashCounter.MIN_CAPACITY
+        while capacity * HashCounter.MAX_LOAD < 2 * len(entries):
+            capacity *= 2
+        self._allocate(capacity)
+        keys = self.keys
+        counts = self.counts
+        for key, count in entries:
+            slot = self._find(key)
+            keys[slot] = key
+            counts[slot] = count
+        self.used_slots = self.members = len(entries)
+
+    def __contains__(self, entry_hash):
+        return self.counts[self._find(entry_hash or 1)] > 0
+
+    def __len__(self):
+        return self.members
+
+
+class BloomFilter:
+    def __init__(self, capacity, false_positive_rate):
+        """
+        :param capacity: Number of entries the filter is sized for.
+        :param false_positive_rate: False positive rate at ``capacity`` entries.
+        """
+        self.number_of_bits = max(
+            8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.number_of_hashes = max(
+            1, round(self.number_of_bits / capacity * math.log(2))
+        )
+        self.bits = bytearray((self.number_of_bits + 7) // 8)
+
+    def _positions(self, entry_hash):
+        first = entry_hash & 0xFFFFFFFF
+        second = entry_hash >> 32
+        for i in range(self.number_of_hashes):
+            yield (first + i * second) % self.number_of_bits
+
+    def add(self, entry_hash):
+        for position in self._positions(entry_hash):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, entry_hash):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(entry_hash)
+        )
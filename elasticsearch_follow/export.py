@@ -0,0 +1,425 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+
+from .checkpoint import write_json_atomically
+from .processing import batched
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 10000
+EXPORT_STATE_VERSION = 2
+
+
+class Exporter:
+    def __init__(self, elasticsearch_fetch, writer, state_path=None, batch_size=None):
+        """
+        Streams the ``_source`` of the documents of a search into a file. At most
+        ``batch_size`` documents are held in memory, each batch is written at once.
+
+        After each batch, the position in the file and a cursor of the last exported
+        document are saved to ``state_path``. An interrupted export continues from
+        there when it is started again with the same arguments. The cursor consists
+        of the timestamp of the last document and the ids of the documents exported
+        with that timestamp, as sort values with a tiebreaker are only valid within
+        one point in time. The state is removed once the export is complete. A state
+        saved by an export with other arguments or another format is refused.
+
+        :param elasticsearch_fetch: The ElasticsearchFetch to search with.
+        :param writer: The writer of the file, e.g. an NdjsonWriter.
+        :param state_path: The file the state of the export is saved to. The export
+            cannot be resumed if None, or if the writer has no ``state``, e.g. the
+            ParquetWriter.
+        :param batch_size: Number of documents written at once. Defaults to 10000.
+        """
+        self.es_fetch = elasticsearch_fetch
+        self.writer = writer
+        self.state_path = state_path if hasattr(type(writer), "state") else None
+        self.batch_size = batch_size if batch_size else EXPORT_BATCH_SIZE
+
+    def export(self, index, query_string=None, from_time=None, to_time=None):
+        """
+        Exports the documents of a search, ordered by timestamp.
+
+        :param index: The index to search in. May contain wildcards.
+        :param query_string: The query string.
+        :param to_time: Upper bound of time to query.
+        :param from_time: Lower bound of time to query.
+        :return: The number of documents written.
+        """
+        arguments = {
+            "index": index,
+            "query_string": query_string,
+            "from_time": from_time,
+            "to_time": to_time,
+            "writer": self.writer.settings(),
+        }
+        state = self._load_state(arguments)
+        if state:
+            logger.debug(
+                "Resuming export at timestamp {} with {} documents written".format(
+                    state["timestamp"], state["documents"]
+                )
+            )
+            self.writer.open(state["writer"])
+        else:
+            state = {
+                "arguments": arguments,
+                "timestamp": None,
+                "ids": [],
+                "documents": 0,
+            }
+            self.writer.open()
+
+        written = 0
+        try:
+            hits = self._skip_exported(
+                self.es_fetch.search_hits(
+                    index,
+                    query_string,
+                    from_time,
+                    to_time,
+                    from_millis=state["timestamp"],
+                ),
+                state,
+            )
+            for batch in batched(hits, self.batch_size):
+                self.writer.write_batch([hit["_source"] for hit in batch])
+                written += len(batch)
+                self._advance(state, batch)
+                self._save_state(state)
+        finally:
+            self.writer.close()
+
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        logger.debug("Exported {} documents".format(written))
+        return written
+
+    @staticmethod
+    def _skip_exported(hits, state):
+        """
+        Skips the documents sharing the timestamp of the cursor which were exported
+        before.
+        """
+        exported_ids = set(state["ids"])
+        for hit in hits:
+            if exported_ids:
+                if hit["sort"][0] == state["timestamp"]:
+                    if hit["_id"] in exported_ids:
+                        continue
+                else:
+                    exported_ids = None
+            yield hit
+
+    def _advance(self, state, batch):
+        timestamp = batch[-1]["sort"][0]
+        ids = [hit["_id"] for hit in batch if hit["sort"][0] == timestamp]
+        if timestamp == state["timestamp"]:
+            ids = state["ids"] + ids
+        state["timestamp"] = timestamp
+        state["ids"] = ids
+        state["documents"] += len(batch)
+
+    def _save_state(self, state):
+        if not self.state_path:
+            return
+        state = dict(state, writer=self.writer.state())
+        state["version"] = EXPORT_STATE_VERSION
+        write_json_atomically(self.state_path, state)
+
+    def _load_state(self, arguments):
+        if not self.state_path:
+            return None
+        try:
+            with open(self.state_path) as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return None
+
+        if state.get("version") != EXPORT_STATE_VERSION:
+            raise ValueError(
+                "Export state '{}' has the unknown version '{}'".format(
+                    self.state_path, state.get("version")
+                )
+            )
+        if state.get("arguments") != arguments:
+            raise ValueError(
+                "Export state '{}' belongs to an export with other arguments, "
+                "remove it to start again.".format(self.state_path)
+            )
+        return state
+
+
+class NdjsonWriter:
+    def __init__(self, path, compression=None):
+        """
+        Writes one JSON document per line.
+
+        :param path: The file to write to.
+        :param compression: ``gzip``, ``zstd`` or None. Each batch is compressed
+            separately, which results in a valid file of concatenated gzip members or
+            zstd frames. The ``zstandard`` package is needed for ``zstd``.
+        """
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError("Unknown compression '{}'".format(compression))
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("Compressing with zstd requires 'zstandard'.")
+
+        self.path = path
+        self.compression = compression
+        self.file = None
+
+    def open(self, state=None):
+        """
+        Opens the file, either empty or continuing a previous export.
+
+        :param state: The state of a previous export as returned by ``state``. The
+            file is truncated to its position, as batches written after the state was
+            saved are written again.
+        """
+        self.file = _open_truncated(self.path, state["offset"] if state else 0)
+
+    def write_batch(self, documents):
+        """
+        Writes a batch of documents and flushes it to disk.
+        """
+        data = "".join(
+            json.dumps(document, separators=(",", ":")) + "\n" for document in documents
+        ).encode("utf-8")
+        _write_synced(self.file, self._compress(data))
+
+    def _compress(self, data):
+        if self.compression == "gzip":
+            return gzip.compress(data)
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return data
+
+    def settings(self):
+        """
+        :return: The settings which have to match to continue a previous export.
+        """
+        return {"format": "ndjson", "compression": self.compression}
+
+    def state(self):
+        """
+        :return: What is needed to continue writing after the last batch.
+        """
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class CsvWriter:
+    def __init__(self, path, columns=None):
+        """
+        Writes one row per document. Nested fields are flattened into columns with
+        dotted names, lists and objects are written as JSON.
+
+        :param path: The file to write to.
+        :param columns: The columns to write. Defaults to the fields found in the
+            first batch. Fields missing from the columns are not written.
+        """
+        self.path = path
+        self.columns = list(columns) if columns else None
+        self.file = None
+
+    def open(self, state=None):
+        """
+        Opens the file, either empty or continuing a previous export.
+
+        :param state: The state of a previous export as returned by ``state``.
+        """
+        if state:
+            self.columns = state["columns"]
+        self.file = _open_truncated(self.path, state["offset"] if state else 0)
+
+    def write_batch(self, documents):
+        """
+        Writes a batch of documents and flushes it to disk. The header is written
+        with the first batch.
+        """
+        rows = [flatten(document) for document in documents]
+        output = io.StringIO()
+        writer = csv.writer(output)
+        if self.file.tell() == 0:
+            if self.columns is None:
+                self.columns = sorted({column for row in rows for column in row})
+            writer.writerow(self.columns)
+
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in self.columns])
+        _write_synced(self.file, output.getvalue().encode("utf-8"))
+
+    def settings(self):
+        """
+        :return: The settings which have to match to continue a previous export.
+        """
+        return {"format": "csv", "columns": self.columns}
+
+    def state(self):
+        """
+        :return: What is needed to continue writing after the last batch.
+        """
+        return {"offset": self.file.tell(), "columns": self.columns}
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class ParquetWriter:
+    def __init__(self, path, schema=None):
+        """
+        Writes each batch as a row group of a Parquet file. Nested fields are
+        flattened into columns with dotted names. Requires ``pyarrow``.
+
+        Without a ``schema``, the columns and their types are inferred from the first
+        batch. Fields without a type there, e.g. which are only null or empty
+        objects, and fields of varying types are written as strings. Fields missing
+        from the schema are not written.
+
+        A Parquet file is only readable once its footer is written on close, so an
+        interrupted export cannot be resumed and no state is saved for it.
+
+        :param path: The file to write to.
+        :param schema: The ``pyarrow.Schema`` of the file.
+        """
+        if pyarrow is None:
+            raise ImportError("Exporting to Parquet requires 'pyarrow'.")
+        self.path = path
+        self.writer = None
+        self.schema = schema
+
+    def open(self):
+        """
+        Does nothing, the file is created with the first batch once its schema is
+        known.
+        """
+
+    def write_batch(self, documents):
+        """
+        Writes a batch of documents as a row group.
+        """
+        rows = [flatten(document) for document in documents]
+        if self.schema is None:
+            self.schema = _infer_schema(rows)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(_parquet_table(rows, self.schema))
+
+    def settings(self):
+        return {"format": "parquet"}
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+
+def flatten(document, prefix=""):
+    """
+    :return: The fields of ``document`` with nested objects flattened into dotted
+        names, e.g. ``{"kubernetes.pod.name": ...}``.
+    """
+    fields = {}
+    for key, value in document.items():
+        name = prefix + key
+        if isinstance(value, dict) and value:
+            fields.update(flatten(value, name + "."))
+        else:
+            fields[name] = value
+    return fields
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _infer_schema(rows):
+    fields = []
+    columns = {column: None for row in rows for column in row}
+    for column in columns:
+        try:
+            data_type = pyarrow.array([row.get(column) for row in rows]).type
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            data_type = pyarrow.string()
+        if _is_untyped(data_type):
+            data_type = pyarrow.string()
+        fields.append(pyarrow.field(column, data_type))
+    return pyarrow.schema(fields)
+
+
+def _is_untyped(data_type):
+    """
+    :return: True if ``data_type`` is or contains the type of null values or of
+        empty objects, which values found later on would not fit into.
+    """
+    if pyarrow.types.is_null(data_type):
+        return True
+    if pyarrow.types.is_struct(data_type):
+        fields = [data_type[index] for index in range(data_type.num_fields)]
+        return not fields or any(_is_untyped(field.type) for field in fields)
+    if pyarrow.types.is_list(data_type) or pyarrow.types.is_large_list(data_type):
+        return _is_untyped(data_type.value_type)
+    return False
+
+
+def _parquet_table(rows, schema):
+    columns = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pyarrow.types.is_string(field.type):
+            values = [_string_value(value) for value in values]
+        try:
+            columns.append(pyarrow.array(values, type=field.type))
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+            raise ValueError(
+                "Field '{}' does not fit the type '{}' of the Parquet schema, pass a "
+                "schema fitting all documents: {}".format(field.name, field.type, e)
+            )
+    return pyarrow.Table.from_arrays(columns, schema=schema)
+
+
+def _string_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _open_truncated(path, offset):
+    if not offset:
+        return open(path, "wb")
+    export_file = open(path, "r+b")
+    export_file.truncate(offset)
+    export_file.seek(offset)
+    return export_file
+
+
+def _write_synced(export_file, data):
+    export_file.write(data)
+    export_file.flush()
+    os.fsync(export_file.fileno())
@@ -2,35 +2,128 @@ import datetime
 
 from dateutil import tz
 
+from .poll_scheduler import PollScheduler
+from .processing import BATCH_SIZE, batched, process_batches, process_lines
 
-class Follower:
-    def __init__(self, elasticsearch_follow, index, time_delta=60, processor=None):
+
+class BaseFollower:
+    def __init__(
+        self,
+        elasticsearch_follow,
+        index,
+        time_delta=60,
+        processor=None,
+        scheduler=None,
+        checkpoint=None,
+        batch_size=BATCH_SIZE,
+    ):
         """
+        Configuration, checkpointing and processing shared by Follower and
+        AsyncFollower.
+
         :param elasticsearch_follow: The instance of ElasticsearchFollow to use for yielding new lines.
         :param index: The index to use to fetch data.
         :param time_delta: Denotes how many seconds to look into the past when fetching lines.
         :param processor: The log processor which should be used to process the lines before yielding them.
+        :param scheduler: Decides how long to wait between two polls. Defaults to a
+            PollScheduler waiting 0.1 seconds.
+        :param checkpoint: A Checkpoint the state of ``elasticsearch_follow`` is restored
+            from on creation and saved to by ``save_checkpoint``.
+        :param batch_size: Maximum number of lines handed to the processor at once.
         """
         self.elasticsearch_follow = elasticsearch_follow
         self.index = index
         self.time_delta = time_delta
         self.processor = processor
+        self.scheduler = scheduler if scheduler else PollScheduler()
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.lines_in_poll = 0
 
-    def generator(self):
+        if self.checkpoint:
+            self.checkpoint.restore(self.elasticsearch_follow, self.index)
+
+    def save_checkpoint(self, force=False):
         """
-        Creates a generator which will yield new lines until the most recent query has no more lines.
-        :return: A generator.
+        Saves the state of ``elasticsearch_follow`` to the checkpoint, if any. Call it
+        once the lines of a generator were written, e.g. flushed to the output, as the
+        lines marked as seen in the checkpoint are not yielded again after a restart.
+
+        :param force: Save regardless of the interval of the checkpoint.
+        """
+        if self.checkpoint:
+            self.checkpoint.save(self.elasticsearch_follow, self.index, force=force)
+
+    def _count_lines(self, lines):
+        """
+        Adds ``lines`` to the number of lines of the current poll, which is reported
+        to the scheduler once the poll is done.
+        :return: The lines.
+        """
+        self.lines_in_poll += len(lines)
+        return lines
+
+    def _poll_start(self):
+        """
+        Prunes the entries which left the time window before polling.
+        :return: The timestamp from which on to poll.
         """
         now = datetime.datetime.utcnow()
         now = now.replace(tzinfo=tz.UTC)
         delta = datetime.timedelta(seconds=self.time_delta)
 
-        for line in self.elasticsearch_follow.get_new_lines(self.index, now - delta):
-            self.elasticsearch_follow.prune_before(now - delta)
+        self.elasticsearch_follow.prune_before(now - delta)
+        return now - delta
+
+    def _process_lines(self, lines):
+        """
+        :return: The lines as processed by the processor, without the lines it skipped.
+        """
+        if not self.processor:
+            return lines
+        return process_lines(self.processor, lines)
+
 
-            if self.processor:
-                processed_line = self.processor.process_line(line)
-                if processed_line:
-                    yield processed_line
-            else:
-                yield line
+class Follower(BaseFollower):
+    def generator(self):
+        """
+        Creates a generator which will yield new lines until the most recent query has no more lines.
+        :return: A generator.
+        """
+        self.lines_in_poll = 0
+        batches = map(self._count_lines, batched(self.new_lines(), self.batch_size))
+        if self.processor:
+            for processed_lines in process_batches(self.processor, batches):
+                yield from processed_lines
+        else:
+            for lines in batches:
+                yield from lines
+
+        self.scheduler.record_poll(self.lines_in_poll)
+
+    def new_lines(self):
+        """
+        Yields the new, unprocessed lines of one poll. Entries which left the time
+        window are pruned once before polling.
+        :return: A generator.
+        """
+        timestamp = self._poll_start()
+        yield from self.elasticsearch_follow.get_new_lines(self.index, timestamp)
+
+    def last_lines(self, number_of_lines):
+        """
+        Yields the newest ``number_of_lines`` lines, regardless of ``time_delta``.
+        Subsequent generators only yield lines newer than these.
+        :param number_of_lines: The number of lines to yield.
+        :return: A generator.
+        """
+        lines = list(
+            self.elasticsearch_follow.get_last_lines(self.index, number_of_lines)
+        )
+        yield from self._process_lines(lines)
+
+    def wait(self):
+        """
+        Blocks until the next generator should be created, as decided by the scheduler.
+        """
+        self.scheduler.wait()
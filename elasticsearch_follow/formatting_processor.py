@@ -1,20 +1,207 @@
 import string
 
+MISSING = ""
 
-class DefaultValueFormatter(string.Formatter):
-    def get_field(self, field_name, args, kwargs):
-        try:
-            val = super(DefaultValueFormatter, self).get_field(field_name, args, kwargs)
-        except (KeyError, AttributeError):
-            val = "", field_name
-        return val
+CONVERSIONS = {"r": repr, "s": str, "a": ascii}
 
 
 class FormattingProcessor:
     def __init__(self, format_string):
-        self.fmt = DefaultValueFormatter()
+        """
+        Formats lines with ``format_string``, which is compiled once into a renderer.
+        Fields missing in a line are rendered as empty strings. Nested fields can be
+        referenced as ``{kv[nested][field]}`` or ``{kv.nested.field}``.
+
+        :param format_string: The format string in the syntax of ``str.format``.
+        """
         self.format_string = format_string
+        self.fields = _referenced_fields(format_string) if format_string else None
+        self.render = _compile(format_string) if format_string else None
+
+    def __getstate__(self):
+        return {"format_string": self.format_string}
+
+    def __setstate__(self, state):
+        self.__init__(state["format_string"])
 
     def process_line(self, line):
-        if self.format_string:
-            return self.fmt.format(self.format_string, **line)
+        if self.render:
+            return self.render(line)
+
+    def process_lines(self, lines):
+        render = self.render
+        if not render:
+            return [None] * len(lines)
+        return [render(line) for line in lines]
+
+
+def _compile(format_string):
+    """
+    :return: A function rendering ``format_string`` for a line. The literal text is
+        kept in a template list in which only the fields are replaced per line.
+    """
+    template = []
+    fields = []
+    for literal_text, field_name, format_spec, conversion in string.Formatter().parse(
+        format_string
+    ):
+        if literal_text:
+            template.append(literal_text)
+        if field_name is not None:
+            fields.append(
+                (len(template), _compile_field(field_name, format_spec, conversion))
+            )
+            template.append(None)
+
+    if not fields:
+        text = "".join(template)
+        return lambda line: text
+
+    def render(line):
+        parts = template[:]
+        for position, render_field in fields:
+            parts[position] = render_field(line)
+        return "".join(parts)
+
+    return render
+
+
+def _compile_field(field_name, format_spec, conversion):
+    get_value = _field_getter(field_name)
+
+    if conversion is None:
+        convert = None
+    elif conversion in CONVERSIONS:
+        convert = CONVERSIONS[conversion]
+    else:
+        raise ValueError(
+            "Unknown conversion specifier {} in '{}'".format(conversion, field_name)
+        )
+
+    if format_spec and "{" in format_spec:
+        render_format_spec = _compile(format_spec)
+    else:
+        render_format_spec = None
+
+    if convert is None and render_format_spec is None:
+        return lambda line: format(get_value(line), format_spec)
+
+    def render_field(line):
+        value = get_value(line)
+        if convert is not None:
+            value = convert(value)
+        if render_format_spec is not None:
+            return format(value, render_format_spec(line))
+        return format(value, format_spec)
+
+    return render_field
+
+
+def _field_getter(field_name):
+    """
+    :return: A function returning the value of ``field_name`` in a line, or an empty
+        string if it is missing. Attributes are looked up as keys, so
+        ``kubernetes.pod.name`` works for nested dictionaries. Keys containing dots,
+        as Elasticsearch allows them in ``_source``, are found as well.
+    """
+    first, rest = _split_field_name(field_name)
+    path = [(key, is_attribute) for is_attribute, key in rest]
+
+    if not path:
+        return lambda line: line.get(first, MISSING)
+
+    def get_value(line):
+        if field_name in line:
+            return line[field_name]
+        if first not in line:
+            return MISSING
+
+        value = line[first]
+        for key, is_attribute in path:
+            try:
+                value = value[key]
+            except (KeyError, IndexError, TypeError):
+                if not is_attribute:
+                    return MISSING
+                try:
+                    value = getattr(value, key)
+                except AttributeError:
+                    return MISSING
+        return value
+
+    return get_value
+
+
+def _referenced_fields(format_string):
+    """
+    :return: The dotted paths of all fields referenced in ``format_string``,
+        e.g. ``kv.nested`` for ``{kv[nested]}``.
+    """
+    fields = []
+    for _, field_name, format_spec, _ in string.Formatter().parse(format_string):
+        if field_name:
+            path = _field_path(field_name)
+            if path and path not in fields:
+                fields.append(path)
+        if format_spec:
+            for path in _referenced_fields(format_spec):
+                if path not in fields:
+                    fields.append(path)
+    return fields
+
+
+def _field_path(field_name):
+    first, rest = _split_field_name(field_name)
+    if not isinstance(first, str):
+        return None
+
+    keys = [first]
+    for _, key in rest:
+        if not isinstance(key, str):
+            break
+        keys.append(key)
+    return ".".join(keys)
+
+
+def _split_field_name(field_name):
+    """
+    Splits ``field_name`` like ``str.format`` does, e.g. ``kv[nested].field`` into
+    ``kv`` and the keys ``[(False, "nested"), (True, "field")]``, each marked whether
+    it is an attribute. The first name and the keys in brackets are returned as
+    integers if they consist of digits.
+    """
+    position = _next_separator(field_name, 0)
+    first = _as_index(field_name[:position])
+    rest = []
+    while position < len(field_name):
+        if field_name[position] == ".":
+            end = _next_separator(field_name, position + 1)
+            key = field_name[position + 1 : end]
+            if not key:
+                raise ValueError("Empty attribute in format string")
+            rest.append((True, key))
+        else:
+            end = field_name.find("]", position)
+            if end < 0:
+                raise ValueError("Missing ']' in format string")
+            key = field_name[position + 1 : end]
+            if not key:
+                raise ValueError("Empty attribute in format string")
+            rest.append((False, _as_index(key)))
+            end += 1
+            if end < len(field_name) and field_name[end] not in ".[":
+                raise ValueError(
+                    "Only '.' or '[' may follow ']' in format field specifier"
+                )
+        position = end
+    return first, rest
+
+
+def _next_separator(field_name, start):
+    separators = [field_name.find(separator, start) for separator in ".["]
+    separators = [position for position in separators if position >= 0]
+    return min(separators) if separators else len(field_name)
+
+
+def _as_index(key):
+    return int(key) if key.isdecimal() else key
@@ -0,0 +1,62 @@
+DEFAULT_WIDTH = 50
+
+CALENDAR_INTERVALS = {
+    "minute",
+    "1m",
+    "hour",
+    "1h",
+    "day",
+    "1d",
+    "week",
+    "1w",
+    "month",
+    "1M",
+    "quarter",
+    "1q",
+    "year",
+    "1y",
+}
+
+
+def date_histogram_interval(interval):
+    """
+    :param interval: An interval like ``5m``, ``1h`` or ``month``.
+    :return: The interval parameter of a ``date_histogram`` aggregation. Months,
+        quarters and years only exist as calendar intervals, multiples of the other
+        units only as fixed intervals. Both parameters require Elasticsearch 7.2.
+    """
+    if interval in CALENDAR_INTERVALS:
+        return {"calendar_interval": interval}
+    return {"fixed_interval": interval}
+
+
+def render_histogram(buckets, width=DEFAULT_WIDTH):
+    """
+    Renders buckets of a ``date_histogram`` aggregation as text, one line per bucket
+    with its time, its number of documents and a bar.
+
+    :param buckets: The buckets, each with ``key_as_string`` and ``doc_count``.
+    :param width: Number of characters of the longest bar.
+    :return: A list of lines.
+    """
+    if not buckets:
+        return []
+
+    label_width = max(len(bucket["key_as_string"]) for bucket in buckets)
+    max_count = max(bucket["doc_count"] for bucket in buckets)
+    count_width = len(str(max_count))
+
+    lines = []
+    for bucket in buckets:
+        count = bucket["doc_count"]
+        bar_length = round(count * width / max_count) if max_count else 0
+        if count and not bar_length:
+            bar_length = 1
+        lines.append(
+            "{} {} {}".format(
+                bucket["key_as_string"].ljust(label_width),
+                str(count).rjust(count_width),
+                "#" * bar_length,
+            ).rstrip()
+        )
+    return lines
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+from .timestamps import to_epoch_millis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MIN_AGE = 3600
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".hits.gz"
+MILLIS_PER_DAY = 86400 * 1000
+
+DATE_ONLY = re.compile(r"\d{4}-\d{2}-\d{2}$")
+
+
+class HitCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, min_age=DEFAULT_MIN_AGE):
+        """
+        Stores the hits of searches over time ranges which ended in the past in
+        local files, so repeating such a search does not query the cluster again.
+
+        Each search is stored as a gzip-compressed file with one JSON list of hits
+        per page. Once the files exceed ``max_bytes``, the least recently used ones
+        are removed.
+
+        :param directory: The directory holding the cache files. It is created if
+            missing.
+        :param max_bytes: Upper bound of the size of all cache files in bytes.
+        :param min_age: Number of seconds a time range must have ended before it is
+            cached, so documents which are ingested late are not missed.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        os.makedirs(directory, exist_ok=True)
+
+    def is_cacheable(self, from_time, to_time):
+        """
+        :return: True if the time range is given by absolute timestamps and ended at
+            least ``min_age`` seconds ago. Ranges relative to ``now`` are not cached,
+            as they cover different documents on every search. Neither are strings of
+            digits, as Elasticsearch reads them as years or as epoch milliseconds
+            depending on their length and the format of the field.
+        """
+        if to_time is None:
+            return False
+        from_millis = _absolute_millis(from_time) if from_time is not None else 0
+        to_millis = _absolute_millis(to_time, round_up=True)
+        if from_millis is None or to_millis is None:
+            return False
+        return to_millis <= (time.time() - self.min_age) * 1000
+
+    def key(self, cluster, index, query):
+        """
+        :param cluster: Identifies the cluster, e.g. its uuid.
+        :param index: The index searched in.
+        :param query: The query of the search. Its ``size`` and the ids of points in
+            time or scrolls are ignored.
+        :return: The key of the search in the cache.
+        """
+        query = {
+            field: value
+            for field, value in query.items()
+            if field not in ("size", "pit", "search_after")
+        }
+        identity = json.dumps(
+            [CACHE_VERSION, cluster, index, query],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def get_pages(self, key):
+        """
+        :param key: The key of the search.
+        :return: A generator of the cached pages of hits, or None if the search is not
+            cached.
+        """
+        path = self._path(key)
+        try:
+            cache_file = gzip.open(path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+        logger.debug("Serving hits from cache file '{}'".format(path))
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return self._read_pages(cache_file)
+
+    @staticmethod
+    def _read_pages(cache_file):
+        with cache_file:
+            for line in cache_file:
+                yield json.loads(line)
+
+    def store_pages(self, key, pages):
+        """
+        Yields ``pages`` while writing them to the cache. The search is only stored
+        once all pages were consumed.
+
+        :param key: The key of the search.
+        :param pages: An iterable of pages of hits.
+        :return: Yields the pages.
+        """
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=self.directory, prefix=".partial-"
+        )
+        os.close(file_descriptor)
+        complete = False
+        try:
+            with gzip.open(temporary_path, "wt", encoding="utf-8") as cache_file:
+                for hits in pages:
+                    cache_file.write(json.dumps(hits, separators=(",", ":")) + "\n")
+                    yield hits
+            os.replace(temporary_path, self._path(key))
+            complete = True
+        finally:
+            if not complete:
+                os.unlink(temporary_path)
+
+        logger.debug("Stored hits in cache file '{}'".format(self._path(key)))
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used cache files until all of them fit into
+        ``max_bytes``.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                status = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.debug("Evicting cache file '{}'".format(name))
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+
+def _absolute_millis(timestamp, round_up=False):
+    """
+    :param round_up: Treat a date without time as the end of that day, as
+        Elasticsearch does for the upper bound ``lte``.
+    :return: The timestamp in epoch milliseconds, or None if it is relative, e.g.
+        uses date math like ``now-1h``, or ambiguous.
+    """
+    if isinstance(timestamp, str):
+        if timestamp.isdigit() or "now" in timestamp or "||" in timestamp:
+            return None
+        if round_up and DATE_ONLY.match(timestamp):
+            try:
+                return to_epoch_millis(timestamp) + MILLIS_PER_DAY - 1
+            except (ValueError, OverflowError):
+                return None
+    try:
+        return to_epoch_millis(timestamp)
+    except (ValueError, OverflowError):
+        return None
@@ -0,0 +1,90 @@
+import heapq
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+from .poll_scheduler import PollScheduler
+from .processing import process_lines
+from .timestamps import to_epoch_millis
+
+logger = logging.getLogger(__name__)
+
+MISSING_TIMESTAMP = float("-inf")
+
+
+class MultiFollower:
+    def __init__(self, followers, processor=None, scheduler=None):
+        """
+        :param followers: The Follower instances to poll. Each of them needs its own
+            ElasticsearchFollow, as it keeps track of the lines already seen.
+        :param processor: The log processor which should be used to process the merged
+            lines before yielding them. The processors of the followers are not used.
+        :param scheduler: Decides how long to wait between two polls. Defaults to a
+            PollScheduler waiting 0.1 seconds.
+        """
+        for follower in followers:
+            if inspect.isasyncgenfunction(getattr(follower, "new_lines", None)):
+                raise TypeError(
+                    "MultiFollower polls synchronously, {} is asynchronous.".format(
+                        type(follower).__name__
+                    )
+                )
+        self.followers = followers
+        self.processor = processor
+        self.scheduler = scheduler if scheduler else PollScheduler()
+        self.executor = ThreadPoolExecutor(max_workers=max(len(followers), 1))
+
+    def generator(self):
+        """
+        Polls all followers concurrently and yields their new lines ordered by
+        timestamp until the most recent queries have no more lines.
+        :return: A generator.
+        """
+        futures = [
+            self.executor.submit(self._poll, follower) for follower in self.followers
+        ]
+        polls = [future.result() for future in futures]
+        logger.debug(
+            "Merging {} new lines from {} followers".format(
+                sum(len(poll) for poll in polls), len(polls)
+            )
+        )
+
+        lines = [line for _, line in heapq.merge(*polls, key=itemgetter(0))]
+        if self.processor:
+            yield from process_lines(self.processor, lines)
+        else:
+            yield from lines
+
+        self.scheduler.record_poll(len(lines))
+
+    @staticmethod
+    def _poll(follower):
+        """
+        :return: The new lines of ``follower`` as (timestamp, line)-tuples, so they
+            can be merged with the lines of the other followers.
+        """
+        timestamp_field = follower.elasticsearch_follow.timestamp_field
+        return [
+            (_line_timestamp(line, timestamp_field), line)
+            for line in follower.new_lines()
+        ]
+
+    def wait(self):
+        """
+        Blocks until the next generator should be created, as decided by the scheduler.
+        """
+        self.scheduler.wait()
+
+    def close(self):
+        """
+        Shuts down the threads used for polling.
+        """
+        self.executor.shutdown()
+
+
+def _line_timestamp(line, timestamp_field):
+    if timestamp_field not in line:
+        return MISSING_TIMESTAMP
+    return to_epoch_millis(line[timestamp_field])
@@ -0,0 +1,110 @@
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_MAX_LATENCY = 0.1
+
+
+class OutputWriter:
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE, max_latency=None):
+        """
+        Writes lines in batches instead of one ``print`` per line. Each batch is
+        encoded at once and written with a single call to the underlying binary
+        stream.
+
+        When writing to a terminal, the batch is written at the end of every poll
+        and whenever its oldest line waited longer than ``max_latency``. Otherwise,
+        e.g. when piped, it is only written once it holds ``buffer_size`` characters.
+
+        :param stream: The text stream to write to. Defaults to ``sys.stdout``.
+        :param buffer_size: Number of characters collected before a batch is written.
+            Every line is written immediately if 0.
+        :param max_latency: Maximum number of seconds a line is held back when writing
+            to a terminal. Defaults to 0.1 seconds on a terminal and to no bound
+            otherwise.
+        """
+        self.stream = sys.stdout if stream is None else stream
+        self.binary_stream = getattr(self.stream, "buffer", None)
+        self.encoding = getattr(self.stream, "encoding", None) or "utf-8"
+        self.errors = getattr(self.stream, "errors", None) or "strict"
+        self.buffer_size = buffer_size
+        self.interactive = _is_terminal(self.stream)
+        if max_latency is None and self.interactive:
+            max_latency = DEFAULT_MAX_LATENCY
+        self.max_latency = max_latency
+
+        self.lines = []
+        self.buffered_characters = 0
+        self.first_buffered = None
+
+    def write_line(self, line):
+        """
+        Adds ``line`` to the current batch and writes the batch if it is due.
+        :param line: The line to write, without the trailing newline.
+        """
+        line = str(line)
+        if not self.lines:
+            self.first_buffered = time.monotonic()
+        self.lines.append(line)
+        self.buffered_characters += len(line) + 1
+
+        if self.buffered_characters >= self.buffer_size or (
+            self.max_latency is not None
+            and time.monotonic() - self.first_buffered >= self.max_latency
+        ):
+            self.flush()
+
+    def poll_finished(self):
+        """
+        Marks the end of a poll. The batch is written if the output is a terminal,
+        so lines show up as soon as they were fetched.
+        """
+        if self.interactive:
+            self.flush()
+
+    def flush(self):
+        """
+        Encodes the current batch and writes it to the stream.
+        """
+        if not self.lines:
+            return
+
+        data = "\n".join(self.lines) + "\n"
+        if self.binary_stream is not None:
+            self.stream.flush()
+            self.binary_stream.write(data.encode(self.encoding, self.errors))
+            self.binary_stream.flush()
+        else:
+            self.stream.write(data)
+            self.stream.flush()
+
+        logger.debug(
+            "Wrote batch of {} lines with {} characters".format(
+                len(self.lines), self.buffered_characters
+            )
+        )
+        self.lines = []
+        self.buffered_characters = 0
+        self.first_buffered = None
+
+    def close(self):
+        """
+        Writes the remaining lines.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _is_terminal(stream):
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+PUT_TIMEOUT = 0.1
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def interleave(page_iterables, max_pending=4):
+    """
+    Iterates each of ``page_iterables`` in its own thread and yields their pages in
+    the order they arrive.
+
+    :param page_iterables: Iterables of pages, e.g. generators paging through a slice
+        of a search.
+    :param max_pending: Maximum number of pages fetched ahead of the consumer. The
+        threads block once it is reached.
+    :return: Yields the pages. An exception raised by one of the iterables is raised
+        again here.
+    """
+    pages = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    threads = _start(page_iterables, [pages] * len(page_iterables), stop)
+    try:
+        remaining = len(threads)
+        while remaining:
+            item = pages.get()
+            if item is _DONE:
+                remaining -= 1
+            else:
+                yield _unwrap(item)
+    finally:
+        _stop(threads, stop)
+
+
+def concatenate(page_iterables, max_pending=2):
+    """
+    Iterates each of ``page_iterables`` in its own thread and yields all pages of
+    the first one, then all pages of the second one and so on. Only the iterables
+    ahead of the current one are buffered.
+
+    :param page_iterables: Iterables of pages, e.g. generators paging through
+        consecutive time ranges.
+    :param max_pending: Maximum number of pages buffered per iterable. A thread blocks
+        once it is reached.
+    :return: Yields the pages in the order of ``page_iterables``.
+    """
+    queues = [queue.Queue(maxsize=max_pending) for _ in page_iterables]
+    stop = threading.Event()
+    threads = _start(page_iterables, queues, stop)
+    try:
+        for pages in queues:
+            yield from _read_pages(pages)
+    finally:
+        _stop(threads, stop)
+
+
+def prefetch(page_iterable, max_pending=1):
+    """
+    Iterates ``page_iterable`` in a background thread, so the next pages are fetched
+    while the current one is consumed.
+
+    :param page_iterable: An iterable of pages.
+    :param max_pending: Maximum number of pages fetched ahead of the consumer.
+    :return: Yields the pages in their order.
+    """
+    yield from interleave([page_iterable], max_pending=max_pending)
+
+
+async def prefetch_async(page_iterable, max_pending=1):
+    """
+    Iterates the asynchronous ``page_iterable`` in a separate task, so the next
+    pages are fetched while the current one is consumed.
+
+    :param page_iterable: An asynchronous generator of pages.
+    :param max_pending: Maximum number of pages fetched ahead of the consumer.
+    :return: Yields the pages in their order.
+    """
+    pages = asyncio.Queue(maxsize=max_pending)
+
+    async def produce():
+        try:
+            async for page in page_iterable:
+                await pages.put(page)
+        except Exception as e:
+            logger.debug("Fetching pages failed: {}".format(e))
+            await pages.put(_Failure(e))
+            return
+        finally:
+            await page_iterable.aclose()
+        await pages.put(_DONE)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await pages.get()
+            if item is _DONE:
+                return
+            yield _unwrap(item)
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+def merge_ordered(page_iterables, key, max_pending=4):
+    """
+    Iterates each of ``page_iterables`` in its own thread and merges their items,
+    which have to be ordered by ``key`` within each iterable, into one ordered stream.
+
+    :param page_iterables: Iterables of pages, e.g. generators paging through a slice
+        of a search.
+    :param key: Function returning the key items are ordered by.
+    :param max_pending: Maximum number of pages buffered per iterable. A thread blocks
+        once it is reached.
+    :return: Yields the items of all pages ordered by ``key``.
+    """
+    queues = [queue.Queue(maxsize=max_pending) for _ in page_iterables]
+    stop = threading.Event()
+    threads = _start(page_iterables, queues, stop)
+    try:
+        yield from heapq.merge(*[_read(pages) for pages in queues], key=key)
+    finally:
+        _stop(threads, stop)
+
+
+def _start(page_iterables, queues, stop):
+    threads = [
+        threading.Thread(target=_produce, args=(pages, target, stop), daemon=True)
+        for pages, target in zip(page_iterables, queues)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _stop(threads, stop):
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+
+def _produce(page_iterable, pages, stop):
+    iterator = iter(page_iterable)
+    try:
+        for page in iterator:
+            if not _put(pages, page, stop):
+                return
+    except Exception as e:
+        logger.debug("Fetching pages failed: {}".format(e))
+        _put(pages, _Failure(e), stop)
+        return
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+    _put(pages, _DONE, stop)
+
+
+def _put(pages, item, stop):
+    """
+    :return: False if the consumer stopped before ``item`` could be queued.
+    """
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _read(pages):
+    for page in _read_pages(pages):
+        yield from page
+
+
+def _read_pages(pages):
+    while True:
+        item = pages.get()
+        if item is _DONE:
+            return
+        yield _unwrap(item)
+
+
+def _unwrap(item):
+    if isinstance(item, _Failure):
+        raise item.exception
+    return item
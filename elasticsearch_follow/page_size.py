@@ -0,0 +1,130 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+SAMPLED_HITS = 5
+
+
+class PageSize:
+    def __init__(self, size=DEFAULT_PAGE_SIZE):
+        """
+        Requests a fixed number of hits per page.
+
+        :param size: Number of hits per page.
+        """
+        self.size = size
+
+    def next_size(self):
+        """
+        :return: Number of hits to request with the next page.
+        """
+        return self.size
+
+    def record_page(self, response, hits):
+        """
+        Informs about a page which was fetched.
+
+        :param response: The response of the search or scroll request.
+        :param hits: The hits of the response.
+        """
+
+
+class AdaptivePageSize(PageSize):
+    def __init__(
+        self,
+        size=DEFAULT_PAGE_SIZE,
+        min_size=100,
+        max_size=10000,
+        target_bytes=4 * 1024 * 1024,
+        target_took=500,
+        smoothing=0.5,
+    ):
+        """
+        Grows or shrinks the page size towards a target size and latency of the
+        responses. The number of bytes per hit is estimated from a sample of the
+        hits of each page, the time per hit from the ``took`` of the responses.
+
+        A scroll keeps the page size of the search which started it, so changes only
+        apply to the next search. Pages fetched via ``search_after`` adapt on every page.
+
+        :param size: Number of hits of the first page.
+        :param min_size: Lower bound of hits per page.
+        :param max_size: Upper bound of hits per page. Elasticsearch rejects pages
+            larger than the ``index.max_result_window`` of 10000 by default.
+        :param target_bytes: Targeted size of a page of hits in bytes.
+        :param target_took: Targeted time in milliseconds Elasticsearch takes per page.
+        :param smoothing: Weight of the latest page in the estimates, between 0 and 1.
+        """
+        super().__init__(size)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_bytes = target_bytes
+        self.target_took = target_took
+        self.smoothing = smoothing
+        self.bytes_per_hit = None
+        self.took_per_hit = None
+
+    def record_page(self, response, hits):
+        if not hits:
+            return
+
+        self.bytes_per_hit = self._smooth(
+            self.bytes_per_hit, _sample_bytes_per_hit(hits)
+        )
+        if "took" in response:
+            self.took_per_hit = self._smooth(
+                self.took_per_hit, response["took"] / len(hits)
+            )
+
+        targets = [self.target_bytes / max(self.bytes_per_hit, 1.0)]
+        if self.took_per_hit:
+            targets.append(self.target_took / self.took_per_hit)
+
+        # Change by at most a factor of two per page, so a single outlier does not
+        # swing the page size from one bound to the other.
+        size = min(min(targets), self.size * 2, self.max_size)
+        size = max(size, self.size / 2, self.min_size)
+        size = int(size)
+        if size != self.size:
+            logger.debug(
+                "Changing page size from {} to {} (bytes per hit {:.0f}, took per hit {})".format(
+                    self.size, size, self.bytes_per_hit, self.took_per_hit
+                )
+            )
+        self.size = size
+
+    def _smooth(self, estimate, value):
+        if estimate is None:
+            return value
+        return self.smoothing * value + (1 - self.smoothing) * estimate
+
+
+def as_page_size(page_size):
+    """
+    :param page_size: A PageSize, a number of hits per page or None for the default.
+        Numbers which are not an ``int``, e.g. ``500.0`` or ``"500"``, are converted.
+    :return: A PageSize.
+    """
+    if page_size is None:
+        return PageSize()
+    if hasattr(type(page_size), "next_size"):
+        return page_size
+
+    try:
+        size = int(page_size)
+    except (TypeError, ValueError):
+        raise TypeError(
+            "The page size has to be a number or a PageSize, got '{}'".format(page_size)
+        )
+    if size < 1:
+        raise ValueError("The page size has to be positive, got '{}'".format(size))
+    return PageSize(size)
+
+
+def _sample_bytes_per_hit(hits):
+    step = max(len(hits) // SAMPLED_HITS, 1)
+    sample = hits[::step][:SAMPLED_HITS]
+    sampled_bytes = sum(len(json.dumps(hit.get("_source", {}))) for hit in sample)
+    return sampled_bytes / len(sample)
@@ -0,0 +1,90 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .processing import batched, process_lines
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelProcessor:
+    def __init__(self, processor, workers=None, use_processes=True, max_pending=None):
+        """
+        Runs ``processor`` on a pool of worker processes or threads, for processors
+        which are too expensive to keep up with fetching on a single core.
+
+        Batches of lines are processed concurrently while the next ones are fetched.
+        The processed lines keep the order of the lines.
+
+        :param processor: The log processor to run. It needs to be picklable if
+            ``use_processes`` is set, as it is sent to the workers with each batch.
+        :param workers: Number of worker processes or threads. Defaults to the number
+            of CPUs.
+        :param use_processes: If True, use worker processes, otherwise threads.
+            Threads only help if the processor releases the GIL.
+        :param max_pending: Maximum number of batches which are processed or waiting to
+            be consumed at the same time. Fetching blocks once it is reached. Defaults
+            to twice the number of workers.
+        """
+        self.processor = processor
+        self.fields = getattr(processor, "fields", None)
+        self.workers = workers if workers else os.cpu_count() or 1
+        self.max_pending = max_pending if max_pending else 2 * self.workers
+
+        if use_processes:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def process_line(self, line):
+        return self.processor.process_line(line)
+
+    def process_lines(self, lines):
+        """
+        Splits ``lines`` into one chunk per worker and processes them concurrently.
+        """
+        chunk_size = max(-(-len(lines) // self.workers), 1)
+        return [
+            processed_line
+            for processed_lines in self.process_batches(batched(lines, chunk_size))
+            for processed_line in processed_lines
+        ]
+
+    def process_batches(self, batches):
+        """
+        Processes ``batches`` concurrently. At most ``max_pending`` batches are taken
+        from ``batches`` ahead of the batch which is yielded next.
+
+        :param batches: An iterable of lists of lines.
+        :return: Yields a list of processed lines per batch, in the order of
+            ``batches``. Lines the processor returned nothing for are dropped.
+        """
+        pending = deque()
+        for lines in batches:
+            pending.append(self._submit(lines))
+            if len(pending) >= self.max_pending:
+                logger.debug(
+                    "Waiting for the oldest of {} pending batches".format(len(pending))
+                )
+                yield pending.popleft().result()
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def _submit(self, lines):
+        return self.executor.submit(process_lines, self.processor, lines)
+
+    def close(self):
+        """
+        Shuts down the workers.
+        """
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PollScheduler:
+    def __init__(self, interval=0.1, max_requests_per_second=None):
+        """
+        Waits a fixed interval between two polls.
+
+        :param interval: Number of seconds to wait between two polls.
+        :param max_requests_per_second: Upper bound of polls per second. The wait
+            is extended if polls would happen more often than this.
+        """
+        self.interval = interval
+        self.max_requests_per_second = max_requests_per_second
+        self.last_poll = None
+
+    def record_poll(self, number_of_lines):
+        """
+        Informs the scheduler about the result of a poll.
+
+        :param number_of_lines: Number of new lines the poll returned.
+        """
+
+    def next_delay(self):
+        """
+        :return: Number of seconds until the next poll should happen.
+        """
+        delay = self.interval
+        if self.max_requests_per_second and self.last_poll is not None:
+            elapsed = time.monotonic() - self.last_poll
+            delay = max(delay, 1.0 / self.max_requests_per_second - elapsed)
+        return delay
+
+    def wait(self):
+        """
+        Blocks until the next poll should happen.
+        """
+        delay = self.next_delay()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_poll = time.monotonic()
+
+    async def wait_async(self):
+        """
+        Waits without blocking the event loop until the next poll should happen.
+        """
+        delay = self.next_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.last_poll = time.monotonic()
+
+
+class AdaptivePollScheduler(PollScheduler):
+    def __init__(
+        self,
+        min_interval=0.1,
+        max_interval=5.0,
+        backoff_factor=2.0,
+        max_requests_per_second=None,
+    ):
+        """
+        Backs off exponentially while polls return no new lines and goes back to
+        polling quickly as soon as new lines arrive.
+
+        :param min_interval: Number of seconds to wait while new lines arrive.
+        :param max_interval: Upper bound of seconds to wait while idle.
+        :param backoff_factor: Factor by which the interval grows after an empty poll.
+        :param max_requests_per_second: Upper bound of polls per second.
+        """
+        super().__init__(
+            interval=min_interval, max_requests_per_second=max_requests_per_second
+        )
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+
+    def record_poll(self, number_of_lines):
+        if number_of_lines > 0:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+        logger.debug(
+            "Poll returned {} lines. Next poll in {} seconds.".format(
+                number_of_lines, self.interval
+            )
+        )
@@ -0,0 +1,72 @@
+from itertools import islice
+
+BATCH_SIZE = 1000
+
+
+def process_lines(processor, lines):
+    """
+    Processes a batch of lines with ``processor``. Processor classes may implement
+    ``process_lines(lines)`` to handle a whole batch at once, returning one processed
+    line per line. Otherwise ``process_line(line)`` is called for every line.
+
+    :param processor: The log processor.
+    :param lines: The list of lines to process.
+    :return: The processed lines in the order of ``lines``. Lines the processor
+        returned nothing for are dropped.
+    """
+    if hasattr(type(processor), "process_lines"):
+        processed_lines = processor.process_lines(lines)
+    else:
+        process_line = processor.process_line
+        processed_lines = [process_line(line) for line in lines]
+    return [line for line in processed_lines if line]
+
+
+def batched(lines, batch_size=BATCH_SIZE):
+    """
+    :param lines: An iterable of lines.
+    :param batch_size: The maximum number of lines per batch.
+    :return: Yields lists of up to ``batch_size`` lines.
+    """
+    iterator = iter(lines)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def batched_async(lines, batch_size=BATCH_SIZE):
+    """
+    Counterpart of ``batched`` for asynchronous iterables.
+
+    :param lines: An asynchronous iterable of lines.
+    :param batch_size: The maximum number of lines per batch.
+    :return: Yields lists of up to ``batch_size`` lines.
+    """
+    batch = []
+    async for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_batches(processor, batches):
+    """
+    Processes an iterable of batches with ``processor``. Processor classes may
+    implement ``process_batches(batches)`` to process several batches concurrently,
+    otherwise the batches are processed one after the other with ``process_lines``.
+
+    :param processor: The log processor.
+    :param batches: An iterable of lists of lines.
+    :return: Yields a list of processed lines per batch, in the order of ``batches``.
+    """
+    if hasattr(type(processor), "process_batches"):
+        for processed_lines in processor.process_batches(batches):
+            yield [line for line in processed_lines if line]
+    else:
+        for lines in batches:
+            yield process_lines(processor, lines)
@@ -0,0 +1,196 @@
+import logging
+import time
+from datetime import datetime, timezone
+
+from .poll_scheduler import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TERMS = 10
+
+FILTER_PATH = [
+    "aggregations.histogram.buckets.key",
+    "aggregations.histogram.buckets.doc_count",
+    "aggregations.histogram.buckets.split.sum_other_doc_count",
+    "aggregations.histogram.buckets.split.buckets.key",
+    "aggregations.histogram.buckets.split.buckets.doc_count",
+]
+
+
+class RateMeter:
+    def __init__(
+        self,
+        elasticsearch,
+        index,
+        query_string=None,
+        timestamp_field="@timestamp",
+        interval=10,
+        window=60,
+        settle_delay=None,
+        split_field=None,
+        max_terms=DEFAULT_MAX_TERMS,
+        scheduler=None,
+    ):
+        """
+        Follows the number of new documents per second instead of the documents
+        themselves. Each poll requests a ``date_histogram`` over the last ``window``
+        seconds, so the cost of a poll does not depend on the number of documents.
+        Requires Elasticsearch 7.2 or newer.
+
+        A bucket is yielded once, ``settle_delay`` seconds after it has ended, so
+        documents which are ingested late are counted as well. Documents arriving
+        more than ``settle_delay`` seconds after the end of their bucket are not
+        counted.
+
+        :param elasticsearch: elasticsearch instance from the ``elasticsearch``-library.
+        :param index: The index to count documents in.
+        :param query_string: The query string documents have to match.
+        :param timestamp_field: Denotes which field in the elasticsearch-index is used
+            as the timestamp.
+        :param interval: Number of seconds per bucket.
+        :param window: Number of seconds to look into the past on every poll. It is
+            extended to cover at least ``settle_delay`` and one ``interval``.
+        :param settle_delay: Number of seconds to wait after a bucket has ended before
+            it is yielded. Defaults to ``window - interval``, i.e. a bucket is yielded
+            from the last poll which covers it.
+        :param split_field: If set, the rate is additionally split by the values of
+            this field, e.g. ``level``.
+        :param max_terms: Maximum number of values of ``split_field`` per bucket. The
+            remaining documents are counted as ``other``.
+        :param scheduler: Decides how long to wait between two polls. Defaults to a
+            PollScheduler waiting one ``interval``.
+        """
+        self.es = elasticsearch
+        self.index = index
+        self.query_string = query_string
+        self.timestamp_field = timestamp_field
+        self.interval = interval
+        if settle_delay is None:
+            settle_delay = max(window - interval, 0)
+        self.settle_delay = settle_delay
+        self.window = max(window, settle_delay + interval)
+        self.split_field = split_field
+        self.max_terms = max_terms
+        self.scheduler = scheduler if scheduler else PollScheduler(interval=interval)
+        self.last_bucket = None
+
+    def poll(self):
+        """
+        Requests the histogram of the current window. If the last returned bucket is
+        older, e.g. as polls took longer than ``interval``, the histogram starts right
+        after it instead, so no bucket is skipped.
+
+        :return: A list of the buckets which ended at least ``settle_delay`` seconds
+            ago and were not returned before, ordered by time. Each is a dict with its
+            ``timestamp`` in epoch milliseconds, the ``rate`` in documents per second
+            and, if ``split_field`` is set, the ``terms`` mapping each value to its
+            rate.
+        """
+        interval_millis = int(self.interval * 1000)
+        now = int(time.time() * 1000)
+        end = now - now % interval_millis
+        start = end - int(self.window * 1000)
+        start -= start % interval_millis
+        if self.last_bucket is not None:
+            start = min(start, self.last_bucket + interval_millis)
+
+        res = self.es.search(
+            index=self.index,
+            body=self._build_query(start, end),
+            filter_path=FILTER_PATH,
+        )
+        buckets = res.get("aggregations", {}).get("histogram", {}).get("buckets", [])
+
+        rates = []
+        settled = now - int(self.settle_delay * 1000)
+        for bucket in buckets:
+            if bucket["key"] + interval_millis > settled:
+                continue
+            if self.last_bucket is not None and bucket["key"] <= self.last_bucket:
+                continue
+            rates.append(self._rate(bucket))
+
+        if rates:
+            self.last_bucket = rates[-1]["timestamp"]
+        logger.debug(
+            "Polled {} buckets, {} of them new".format(len(buckets), len(rates))
+        )
+        self.scheduler.record_poll(len(rates))
+        return rates
+
+    def _build_query(self, start, end):
+        must = [
+            {
+                "range": {
+                    self.timestamp_field: {
+                        "gte": start,
+                        "lt": end,
+                        "format": "epoch_millis",
+                    }
+                }
+            }
+        ]
+        if self.query_string:
+            must.append({"query_string": {"query": self.query_string}})
+
+        histogram = {
+            "date_histogram": {
+                "field": self.timestamp_field,
+                "fixed_interval": "{}ms".format(int(self.interval * 1000)),
+                "min_doc_count": 0,
+                "extended_bounds": {"min": start, "max": end - 1},
+            }
+        }
+        if self.split_field:
+            histogram["aggs"] = {
+                "split": {"terms": {"field": self.split_field, "size": self.max_terms}}
+            }
+
+        return {
+            "size": 0,
+            "query": {"bool": {"must": must}},
+            "aggs": {"histogram": histogram},
+        }
+
+    def _rate(self, bucket):
+        rate = {
+            "timestamp": bucket["key"],
+            "rate": bucket["doc_count"] / self.interval,
+        }
+        if self.split_field:
+            split = bucket.get("split", {})
+            terms = {
+                term["key"]: term["doc_count"] / self.interval
+                for term in split.get("buckets", [])
+            }
+            other = split.get("sum_other_doc_count", 0)
+            if other:
+                terms["other"] = other / self.interval
+            rate["terms"] = terms
+        return rate
+
+    def generator(self):
+        """
+        Creates a generator which yields one line per bucket which settled since the
+        last poll, e.g. ``2019-01-01T10:00:10+00:00 12.5/s level=error 0.5/s``.
+        :return: A generator.
+        """
+        for rate in self.poll():
+            yield self.format_rate(rate)
+
+    def format_rate(self, rate):
+        """
+        :param rate: A bucket as returned by ``poll``.
+        :return: The bucket as line of text.
+        """
+        timestamp = datetime.fromtimestamp(rate["timestamp"] / 1000, tz=timezone.utc)
+        line = "{} {:.1f}/s".format(timestamp.isoformat(), rate["rate"])
+        for term, term_rate in rate.get("terms", {}).items():
+            line += " {}={} {:.1f}/s".format(self.split_field, term, term_rate)
+        return line
+
+    def wait(self):
+        """
+        Blocks until the next generator should be created, as decided by the scheduler.
+        """
+        self.scheduler.wait()
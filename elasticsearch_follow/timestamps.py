@@ -0,0 +1,62 @@
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+from dateutil.parser import parse
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+ISO_8601 = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d+))?"
+    r"(?:(Z)|([+-])(\d{2}):?(\d{2}))?$"
+)
+
+
+def to_epoch_millis(timestamp):
+    """
+    Converts ``timestamp`` into milliseconds since the epoch, which is the format
+    Elasticsearch returns sort values of date fields in. Timestamps without a
+    timezone are treated as UTC.
+
+    :param timestamp: Milliseconds since the epoch, a datetime or a string. ISO-8601
+        strings are parsed directly, other formats are handed to ``dateutil``.
+    :return: The timestamp in milliseconds since the epoch.
+    """
+    if isinstance(timestamp, int):
+        return timestamp
+    if isinstance(timestamp, float):
+        return int(timestamp)
+    if isinstance(timestamp, datetime):
+        return _datetime_to_epoch_millis(timestamp)
+
+    match = ISO_8601.match(timestamp)
+    if not match:
+        return _datetime_to_epoch_millis(parse(timestamp))
+
+    year, month, day, hour, minute, second, fraction, _, sign, tz_hours, tz_minutes = (
+        match.groups()
+    )
+    seconds = (
+        _epoch_day(int(year), int(month), int(day)) * 86400
+        + int(hour) * 3600
+        + int(minute) * 60
+        + int(second)
+    )
+    if sign:
+        offset = int(tz_hours) * 3600 + int(tz_minutes) * 60
+        seconds = seconds - offset if sign == "+" else seconds + offset
+
+    millis = int(fraction[:3].ljust(3, "0")) if fraction else 0
+    return seconds * 1000 + millis
+
+
+@lru_cache(maxsize=1024)
+def _epoch_day(year, month, day):
+    return date(year, month, day).toordinal() - EPOCH_ORDINAL
+
+
+def _datetime_to_epoch_millis(timestamp):
+    if not timestamp.tzinfo:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // timedelta(milliseconds=1)
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import argparse
-import time
 
 import elasticsearch
 
@@ -21,8 +20,15 @@ def run(host, index, query):
     )
 
     processor = ExampleProcessor()
+    scheduler = elasticsearch_follow.AdaptivePollScheduler(
+        min_interval=0.1, max_interval=5.0
+    )
     follower = elasticsearch_follow.Follower(
-        elasticsearch_follow=es_follow, index=index, time_delta=60, processor=processor
+        elasticsearch_follow=es_follow,
+        index=index,
+        time_delta=60,
+        processor=processor,
+        scheduler=scheduler,
     )
 
     print("Started...")
@@ -30,7 +36,7 @@ def run(host, index, query):
         entries = follower.generator()
         for entry in entries:
             print(entry)
-        time.sleep(0.1)
+        follower.wait()
 
 
 if __name__ == "__main__":
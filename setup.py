@@ -22,7 +22,12 @@ setuptools.setup(
         [console_scripts]
         es_tail=elasticsearch_follow.cli:cli
     """,
-    install_requires=["python-dateutil", "elasticsearch", "pytz", "click", "certifi"],
+    install_requires=["python-dateutil", "elasticsearch", "click", "certifi"],
+    extras_require={
+        "async": ["elasticsearch[async]"],
+        "zstd": ["zstandard"],
+        "parquet": ["pyarrow"],
+    },
     classifiers=[
         "Operating System :: OS Independent",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,26 @@
+import asyncio
+from unittest.mock import Mock
+
+
+def run_async(coroutine):
+    """
+    Runs ``coroutine`` on a new event loop, like ``asyncio.run`` which needs
+    Python 3.7.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def coroutine_mock(return_value=None):
+    """
+    :return: A Mock returning a coroutine which results in ``return_value``, like
+        ``AsyncMock`` which needs Python 3.8.
+    """
+
+    async def coroutine(*args, **kwargs):
+        return return_value
+
+    return Mock(side_effect=coroutine)
@@ -11,8 +11,8 @@ def generate_query_response(hits):
     return {"_scroll_id": "some_scroll_id", "hits": {"hits": hits}}
 
 
-def generate_hit_entry(entry_id, message, timestamp, with_timezone=True):
-    return {
+def generate_hit_entry(entry_id, message, timestamp, with_timezone=True, sort=None):
+    hit = {
         "_id": entry_id,
         "_source": {
             "msg": message,
@@ -21,3 +21,6 @@ def generate_hit_entry(entry_id, message, timestamp, with_timezone=True):
             else timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
         },
     }
+    if sort is not None:
+        hit["sort"] = sort
+    return hit
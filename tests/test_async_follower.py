@@ -0,0 +1,165 @@
+import inspect
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+
+from dateutil import tz
+
+import elasticsearch_follow
+from tests import generate_query_response, generate_hit_entry
+from tests.async_helpers import coroutine_mock, run_async
+
+REFERENCE_TIME = datetime(year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC)
+
+
+async def collect(generator):
+    return [line async for line in generator]
+
+
+class TestAsyncFollower(unittest.TestCase):
+    def test_async_follow_deduplicates_lines(self):
+        es = Mock()
+        es.search = coroutine_mock(
+            generate_query_response(
+                [
+                    generate_hit_entry("id_1", "line1", REFERENCE_TIME),
+                    generate_hit_entry("id_2", "line2", REFERENCE_TIME),
+                ]
+            )
+        )
+        es.scroll = coroutine_mock(generate_query_response([]))
+        es.clear_scroll = coroutine_mock()
+        es_follow = elasticsearch_follow.AsyncElasticsearchFollow(es)
+
+        first = run_async(collect(es_follow.get_new_lines("my_index", None)))
+        second = run_async(collect(es_follow.get_new_lines("my_index", None)))
+
+        self.assertEqual([line["msg"] for line in first], ["line1", "line2"])
+        self.assertEqual(second, [])
+        es.clear_scroll.assert_called_with(scroll_id="some_scroll_id")
+
+    def test_async_follow_with_cursor(self):
+        es = Mock()
+        es.search = coroutine_mock(
+            generate_query_response(
+                [generate_hit_entry("id_1", "line1", REFERENCE_TIME, sort=[1, 2])]
+            )
+        )
+        es_follow = elasticsearch_follow.AsyncElasticsearchFollow(es, use_cursor=True)
+        es_follow.cursor = [0, 0]
+
+        lines = run_async(collect(es_follow.get_new_lines("my_index", None)))
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(es_follow.cursor, [1, 2])
+        self.assertIn(
+            {"range": {"@timestamp": {"gte": -5000, "format": "epoch_millis"}}},
+            es.search.call_args[1]["body"]["query"]["bool"]["must"],
+        )
+
+    def test_async_follower_processes_lines(self):
+        async def get_new_lines(index, timestamp):
+            for line in [{"msg": "line_1"}, {"msg": "REMOVE"}]:
+                yield line
+
+        class TestProcessor:
+            def process_line(self, line):
+                if line["msg"] != "REMOVE":
+                    return "PROCESSED_" + line["msg"]
+
+        es_follow = Mock()
+        es_follow.get_new_lines = get_new_lines
+        scheduler = Mock()
+        scheduler.wait_async = coroutine_mock()
+        follower = elasticsearch_follow.AsyncFollower(
+            es_follow, "some_index", 120, TestProcessor(), scheduler=scheduler
+        )
+
+        result = run_async(collect(follower.generator()))
+        run_async(follower.wait())
+
+        self.assertEqual(result, ["PROCESSED_line_1"])
+        scheduler.record_poll.assert_called_once_with(2)
+        scheduler.wait_async.assert_called_once_with()
+
+    def test_async_fetch_pages_through_point_in_time(self):
+        es = Mock()
+        es.open_point_in_time = coroutine_mock({"id": "pit_1"})
+        es.search = coroutine_mock(
+            {"pit_id": "pit_1", "hits": {"hits": [{"_source": {}}]}}
+        )
+        es.close_point_in_time = coroutine_mock()
+        es_fetch = elasticsearch_follow.AsyncElasticsearchFetch(es, use_pit=True)
+
+        hits = run_async(collect(es_fetch.search_hits("my_index")))
+
+        self.assertEqual(len(hits), 1)
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_1"})
+
+    def test_async_fetch_only_exposes_async_api(self):
+        es_fetch = elasticsearch_follow.AsyncElasticsearchFetch(Mock())
+
+        self.assertFalse(isinstance(es_fetch, elasticsearch_follow.ElasticsearchFetch))
+        for method in ["search_surrounding", "search_nearby", "count", "histogram"]:
+            self.assertFalse(hasattr(es_fetch, method))
+
+    def test_async_follow_only_exposes_async_api(self):
+        es_follow = elasticsearch_follow.AsyncElasticsearchFollow(Mock())
+        follower = elasticsearch_follow.AsyncFollower(es_follow, "some_index")
+
+        self.assertFalse(
+            isinstance(es_follow, elasticsearch_follow.ElasticsearchFollow)
+        )
+        self.assertFalse(isinstance(follower, elasticsearch_follow.Follower))
+        for method in [
+            es_follow.get_entries_since,
+            es_follow.get_entry_pages_since,
+            es_follow.get_new_lines,
+            es_follow.get_new_line_pages,
+            es_follow.get_last_lines,
+            follower.generator,
+            follower.new_lines,
+            follower.last_lines,
+        ]:
+            self.assertTrue(inspect.isasyncgenfunction(method))
+
+    def test_async_follow_yields_new_lines_page_by_page(self):
+        es = Mock()
+        es.search = coroutine_mock(
+            generate_query_response(
+                [
+                    generate_hit_entry("id_1", "line1", REFERENCE_TIME),
+                    generate_hit_entry("id_2", "line2", REFERENCE_TIME),
+                ]
+            )
+        )
+        scroll_responses = [
+            generate_query_response(
+                [
+                    generate_hit_entry("id_2", "line2", REFERENCE_TIME),
+                    generate_hit_entry("id_3", "line3", REFERENCE_TIME),
+                ]
+            ),
+            generate_query_response([]),
+        ]
+
+        async def scroll(**kwargs):
+            return scroll_responses.pop(0)
+
+        es.scroll = scroll
+        es.clear_scroll = coroutine_mock()
+        es_follow = elasticsearch_follow.AsyncElasticsearchFollow(es)
+
+        pages = run_async(collect(es_follow.get_new_line_pages("my_index", None)))
+
+        self.assertEqual(
+            [[line["msg"] for line in page] for page in pages],
+            [["line1", "line2"], ["line3"]],
+        )
+
+    def test_async_follower_is_rejected_by_multi_follower(self):
+        es_follow = elasticsearch_follow.AsyncElasticsearchFollow(Mock())
+        follower = elasticsearch_follow.AsyncFollower(es_follow, "some_index")
+
+        with self.assertRaises(TypeError):
+            elasticsearch_follow.MultiFollower([follower])
@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+
+from dateutil import tz
+
+import elasticsearch_follow
+from tests import generate_query_response, generate_hit_entry
+
+TIMESTAMP = datetime(year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "checkpoint.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def follow_with_entries():
+        es = Mock()
+        es.search.return_value = generate_query_response(
+            [generate_hit_entry("id_1", "line1", TIMESTAMP, sort=[1546336860000, 0])]
+        )
+        es.scroll.return_value = generate_query_response([])
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es, use_cursor=True)
+        list(es_follow.get_new_lines("my_index", None))
+        return es, es_follow
+
+    def test_save_and_restore(self):
+        _, es_follow = self.follow_with_entries()
+        checkpoint = elasticsearch_follow.Checkpoint(self.path)
+
+        self.assertTrue(checkpoint.save(es_follow, "my_index"))
+
+        restored_follow = elasticsearch_follow.ElasticsearchFollow(
+            Mock(), use_cursor=True
+        )
+        self.assertTrue(checkpoint.restore(restored_follow, "my_index"))
+
+        self.assertEqual(restored_follow.cursor, [1546336860000, 0])
+        self.assertIn("id_1", restored_follow.entry_tracker)
+        self.assertEqual(
+            restored_follow.entry_tracker.items(), [("id_1", 1546336860000)]
+        )
+
+    def test_restore_refuses_checkpoint_of_another_index(self):
+        _, es_follow = self.follow_with_entries()
+        checkpoint = elasticsearch_follow.Checkpoint(self.path)
+        checkpoint.save(es_follow, "my_index")
+
+        restored_follow = elasticsearch_follow.ElasticsearchFollow(
+            Mock(), use_cursor=True
+        )
+        with self.assertRaises(ValueError):
+            checkpoint.restore(restored_follow, "other_index")
+
+        self.assertIsNone(restored_follow.cursor)
+        self.assertNotIn("id_1", restored_follow.entry_tracker)
+
+    def test_restore_refuses_checkpoint_of_another_query(self):
+        _, es_follow = self.follow_with_entries()
+        checkpoint = elasticsearch_follow.Checkpoint(self.path)
+        checkpoint.save(es_follow, "my_index")
+
+        restored_follow = elasticsearch_follow.ElasticsearchFollow(
+            Mock(), query_string="level:error", use_cursor=True
+        )
+        with self.assertRaises(ValueError):
+            checkpoint.restore(restored_follow, "my_index")
+
+        self.assertIsNone(restored_follow.cursor)
+
+    def test_save_respects_interval(self):
+        _, es_follow = self.follow_with_entries()
+        checkpoint = elasticsearch_follow.Checkpoint(self.path, interval=60)
+
+        self.assertTrue(checkpoint.save(es_follow))
+        self.assertFalse(checkpoint.save(es_follow))
+        self.assertTrue(checkpoint.save(es_follow, force=True))
+
+        with open(self.path) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)["version"], 2)
+        self.assertEqual(os.listdir(self.directory.name), ["checkpoint.json"])
+
+    def test_restore_without_file(self):
+        checkpoint = elasticsearch_follow.Checkpoint(self.path)
+        es_follow = Mock()
+
+        self.assertFalse(checkpoint.restore(es_follow))
+        self.assertFalse(es_follow.restore_checkpoint.called)
+
+    def test_follower_saves_and_restores_checkpoint(self):
+        now = int(time.time() * 1000)
+        es_follow = elasticsearch_follow.ElasticsearchFollow(Mock())
+        es_follow.entry_tracker.add("id_1", now)
+        elasticsearch_follow.Checkpoint(self.path).save(es_follow, "my_index")
+
+        es = Mock()
+        es.search.return_value = generate_query_response(
+            [
+                generate_hit_entry("id_1", "line1", TIMESTAMP, sort=[now, 0]),
+                generate_hit_entry("id_2", "line2", TIMESTAMP, sort=[now, 1]),
+            ]
+        )
+        es.scroll.return_value = generate_query_response([])
+        restarted_follow = elasticsearch_follow.ElasticsearchFollow(es)
+        checkpoint = Mock(wraps=elasticsearch_follow.Checkpoint(self.path))
+        follower = elasticsearch_follow.Follower(
+            restarted_follow, "my_index", 120, checkpoint=checkpoint
+        )
+
+        lines = list(follower.generator())
+        self.assertFalse(checkpoint.save.called)
+        follower.save_checkpoint()
+
+        self.assertEqual([line["msg"] for line in lines], ["line2"])
+        checkpoint.save.assert_called_once_with(
+            restarted_follow, "my_index", force=False
+        )
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from click.testing import CliRunner
+
+from elasticsearch_follow import cli
+
+ES_HOST = "http://localhost:9200"
+
+
+def scroll_response(hits):
+    return {"_scroll_id": "scroll_1", "hits": {"hits": hits}}
+
+
+def hit(doc_id, message, timestamp):
+    return {
+        "_id": doc_id,
+        "_source": {"@timestamp": "2019-01-01T10:01:00", "message": message},
+        "sort": [timestamp, 0],
+    }
+
+
+class TestCliUnit(unittest.TestCase):
+    def invoke(self, es, args):
+        with patch.object(cli, "initialize_es_instance", return_value=es):
+            return CliRunner().invoke(cli.cli, ["--connect", ES_HOST] + args)
+
+    def test_fetch(self):
+        es = Mock()
+        es.search.return_value = scroll_response(
+            [hit("1", "first", 1), hit("2", "second", 2)]
+        )
+        es.scroll.return_value = scroll_response([])
+
+        result = self.invoke(es, ["fetch", "-f", "{message}"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output, "first\nsecond\n")
+        es.clear_scroll.assert_called_once_with(scroll_id="scroll_1")
+
+    def test_fetch_count(self):
+        es = Mock()
+        es.count.return_value = {"count": 42}
+
+        result = self.invoke(es, ["fetch", "--count", "-q", "level:error"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output, "42\n")
+        es.search.assert_not_called()
+
+    def test_tail_rejects_checkpointing_bloom_filters(self):
+        result = self.invoke(
+            Mock(),
+            [
+                "tail",
+                "--tracker-false-positive-rate",
+                "0.001",
+                "--checkpoint-file",
+                "checkpoint.json",
+            ],
+        )
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("cannot be combined", result.output)
+
+    def test_tail_saves_checkpoint_on_interrupt(self):
+        es = Mock()
+        es.search.return_value = scroll_response([])
+        es.scroll.return_value = scroll_response([])
+
+        with patch.object(cli.Checkpoint, "save") as save, patch.object(
+            cli.PollScheduler, "wait", side_effect=KeyboardInterrupt
+        ):
+            result = self.invoke(
+                es, ["tail", "--checkpoint-file", "/nonexistent/checkpoint.json"]
+            )
+
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertEqual(len(save.call_args_list), 2)
+        self.assertEqual(save.call_args_list[0][1], {"force": False})
+        self.assertEqual(save.call_args_list[1][1], {"force": True})
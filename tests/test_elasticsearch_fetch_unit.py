@@ -1,6 +1,9 @@
+import tempfile
 import unittest
 from unittest.mock import Mock
 
+from elasticsearch import TransportError
+
 import elasticsearch_follow
 
 SEARCH_RESULT = ["some_value"]
@@ -30,3 +33,591 @@ class TestElasticsearchFetchUnit(unittest.TestCase):
 
         self.assertFalse(es.search.called)
         self.assertEqual(result, [])
+
+    def test_search_from_millis_adds_a_range_in_epoch_millis(self):
+        es = Mock()
+        es.search.return_value = {"_scroll_id": "scroll_1", "hits": {"hits": []}}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        list(
+            es_fetch.search_hits(
+                index="test-index", from_time="now-1h", from_millis=1546336860000
+            )
+        )
+
+        self.assertEqual(
+            es.search.call_args[1]["body"]["query"]["bool"]["must"],
+            [
+                {"range": {"@timestamp": {"gte": "now-1h"}}},
+                {
+                    "range": {
+                        "@timestamp": {"gte": 1546336860000, "format": "epoch_millis"}
+                    }
+                },
+            ],
+        )
+
+    def test_pit_search_pages_with_search_after(self):
+        es = Mock()
+        es.open_point_in_time.return_value = {"id": "pit_1"}
+        first_page = {
+            "pit_id": "pit_2",
+            "hits": {
+                "hits": [{"_source": {"msg": "line1"}, "sort": [1, 0]}],
+            },
+        }
+        second_page = {"pit_id": "pit_2", "hits": {"hits": []}}
+        es.search.side_effect = [first_page, second_page]
+
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(
+            es, use_pit=True, page_size=1
+        )
+        hits = list(es_fetch.search_hits(index="test-index"))
+
+        self.assertEqual(hits, first_page["hits"]["hits"])
+        es.open_point_in_time.assert_called_once_with(
+            index="test-index", keep_alive="2m"
+        )
+        self.assertFalse(es.scroll.called)
+
+        query = es.search.call_args[1]["body"]
+        self.assertNotIn("index", es.search.call_args[1])
+        self.assertEqual(query["pit"], {"id": "pit_2", "keep_alive": "2m"})
+        self.assertEqual(query["search_after"], [1, 0])
+        self.assertEqual(query["sort"][1], {"_shard_doc": "desc"})
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_2"})
+
+    def test_pit_is_closed_when_generator_is_abandoned(self):
+        es = Mock()
+        es.open_point_in_time.return_value = {"id": "pit_1"}
+        es.search.return_value = {
+            "pit_id": "pit_1",
+            "hits": {"hits": [{"_source": {}, "sort": [1, 0]}] * 5},
+        }
+
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, use_pit=True)
+        hits = es_fetch.search_hits(index="test-index")
+        next(hits)
+        hits.close()
+
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_1"})
+
+    def test_pit_results_require_query(self):
+        es = Mock()
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, use_pit=True)
+
+        with self.assertRaises(ValueError):
+            list(es_fetch.get_hits({"pit_id": "pit_1", "hits": {"hits": []}}))
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_1"})
+
+    def test_pit_search_result_can_be_paged_with_get_hits(self):
+        es = Mock()
+        es.open_point_in_time.return_value = {"id": "pit_1"}
+        es.search.side_effect = [
+            {"pit_id": "pit_2", "hits": {"hits": [{"_source": {}, "sort": [1, 0]}]}},
+            {"pit_id": "pit_2", "hits": {"hits": []}},
+        ]
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(
+            es, use_pit=True, page_size=1
+        )
+
+        res = es_fetch.search(index="test-index")
+        hits = list(es_fetch.get_hits(res))
+
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(es.search.call_args[1]["body"]["search_after"], [1, 0])
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_2"})
+        self.assertEqual(es_fetch.pit_queries, {})
+
+    def test_source_fields_are_pushed_down(self):
+        es = Mock()
+        es.search.return_value = {"_scroll_id": "some_scroll_id"}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(
+            es, source_fields=["@timestamp", "message"]
+        )
+
+        hits = list(es_fetch.search_hits(index="test-index"))
+        es_fetch.search_nearby(
+            index="test-index", timestamp=1, doc_id=2, after=True, number=1
+        )
+
+        self.assertEqual(hits, [])
+        for call in es.search.call_args_list:
+            self.assertEqual(
+                call[1]["body"]["_source"], {"includes": ["@timestamp", "message"]}
+            )
+            self.assertIn("filter_path", call[1])
+        es.clear_scroll.assert_called_once_with(scroll_id="some_scroll_id")
+
+    def test_scroll_results_are_yielded_page_by_page(self):
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": [{"_source": {"msg": "line1"}}]},
+        }
+        es.scroll.side_effect = [
+            {
+                "_scroll_id": "scroll_2",
+                "hits": {
+                    "hits": [
+                        {"_source": {"msg": "line2"}},
+                        {"_source": {"msg": "line3"}},
+                    ]
+                },
+            },
+            {"_scroll_id": "scroll_2"},
+        ]
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        pages = list(es_fetch.search_hit_pages(index="test-index"))
+
+        self.assertEqual(
+            [[hit["_source"]["msg"] for hit in hits] for hits in pages],
+            [["line1"], ["line2", "line3"]],
+        )
+        es.clear_scroll.assert_called_once_with(scroll_id="scroll_2")
+
+    def test_context_of_a_page_is_fetched_with_one_msearch(self):
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {
+                "hits": [
+                    {"_source": {"msg": "hit1"}, "sort": [10, 1]},
+                    {"_source": {"msg": "hit2"}, "sort": [20, 2]},
+                ]
+            },
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        es.msearch.return_value = {
+            "responses": [
+                {"status": 200, "hits": {"hits": [{"_source": {"msg": "b1"}}]}},
+                {"status": 200},
+                {
+                    "status": 200,
+                    "hits": {
+                        "hits": [{"_source": {"msg": "b3"}}, {"_source": {"msg": "b2"}}]
+                    },
+                },
+                {"status": 200, "hits": {"hits": [{"_source": {"msg": "a2"}}]}},
+            ]
+        }
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        entries = list(
+            es_fetch.search_surrounding(index="test-index", num_before=2, num_after=1)
+        )
+
+        self.assertEqual(
+            [[line["msg"] for line in entry] for entry in entries],
+            [["b1", "hit1"], ["b2", "b3", "hit2", "a2"]],
+        )
+        es.msearch.assert_called_once()
+        body = es.msearch.call_args[1]["body"]
+        self.assertEqual(body[0], {"index": "test-index"})
+        self.assertEqual(body[1]["search_after"], [10, 1])
+        self.assertEqual(body[1]["size"], 2)
+        self.assertEqual(body[1]["sort"][0], {"@timestamp": "desc"})
+        self.assertEqual(body[3]["size"], 1)
+        self.assertEqual(body[3]["sort"][0], {"@timestamp": "asc"})
+        self.assertEqual(len(body), 8)
+
+    def test_point_in_time_is_closed_after_the_last_context_search(self):
+        es = Mock()
+        es.open_point_in_time.return_value = {"id": "pit_1"}
+        es.search.return_value = {
+            "pit_id": "pit_2",
+            "hits": {"hits": [{"_source": {"msg": "hit1"}, "sort": [10, 1]}]},
+        }
+        es.msearch.return_value = {
+            "responses": [
+                {"status": 200, "hits": {"hits": [{"_source": {"msg": "a1"}}]}}
+            ]
+        }
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, use_pit=True)
+
+        entries = list(es_fetch.search_surrounding(index="test-index", num_after=1))
+
+        self.assertEqual(entries, [[{"msg": "hit1"}, {"msg": "a1"}]])
+        self.assertEqual(es.msearch.call_args[1]["body"][1]["pit"]["id"], "pit_2")
+        calls = [name for name, _, _ in es.mock_calls]
+        self.assertEqual(calls[-2:], ["msearch", "close_point_in_time"])
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_2"})
+
+    def test_failed_context_search_raises(self):
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": [{"_source": {"msg": "hit1"}, "sort": [10, 1]}]},
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        es.msearch.return_value = {
+            "responses": [{"status": 400, "error": {"type": "parse_exception"}}]
+        }
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        with self.assertRaises(TransportError):
+            list(es_fetch.search_surrounding(index="test-index", num_after=1))
+
+    def test_no_msearch_without_context(self):
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": [{"_source": {"msg": "hit1"}, "sort": [10, 1]}]},
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        entries = list(es_fetch.search_surrounding(index="test-index"))
+
+        self.assertEqual(entries, [[{"msg": "hit1"}]])
+        es.msearch.assert_not_called()
+
+    @staticmethod
+    def fetch_with_three_hits():
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {
+                "hits": [
+                    {"_id": "h1", "_source": {"msg": "h1"}, "sort": [10, 1]},
+                    {"_id": "h2", "_source": {"msg": "h2"}, "sort": [20, 2]},
+                    {"_id": "h3", "_source": {"msg": "h3"}, "sort": [100, 3]},
+                ]
+            },
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        return es, elasticsearch_follow.ElasticsearchFetch(es)
+
+    @staticmethod
+    def context_response(*messages):
+        return {
+            "status": 200,
+            "hits": {
+                "hits": [{"_id": msg, "_source": {"msg": msg}} for msg in messages]
+            },
+        }
+
+    def test_overlapping_context_is_merged(self):
+        es, es_fetch = self.fetch_with_three_hits()
+        counts = {
+            "responses": [
+                {"status": 200, "hits": {"total": {"value": 3}}},
+                {"status": 200, "hits": {"total": {"value": 50}}},
+            ]
+        }
+        context = {
+            "responses": [
+                self.context_response("b1"),
+                self.context_response("x", "h2", "a2", "too_far"),
+                self.context_response("b3"),
+                self.context_response("a3"),
+            ]
+        }
+        es.msearch.side_effect = [counts, context]
+
+        entries = list(
+            es_fetch.search_surrounding(
+                index="test-index", num_before=1, num_after=1, merge_context=True
+            )
+        )
+
+        self.assertEqual(
+            [[line["msg"] for line in entry] for entry in entries],
+            [["b1", "h1", "x", "h2", "a2"], ["b3", "h3", "a3"]],
+        )
+        count_query = es.msearch.call_args_list[0][1]["body"][1]
+        self.assertEqual(count_query["size"], 0)
+        self.assertEqual(
+            count_query["query"]["range"]["@timestamp"],
+            {"gte": 10, "lte": 20, "format": "epoch_millis"},
+        )
+        range_query = es.msearch.call_args_list[1][1]["body"][3]
+        self.assertEqual(range_query["search_after"], [10, 1])
+        self.assertEqual(range_query["size"], 3)
+        self.assertEqual(range_query["sort"][0], {"@timestamp": "asc"})
+
+    def test_merged_context_falls_back_if_range_misses_hits(self):
+        es, es_fetch = self.fetch_with_three_hits()
+        counts = {
+            "responses": [
+                {"status": 200, "hits": {"total": {"value": 2}}},
+                {"status": 200, "hits": {"total": {"value": 2}}},
+            ]
+        }
+        context = {"responses": [self.context_response("h2", "late")]}
+        fallback = {
+            "responses": [
+                self.context_response("h2"),
+                self.context_response("h3"),
+                self.context_response("a3"),
+            ]
+        }
+        es.msearch.side_effect = [counts, context, fallback]
+
+        entries = list(
+            es_fetch.search_surrounding(
+                index="test-index", num_after=1, merge_context=True
+            )
+        )
+
+        self.assertEqual(
+            [[line["msg"] for line in entry] for entry in entries],
+            [["h1", "h2"], ["h2", "h3"], ["h3", "a3"]],
+        )
+
+    def test_sliced_scroll_is_merged_by_timestamp(self):
+        es = Mock()
+        slice_hits = {
+            0: [
+                {"_source": {"msg": "a"}, "sort": [1, 0]},
+                {"_source": {"msg": "c"}, "sort": [3, 0]},
+            ],
+            1: [
+                {"_source": {"msg": "b"}, "sort": [2, 0]},
+                {"_source": {"msg": "d"}, "sort": [4, 0]},
+            ],
+        }
+
+        def search(index, scroll, body, filter_path):
+            slice_id = body["slice"]["id"]
+            self.assertEqual(body["slice"]["max"], 2)
+            return {
+                "_scroll_id": "scroll_{}".format(slice_id),
+                "hits": {"hits": slice_hits[slice_id]},
+            }
+
+        es.search.side_effect = search
+        es.scroll.return_value = {"_scroll_id": "scroll_end"}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        pages = list(es_fetch.search_sliced_hit_pages(index="test-index", slices=2))
+
+        self.assertEqual(
+            [hit["_source"]["msg"] for hits in pages for hit in hits],
+            ["a", "b", "c", "d"],
+        )
+        self.assertEqual(es.clear_scroll.call_count, 2)
+
+    def test_sliced_pit_shares_one_point_in_time(self):
+        es = Mock()
+        es.open_point_in_time.return_value = {"id": "pit_1"}
+
+        def search(body, filter_path):
+            self.assertEqual(body["pit"]["id"], "pit_1")
+            slice_id = body["slice"]["id"]
+            return {
+                "pit_id": "pit_1",
+                "hits": {
+                    "hits": [{"_source": {"msg": slice_id}, "sort": [slice_id, 0]}]
+                },
+            }
+
+        es.search.side_effect = search
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, use_pit=True)
+
+        pages = list(
+            es_fetch.search_sliced_hit_pages(
+                index="test-index", slices=3, ordered=False
+            )
+        )
+
+        self.assertEqual(
+            sorted(hit["_source"]["msg"] for hits in pages for hit in hits), [0, 1, 2]
+        )
+        es.open_point_in_time.assert_called_once_with(
+            index="test-index", keep_alive="2m"
+        )
+        es.close_point_in_time.assert_called_once_with(body={"id": "pit_1"})
+
+    def test_ordered_slices_stop_before_point_in_time_is_closed(self):
+        es = Mock()
+        es.open_point_in_time.return_value = {"id": "pit_1"}
+        events = []
+
+        def search(body, filter_path):
+            events.append("search")
+            hits = [
+                {"_source": {"msg": i}, "sort": [i, body["slice"]["id"]]}
+                for i in range(body["size"])
+            ]
+            return {"pit_id": "pit_1", "hits": {"hits": hits}}
+
+        es.search.side_effect = search
+        es.close_point_in_time.side_effect = lambda body: events.append("close")
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(
+            es, use_pit=True, page_size=10
+        )
+
+        pages = es_fetch.search_sliced_hit_pages(index="test-index", slices=2)
+        next(pages)
+        pages.close()
+
+        self.assertEqual(events[-1], "close")
+        self.assertEqual(events.count("close"), 1)
+
+    def test_slices_decide_their_page_size_independently(self):
+        page_sizes = []
+
+        class RecordingPageSize(elasticsearch_follow.PageSize):
+            def record_page(self, response, hits):
+                # Keeps the copies alive, so their ids are not reused.
+                page_sizes.append(self)
+
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": [{"_source": {}, "sort": [1, 0]}]},
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        page_size = RecordingPageSize()
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, page_size=page_size)
+
+        list(es_fetch.search_sliced_hit_pages(index="test-index", slices=3))
+
+        self.assertEqual(len({id(recorded) for recorded in page_sizes}), 3)
+        self.assertNotIn(page_size, page_sizes)
+
+    def test_count_does_not_fetch_documents(self):
+        es = Mock()
+        es.count.return_value = {"count": 42}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        count = es_fetch.count(index="test-index", query_string="level:error")
+
+        self.assertEqual(count, 42)
+        query = es.count.call_args[1]["body"]
+        self.assertEqual(list(query), ["query"])
+        self.assertEqual(
+            query["query"]["bool"]["must"],
+            [{"query_string": {"query": "level:error"}}],
+        )
+        es.search.assert_not_called()
+
+    def test_histogram_aggregates_without_hits(self):
+        es = Mock()
+        buckets = [{"key": 0, "key_as_string": "1970-01-01T00:00:00", "doc_count": 3}]
+        es.search.return_value = {"aggregations": {"histogram": {"buckets": buckets}}}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        result = es_fetch.histogram(
+            index="test-index", interval="5m", from_time="now-1h"
+        )
+
+        self.assertEqual(result, buckets)
+        body = es.search.call_args[1]["body"]
+        self.assertEqual(body["size"], 0)
+        self.assertEqual(
+            body["aggs"]["histogram"]["date_histogram"],
+            {"field": "@timestamp", "min_doc_count": 0, "fixed_interval": "5m"},
+        )
+
+    def test_histogram_without_matches(self):
+        es = Mock()
+        es.search.return_value = {}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        self.assertEqual(es_fetch.histogram(index="test-index", interval="1h"), [])
+
+    def test_partitions_are_split_by_histogram_and_concatenated(self):
+        es = Mock()
+        buckets = [
+            {"key": 1000, "doc_count": 3},
+            {"key": 2000, "doc_count": 1},
+            {"key": 3000, "doc_count": 2},
+            {"key": 4000, "doc_count": 2},
+        ]
+        partition_ranges = []
+
+        def search(index, body, filter_path, scroll=None):
+            if "aggs" in body:
+                self.assertEqual(body["size"], 0)
+                return {"aggregations": {"histogram": {"buckets": buckets}}}
+            partition_range = body["query"]["bool"]["must"][-1]["range"]["@timestamp"]
+            partition_ranges.append(partition_range)
+            lower_bound = partition_range.get("gte", 0)
+            return {
+                "_scroll_id": "scroll_{}".format(lower_bound),
+                "hits": {
+                    "hits": [
+                        {"_source": {"msg": lower_bound}, "sort": [lower_bound, 0]}
+                    ]
+                },
+            }
+
+        es.search.side_effect = search
+        es.scroll.return_value = {"_scroll_id": "scroll_end"}
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        pages = list(
+            es_fetch.search_partitioned_hit_pages(index="test-index", partitions=2)
+        )
+
+        self.assertEqual(
+            [hit["_source"]["msg"] for hits in pages for hit in hits], [0, 3000]
+        )
+        self.assertEqual(
+            sorted(partition_ranges, key=lambda r: r.get("gte", 0)),
+            [
+                {"format": "epoch_millis", "lt": 3000},
+                {"format": "epoch_millis", "gte": 3000},
+            ],
+        )
+        self.assertEqual(es.clear_scroll.call_count, 2)
+
+    def test_partitioning_falls_back_to_single_search_without_results(self):
+        es = Mock()
+        es.search.side_effect = [
+            {"aggregations": {"histogram": {"buckets": []}}},
+            {"_scroll_id": "scroll_1", "hits": {"hits": []}},
+        ]
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es)
+
+        pages = list(
+            es_fetch.search_partitioned_hit_pages(index="test-index", partitions=4)
+        )
+
+        self.assertEqual(pages, [])
+        self.assertEqual(es.search.call_count, 2)
+
+    def test_closed_time_ranges_are_served_from_cache(self):
+        es = Mock()
+        es.info.return_value = {"cluster_uuid": "uuid"}
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": [{"_source": {"msg": "line"}, "sort": [1, 0]}]},
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        with tempfile.TemporaryDirectory() as directory:
+            es_fetch = elasticsearch_follow.ElasticsearchFetch(
+                es, cache=elasticsearch_follow.HitCache(directory)
+            )
+
+            for _ in range(2):
+                hits = list(
+                    es_fetch.search_hits(
+                        index="test-index",
+                        from_time="2019-01-01T10:00:00",
+                        to_time="2019-01-01T11:00:00",
+                    )
+                )
+                self.assertEqual([hit["_source"]["msg"] for hit in hits], ["line"])
+            list(es_fetch.search_hits(index="test-index", to_time="now-1h"))
+
+        self.assertEqual(es.search.call_count, 2)
+        es.info.assert_called_once()
+
+    def test_prefetched_scroll_is_cleared_when_generator_is_closed(self):
+        es = Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": [{"_source": {"msg": "line"}, "sort": [1, 0]}]},
+        }
+        es.scroll.return_value = es.search.return_value
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, prefetch_pages=2)
+
+        pages = es_fetch.search_hit_pages(index="test-index")
+        self.assertEqual(next(pages)[0]["_source"], {"msg": "line"})
+        pages.close()
+
+        es.clear_scroll.assert_called_once_with(scroll_id="scroll_1")
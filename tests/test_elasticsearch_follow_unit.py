@@ -105,8 +105,7 @@ class TestElasticsearchFollowUnit(unittest.TestCase):
 
         self.assertEqual(len(es_follow.entry_tracker.entries_by_timestamp), 1)
         remaining_entry = es_follow.entry_tracker.entries_by_timestamp[0]
-        self.assertEqual(remaining_entry.entry_id, entry_id)
-        self.assertEqual(remaining_entry.timestamp, entry_timestamp)
+        self.assertEqual(remaining_entry, (1546337400000, entry_id))
 
     def test_prune_no_elements_existing(self):
         es = Mock()
@@ -137,3 +136,250 @@ class TestElasticsearchFollowUnit(unittest.TestCase):
         self.assertIn("msg", new_lines[0])
         self.assertEqual(new_lines[0]["msg"], "line1")
         print(new_lines)
+
+    def test_timestamp_is_taken_from_sort_values(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es)
+        es.search.return_value = generate_query_response(
+            [{"_id": "id_1", "_source": {"msg": "line1"}, "sort": [1546336860000, 0]}]
+        )
+        es.scroll.return_value = generate_query_response([])
+
+        new_lines = list(es_follow.get_new_lines("my_index", None))
+
+        self.assertEqual(new_lines, [{"msg": "line1"}])
+        self.assertEqual(es_follow.entry_tracker.items(), [("id_1", 1546336860000)])
+
+    def test_cursor_is_used_for_subsequent_fetches(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es, use_cursor=True)
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        es.search.return_value = generate_query_response(
+            [
+                generate_hit_entry("id_1", "line1", timestamp, sort=[1000, 0]),
+                generate_hit_entry("id_2", "line2", timestamp, sort=[2000, 1]),
+            ]
+        )
+        es.scroll.return_value = generate_query_response([])
+
+        list(es_follow.get_new_lines("my_index", None))
+        self.assertEqual(es_follow.cursor, [2000, 1])
+
+        # Entries of the timestamp of the cursor are fetched again and skipped.
+        es.search.return_value = generate_query_response(
+            [
+                generate_hit_entry("id_2", "line2", timestamp, sort=[2000, 1]),
+                generate_hit_entry("id_3", "line3", timestamp, sort=[2000, 0]),
+            ]
+        )
+        new_lines = list(es_follow.get_new_lines("my_index", None))
+
+        self.assertEqual([line["msg"] for line in new_lines], ["line3"])
+        self.assertEqual(es_follow.cursor, [2000, 1])
+
+        query = es.search.call_args[1]["body"]
+        self.assertNotIn("scroll", es.search.call_args[1])
+        self.assertNotIn("search_after", query)
+        self.assertEqual(query["sort"], [{"@timestamp": "asc"}])
+        self.assertIn(
+            {"range": {"@timestamp": {"gte": -3000, "format": "epoch_millis"}}},
+            query["query"]["bool"]["must"],
+        )
+
+    def test_cursor_overlap_searches_before_cursor(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(
+            es, use_cursor=True, cursor_overlap=2
+        )
+        es_follow.cursor = [10000, 5]
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        es.search.return_value = generate_query_response(
+            [generate_hit_entry("id_1", "line1", timestamp, sort=[9000, 4])]
+        )
+
+        new_lines = list(es_follow.get_new_lines("my_index", None))
+
+        self.assertEqual(len(new_lines), 1)
+        self.assertEqual(es_follow.cursor, [10000, 5])
+
+        query = es.search.call_args[1]["body"]
+        self.assertNotIn("search_after", query)
+        self.assertIn(
+            {"range": {"@timestamp": {"gte": 8000, "format": "epoch_millis"}}},
+            query["query"]["bool"]["must"],
+        )
+
+    def test_source_fields_are_pushed_down(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(
+            es, source_fields=["message"]
+        )
+        es.search.return_value = {"_scroll_id": "some_scroll_id"}
+
+        new_lines = list(es_follow.get_new_lines("my_index", None))
+
+        self.assertEqual(new_lines, [])
+        query = es.search.call_args[1]["body"]
+        self.assertEqual(query["_source"], {"includes": ["message", "@timestamp"]})
+        self.assertIn("hits.hits._source", es.search.call_args[1]["filter_path"])
+
+    def test_last_lines_are_fetched_with_one_descending_query(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es, use_cursor=True)
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        es.search.return_value = generate_query_response(
+            [
+                generate_hit_entry("id_3", "line3", timestamp, sort=[3000, 2]),
+                generate_hit_entry("id_2", "line2", timestamp, sort=[2000, 1]),
+            ]
+        )
+
+        last_lines = list(es_follow.get_last_lines("my_index", 2))
+
+        self.assertEqual([line["msg"] for line in last_lines], ["line2", "line3"])
+        es.search.assert_called_once()
+        self.assertNotIn("scroll", es.search.call_args[1])
+        query = es.search.call_args[1]["body"]
+        self.assertEqual(query["size"], 2)
+        self.assertEqual(query["sort"], [{"@timestamp": "desc"}, {"_doc": "desc"}])
+        self.assertEqual(es_follow.cursor, [3000, 2])
+        self.assertEqual(es_follow.horizon, [2000, 1])
+
+    def test_lines_before_last_lines_are_skipped(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es)
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        es.search.return_value = generate_query_response(
+            [generate_hit_entry("id_2", "line2", timestamp, sort=[2000, 1])]
+        )
+        list(es_follow.get_last_lines("my_index", 1))
+
+        es.search.return_value = generate_query_response(
+            [
+                generate_hit_entry("id_1", "line1", timestamp, sort=[1000, 0]),
+                generate_hit_entry("id_2", "line2", timestamp, sort=[2000, 1]),
+                generate_hit_entry("id_3", "line3", timestamp, sort=[3000, 2]),
+            ]
+        )
+        es.scroll.return_value = generate_query_response([])
+        new_lines = list(es_follow.get_new_lines("my_index", None))
+
+        self.assertEqual([line["msg"] for line in new_lines], ["line3"])
+
+    def test_no_query_for_zero_last_lines(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es)
+
+        self.assertEqual(list(es_follow.get_last_lines("my_index", 0)), [])
+        es.search.assert_not_called()
+
+    def test_new_lines_are_yielded_page_by_page(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(es)
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        es.search.return_value = generate_query_response(
+            [
+                generate_hit_entry("id_1", "line1", timestamp),
+                generate_hit_entry("id_2", "line2", timestamp),
+            ]
+        )
+        es.scroll.side_effect = [
+            generate_query_response([generate_hit_entry("id_2", "line2", timestamp)]),
+            generate_query_response([generate_hit_entry("id_3", "line3", timestamp)]),
+            generate_query_response([]),
+        ]
+
+        pages = list(es_follow.get_new_line_pages("my_index", None))
+
+        self.assertEqual(
+            [[line["msg"] for line in lines] for lines in pages],
+            [["line1", "line2"], ["line3"]],
+        )
+
+    def test_cursor_pages_use_page_size(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(
+            es, use_cursor=True, page_size=2
+        )
+        es_follow.cursor = [0, 0]
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        es.search.side_effect = [
+            generate_query_response(
+                [
+                    generate_hit_entry("id_1", "line1", timestamp, sort=[1, 1]),
+                    generate_hit_entry("id_2", "line2", timestamp, sort=[2, 2]),
+                ]
+            ),
+            generate_query_response(
+                [generate_hit_entry("id_3", "line3", timestamp, sort=[3, 3])]
+            ),
+        ]
+
+        new_lines = list(es_follow.get_new_lines("my_index", None))
+
+        self.assertEqual(len(new_lines), 3)
+        self.assertEqual(es.search.call_count, 2)
+        query = es.search.call_args[1]["body"]
+        self.assertEqual(query["size"], 2)
+        self.assertEqual(query["search_after"], [1])
+
+    def test_cursor_pages_continue_at_the_last_timestamp(self):
+        es = Mock()
+        es_follow = elasticsearch_follow.ElasticsearchFollow(
+            es, use_cursor=True, page_size=2
+        )
+        es_follow.cursor = [0]
+        timestamp = datetime(
+            year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
+        )
+        responses = [
+            generate_query_response(
+                [
+                    generate_hit_entry("id_1", "line1", timestamp, sort=[1]),
+                    generate_hit_entry("id_2", "line2", timestamp, sort=[2]),
+                ]
+            ),
+            # The hits of one timestamp fill the page, so the next one is larger.
+            generate_query_response(
+                [
+                    generate_hit_entry("id_3", "line3", timestamp, sort=[2]),
+                    generate_hit_entry("id_2", "line2", timestamp, sort=[2]),
+                ]
+            ),
+            generate_query_response(
+                [
+                    generate_hit_entry("id_2", "line2", timestamp, sort=[2]),
+                    generate_hit_entry("id_4", "line4", timestamp, sort=[2]),
+                    generate_hit_entry("id_3", "line3", timestamp, sort=[2]),
+                    generate_hit_entry("id_5", "line5", timestamp, sort=[3]),
+                ]
+            ),
+            generate_query_response([]),
+        ]
+        pages_requested = []
+
+        def search(index, body, filter_path):
+            pages_requested.append((body["size"], body.get("search_after")))
+            return responses[len(pages_requested) - 1]
+
+        es.search.side_effect = search
+
+        pages = list(es_follow.get_entry_pages_since("my_index", None))
+
+        self.assertEqual(
+            [[hit["_id"] for hit in hits] for hits in pages],
+            [["id_1", "id_2"], ["id_3"], ["id_4", "id_5"]],
+        )
+        self.assertEqual(pages_requested, [(2, None), (2, [1]), (4, [1]), (2, [2])])
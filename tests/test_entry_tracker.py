@@ -2,10 +2,10 @@ import heapq
 import unittest
 from datetime import datetime
 
-import pytz
 from dateutil import tz
 
 import elasticsearch_follow.entry_tracker
+from elasticsearch_follow.entry_tracker import HashCounter
 
 BEFORE_REFERENCE_TIME = datetime(
     year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC
@@ -14,6 +14,9 @@ REFERENCE_TIME = datetime(year=2019, month=1, day=1, hour=10, minute=2, tzinfo=t
 AFTER_REFERENCE_TIME = datetime(
     year=2019, month=1, day=1, hour=10, minute=3, tzinfo=tz.UTC
 )
+BEFORE_REFERENCE_MILLIS = 1546336860000
+REFERENCE_MILLIS = 1546336920000
+AFTER_REFERENCE_MILLIS = 1546336980000
 
 
 class TestEntryTracker(unittest.TestCase):
@@ -43,11 +46,11 @@ class TestEntryTracker(unittest.TestCase):
 
         self.assertEqual(
             heapq.heappop(entry_tracker.entries_by_timestamp),
-            elasticsearch_follow.entry_tracker.Entry(BEFORE_REFERENCE_TIME, "id-1"),
+            (BEFORE_REFERENCE_MILLIS, "id-1"),
         )
         self.assertEqual(
             heapq.heappop(entry_tracker.entries_by_timestamp),
-            elasticsearch_follow.entry_tracker.Entry(AFTER_REFERENCE_TIME, "id-2"),
+            (AFTER_REFERENCE_MILLIS, "id-2"),
         )
 
     def test_entry_tracker_adding_reverse_order_by_timestamp(self):
@@ -58,11 +61,11 @@ class TestEntryTracker(unittest.TestCase):
 
         self.assertEqual(
             heapq.heappop(entry_tracker.entries_by_timestamp),
-            elasticsearch_follow.entry_tracker.Entry(BEFORE_REFERENCE_TIME, "id-2"),
+            (BEFORE_REFERENCE_MILLIS, "id-2"),
         )
         self.assertEqual(
             heapq.heappop(entry_tracker.entries_by_timestamp),
-            elasticsearch_follow.entry_tracker.Entry(AFTER_REFERENCE_TIME, "id-1"),
+            (AFTER_REFERENCE_MILLIS, "id-1"),
         )
 
     def test_add_entry_without_timezone(self):
@@ -74,4 +77,137 @@ class TestEntryTracker(unittest.TestCase):
 
         entry = heapq.heappop(entry_tracker.entries_by_timestamp)
 
-        self.assertEqual(entry.timestamp.tzinfo, pytz.UTC)
+        self.assertEqual(entry, (REFERENCE_MILLIS, "id-1"))
+
+    def test_entry_tracker_with_epoch_millis(self):
+        entry_tracker = elasticsearch_follow.entry_tracker.EntryTracker()
+
+        entry_tracker.add("id-1", BEFORE_REFERENCE_MILLIS)
+        entry_tracker.add("id-2", AFTER_REFERENCE_MILLIS)
+        entry_tracker.prune_before(REFERENCE_MILLIS)
+
+        self.assertNotIn("id-1", entry_tracker)
+        self.assertIn("id-2", entry_tracker)
+        self.assertEqual(entry_tracker.items(), [("id-2", AFTER_REFERENCE_MILLIS)])
+
+
+class TestCompactEntryTracker(unittest.TestCase):
+    def test_pruning_drops_whole_buckets(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker(bucket_millis=1000)
+
+        entry_tracker.add("id-1", 10100)
+        entry_tracker.add("id-2", 10900)
+        entry_tracker.add("id-3", 11000)
+
+        entry_tracker.prune_before(10998)
+        self.assertEqual(len(entry_tracker), 3)
+
+        entry_tracker.prune_before(10999)
+        self.assertNotIn("id-1", entry_tracker)
+        self.assertNotIn("id-2", entry_tracker)
+        self.assertIn("id-3", entry_tracker)
+        self.assertEqual(len(entry_tracker), 1)
+        self.assertEqual(entry_tracker.evictions, 0)
+
+    def test_datetimes_are_accepted(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker()
+
+        entry_tracker.add("id-1", BEFORE_REFERENCE_TIME)
+        entry_tracker.add("id-2", AFTER_REFERENCE_TIME)
+        entry_tracker.prune_before(REFERENCE_TIME)
+
+        self.assertNotIn("id-1", entry_tracker)
+        self.assertIn("id-2", entry_tracker)
+
+    def test_max_entries_evicts_oldest_buckets(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker(
+            bucket_millis=1000, max_entries=2
+        )
+
+        entry_tracker.add("id-1", 1000)
+        entry_tracker.add("id-2", 2000)
+        entry_tracker.add("id-3", 3000)
+
+        self.assertNotIn("id-1", entry_tracker)
+        self.assertIn("id-2", entry_tracker)
+        self.assertIn("id-3", entry_tracker)
+        self.assertEqual(len(entry_tracker), 2)
+        self.assertEqual(entry_tracker.evictions, 1)
+
+    def test_newest_bucket_is_never_evicted(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker(
+            bucket_millis=1000, max_entries=2
+        )
+
+        entry_tracker.add("id-1", 1000)
+        for i in range(2, 5):
+            entry_tracker.add("id-{}".format(i), 2000)
+        entry_tracker.add("id-5", 1500)
+
+        self.assertNotIn("id-1", entry_tracker)
+        for i in range(2, 6):
+            self.assertIn("id-{}".format(i), entry_tracker)
+        self.assertEqual(entry_tracker.evictions, 1)
+
+    def test_ids_in_several_buckets_are_kept_until_the_last_is_dropped(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker(bucket_millis=1000)
+
+        entry_tracker.add("id-1", 1000)
+        entry_tracker.add("id-1", 2000)
+        entry_tracker.prune_before(1999)
+
+        self.assertIn("id-1", entry_tracker)
+        entry_tracker.prune_before(2999)
+        self.assertNotIn("id-1", entry_tracker)
+
+    def test_items_can_be_restored(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker(bucket_millis=1000)
+        entry_tracker.add("id-1", 1500)
+
+        restored_tracker = elasticsearch_follow.CompactEntryTracker(bucket_millis=1000)
+        for entry_id, entry_timestamp in entry_tracker.items():
+            restored_tracker.add(entry_id, entry_timestamp)
+
+        self.assertIn("id-1", restored_tracker)
+        self.assertEqual(restored_tracker.items(), entry_tracker.items())
+
+    def test_bloom_filter_mode(self):
+        entry_tracker = elasticsearch_follow.CompactEntryTracker(
+            bucket_millis=1000,
+            false_positive_rate=0.001,
+            expected_entries_per_bucket=1000,
+        )
+
+        for i in range(1000):
+            entry_tracker.add("id-{}".format(i), 1000 + i)
+
+        self.assertTrue(all("id-{}".format(i) in entry_tracker for i in range(1000)))
+        false_positives = sum(
+            "other-{}".format(i) in entry_tracker for i in range(10000)
+        )
+        self.assertLess(false_positives, 50)
+        with self.assertRaises(ValueError):
+            entry_tracker.items()
+
+        entry_tracker.prune_before(1999)
+        self.assertEqual(len(entry_tracker), 0)
+        self.assertNotIn("id-1", entry_tracker)
+
+
+class TestHashCounter(unittest.TestCase):
+    def test_counts_survive_resizing(self):
+        counter = HashCounter(capacity=1024)
+
+        for entry_hash in range(5000):
+            counter.add(entry_hash * 7919)
+        counter.add(0)
+        counter.add(0)
+        for entry_hash in range(0, 5000, 2):
+            counter.remove(entry_hash * 7919)
+        counter.remove(0)
+
+        self.assertEqual(len(counter), 2501)
+        self.assertIn(0, counter)
+        self.assertNotIn(2 * 7919, counter)
+        self.assertIn(3 * 7919, counter)
+        self.assertGreater(len(counter.keys), 1024)
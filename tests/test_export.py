@@ -0,0 +1,270 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+import elasticsearch_follow
+from elasticsearch_follow.export import flatten
+
+
+def hit(doc_id, timestamp, **source):
+    return {"_id": doc_id, "_source": source, "sort": [timestamp, 0]}
+
+
+class FailingWriter(elasticsearch_follow.NdjsonWriter):
+    def __init__(self, path, fail_after):
+        super().__init__(path)
+        self.fail_after = fail_after
+
+    def write_batch(self, documents):
+        if self.fail_after == 0:
+            raise IOError("disk full")
+        self.fail_after -= 1
+        super().write_batch(documents)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "export.ndjson")
+        self.state_path = self.path + ".state"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_lines(self):
+        with open(self.path) as export_file:
+            return [json.loads(line) for line in export_file]
+
+    def test_ndjson_export(self):
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [hit("1", 1, msg="a"), hit("2", 2, msg="b"), hit("3", 3, msg="c")]
+        )
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch,
+            elasticsearch_follow.NdjsonWriter(self.path),
+            state_path=self.state_path,
+            batch_size=2,
+        )
+
+        written = exporter.export("test-index", from_time="now-1h")
+
+        self.assertEqual(written, 3)
+        self.assertEqual(self.read_lines(), [{"msg": "a"}, {"msg": "b"}, {"msg": "c"}])
+        es_fetch.search_hits.assert_called_once_with(
+            "test-index", None, "now-1h", None, from_millis=None
+        )
+        self.assertFalse(os.path.exists(self.state_path))
+
+    def test_gzip_batches_form_one_file(self):
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [hit("1", 1, msg="a"), hit("2", 2, msg="b"), hit("3", 3, msg="c")]
+        )
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch,
+            elasticsearch_follow.NdjsonWriter(self.path, compression="gzip"),
+            batch_size=2,
+        )
+
+        exporter.export("test-index")
+
+        with gzip.open(self.path, "rt") as export_file:
+            self.assertEqual(
+                [json.loads(line)["msg"] for line in export_file], ["a", "b", "c"]
+            )
+
+    def test_interrupted_export_is_resumed_after_cursor(self):
+        es_fetch = Mock()
+        hits = [
+            hit("1", 1, msg="a"),
+            hit("2", 2, msg="b"),
+            hit("3", 2, msg="c"),
+            hit("4", 3, msg="d"),
+        ]
+        es_fetch.search_hits.return_value = iter(hits)
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch,
+            FailingWriter(self.path, fail_after=1),
+            state_path=self.state_path,
+            batch_size=2,
+        )
+        with self.assertRaises(IOError):
+            exporter.export("test-index", from_time="now-1h")
+
+        with open(self.state_path) as state_file:
+            state = json.load(state_file)
+        self.assertEqual(state["timestamp"], 2)
+        self.assertEqual(state["ids"], ["2"])
+
+        # Bytes of a batch written after the state was saved are discarded.
+        with open(self.path, "a") as export_file:
+            export_file.write('{"msg":')
+        # The search is repeated from the timestamp of the cursor, within the
+        # original time range.
+        es_fetch.search_hits.return_value = iter(hits[1:])
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch,
+            elasticsearch_follow.NdjsonWriter(self.path),
+            state_path=self.state_path,
+            batch_size=2,
+        )
+
+        written = exporter.export("test-index", from_time="now-1h")
+
+        self.assertEqual(written, 2)
+        es_fetch.search_hits.assert_called_with(
+            "test-index", None, "now-1h", None, from_millis=2
+        )
+        self.assertEqual(
+            [line["msg"] for line in self.read_lines()], ["a", "b", "c", "d"]
+        )
+        self.assertFalse(os.path.exists(self.state_path))
+
+    def test_state_of_another_export_is_refused(self):
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [hit("1", 1, msg="a"), hit("2", 2, msg="b")]
+        )
+        with self.assertRaises(IOError):
+            elasticsearch_follow.Exporter(
+                es_fetch,
+                FailingWriter(self.path, fail_after=1),
+                state_path=self.state_path,
+                batch_size=1,
+            ).export("test-index", from_time="now-1h")
+
+        for writer, index in [
+            (elasticsearch_follow.NdjsonWriter(self.path), "other-index"),
+            (elasticsearch_follow.NdjsonWriter(self.path, "gzip"), "test-index"),
+        ]:
+            exporter = elasticsearch_follow.Exporter(
+                es_fetch, writer, state_path=self.state_path
+            )
+            with self.assertRaises(ValueError):
+                exporter.export(index, from_time="now-1h")
+
+        # Neither the file nor the state of the interrupted export were touched.
+        self.assertEqual(self.read_lines(), [{"msg": "a"}])
+        self.assertTrue(os.path.exists(self.state_path))
+
+    def test_no_state_is_saved_for_writers_which_cannot_resume(self):
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [hit("1", 1, msg="a"), hit("2", 2, msg="b")]
+        )
+        writer = Mock(spec=["open", "write_batch", "settings", "close"])
+        writer.write_batch.side_effect = [None, IOError("disk full")]
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch, writer, state_path=self.state_path, batch_size=1
+        )
+
+        with self.assertRaises(IOError):
+            exporter.export("test-index")
+
+        writer.open.assert_called_once_with()
+        self.assertFalse(os.path.exists(self.state_path))
+
+    def test_csv_export_discovers_columns(self):
+        path = os.path.join(self.directory.name, "export.csv")
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [
+                hit("1", 1, msg="a", kubernetes={"pod": {"name": "pod-1"}}),
+                hit("2", 2, msg="b", tags=["x", "y"]),
+                hit("3", 3, msg="c", unknown="dropped"),
+            ]
+        )
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch, elasticsearch_follow.CsvWriter(path), batch_size=2
+        )
+
+        exporter.export("test-index")
+
+        with open(path, newline="") as export_file:
+            rows = list(csv.reader(export_file))
+        self.assertEqual(
+            rows,
+            [
+                ["kubernetes.pod.name", "msg", "tags"],
+                ["pod-1", "a", ""],
+                ["", "b", '["x","y"]'],
+                ["", "c", ""],
+            ],
+        )
+
+    @unittest.skipIf(elasticsearch_follow.export.pyarrow is None, "requires pyarrow")
+    def test_parquet_export_writes_untyped_fields_as_strings(self):
+        import pyarrow.parquet
+
+        path = os.path.join(self.directory.name, "export.parquet")
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [
+                hit("1", 1, msg="a", user=None, labels={}),
+                hit("2", 2, msg="b", user="bob", labels={"team": "x"}, code=1),
+            ]
+        )
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch,
+            elasticsearch_follow.ParquetWriter(path),
+            state_path=path + ".state",
+            batch_size=1,
+        )
+
+        exporter.export("test-index")
+
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(
+            table.to_pylist(),
+            [
+                {"msg": "a", "user": None, "labels": "{}"},
+                {"msg": "b", "user": "bob", "labels": None},
+            ],
+        )
+        self.assertFalse(exporter.state_path)
+
+    @unittest.skipIf(elasticsearch_follow.export.pyarrow is None, "requires pyarrow")
+    def test_parquet_export_with_schema(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        path = os.path.join(self.directory.name, "export.parquet")
+        es_fetch = Mock()
+        es_fetch.search_hits.return_value = iter(
+            [hit("1", 1, code=1), hit("2", 2, code="E1")]
+        )
+        schema = pyarrow.schema([("code", pyarrow.string())])
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch, elasticsearch_follow.ParquetWriter(path, schema=schema)
+        )
+
+        exporter.export("test-index")
+
+        self.assertEqual(
+            pyarrow.parquet.read_table(path).to_pylist(),
+            [{"code": "1"}, {"code": "E1"}],
+        )
+
+        es_fetch.search_hits.return_value = iter(
+            [hit("1", 1, code=1), hit("2", 2, code="E1")]
+        )
+        exporter = elasticsearch_follow.Exporter(
+            es_fetch, elasticsearch_follow.ParquetWriter(path), batch_size=1
+        )
+        with self.assertRaises(ValueError):
+            exporter.export("test-index")
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            elasticsearch_follow.NdjsonWriter(self.path, compression="zip")
+
+    def test_flatten(self):
+        self.assertEqual(
+            flatten({"a": {"b": 1, "c": {"d": 2}}, "e": {}, "f": [1]}),
+            {"a.b": 1, "a.c.d": 2, "e": {}, "f": [1]},
+        )
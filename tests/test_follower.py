@@ -69,3 +69,67 @@ class TestFollower(unittest.TestCase):
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0], "PROCESSED_line_1")
         self.assertEqual(result[1], "PROCESSED_line_3")
+
+    def test_follower_reports_number_of_lines_to_scheduler(self):
+        es_follow = Mock()
+        scheduler = Mock()
+        follower = elasticsearch_follow.Follower(
+            es_follow, "some_index", 120, scheduler=scheduler
+        )
+        es_follow.get_new_lines.return_value = [{"msg": "line_1"}, {"msg": "line_2"}]
+
+        list(follower.generator())
+        follower.wait()
+
+        scheduler.record_poll.assert_called_once_with(2)
+        scheduler.wait.assert_called_once_with()
+
+    def test_follower_prunes_once_per_poll(self):
+        es_follow = Mock()
+        follower = elasticsearch_follow.Follower(es_follow, "some_index", 120)
+        es_follow.get_new_lines.return_value = [{"msg": "line_1"}, {"msg": "line_2"}]
+
+        list(follower.generator())
+
+        es_follow.prune_before.assert_called_once()
+
+    def test_follower_processes_last_lines(self):
+        es_follow = Mock()
+        processor = Mock()
+        processor.process_line.side_effect = lambda line: line["msg"]
+        follower = elasticsearch_follow.Follower(
+            es_follow, "some_index", 120, processor=processor
+        )
+        es_follow.get_last_lines.return_value = [{"msg": "line_1"}, {"msg": "line_2"}]
+
+        result = list(follower.last_lines(2))
+
+        self.assertEqual(result, ["line_1", "line_2"])
+        es_follow.get_last_lines.assert_called_once_with("some_index", 2)
+
+    def test_follower_hands_batches_to_processor(self):
+        class BatchProcessor:
+            def __init__(self):
+                self.batches = []
+
+            def process_lines(self, lines):
+                self.batches.append(len(lines))
+                return [
+                    None if line["msg"] == "REMOVE" else line["msg"] for line in lines
+                ]
+
+        es_follow = Mock()
+        processor = BatchProcessor()
+        follower = elasticsearch_follow.Follower(
+            es_follow, "some_index", 120, processor=processor, batch_size=2
+        )
+        es_follow.get_new_lines.return_value = [
+            {"msg": "line_1"},
+            {"msg": "REMOVE"},
+            {"msg": "line_3"},
+        ]
+
+        result = list(follower.generator())
+
+        self.assertEqual(result, ["line_1", "line_3"])
+        self.assertEqual(processor.batches, [2, 1])
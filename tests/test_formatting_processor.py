@@ -60,3 +60,44 @@ class TestDefaultProcessor(unittest.TestCase):
         generator = follower.generator()
 
         self.assertEqual("2019-01-01T10:01:00 value_1 value_2 value_3", next(generator))
+
+    def test_formatting_processor_declares_referenced_fields(self):
+        processor = elasticsearch_follow.FormattingProcessor(
+            format_string="{@timestamp} {msg} {kv[nested_key][key_3]} {msg!r:>{width}}"
+        )
+
+        self.assertEqual(
+            processor.fields, ["@timestamp", "msg", "kv.nested_key.key_3", "width"]
+        )
+
+    def test_formatting_processor_dotted_fields(self):
+        processor = elasticsearch_follow.FormattingProcessor(
+            format_string="{kubernetes.pod.name} {log.level} {kubernetes.missing.name}|"
+        )
+
+        line = processor.process_line(
+            {"kubernetes": {"pod": {"name": "pod_1"}}, "log.level": "INFO"}
+        )
+
+        self.assertEqual(line, "pod_1 INFO |")
+
+    def test_formatting_processor_conversions_and_format_specs(self):
+        processor = elasticsearch_follow.FormattingProcessor(
+            format_string="{msg!r:>8}|{count:03d}|{msg:<{width}}|{unknown:>3}|{{msg}}"
+        )
+
+        line = processor.process_line({"msg": "line", "count": 7, "width": 6})
+
+        self.assertEqual(line, "  'line'|007|line  |   |{msg}")
+
+    def test_formatting_processor_missing_list_index(self):
+        processor = elasticsearch_follow.FormattingProcessor(
+            format_string="{tags[0]}-{tags[1]}"
+        )
+
+        self.assertEqual(processor.process_line({"tags": ["a"]}), "a-")
+
+    def test_formatting_processor_rejects_invalid_field_names(self):
+        for format_string in ["{kv[key}", "{kv[key]x}", "{kv..key}"]:
+            with self.assertRaises(ValueError):
+                elasticsearch_follow.FormattingProcessor(format_string=format_string)
@@ -0,0 +1,35 @@
+import unittest
+
+from elasticsearch_follow.histogram import date_histogram_interval, render_histogram
+
+
+class TestHistogram(unittest.TestCase):
+    def test_calendar_and_fixed_intervals(self):
+        self.assertEqual(
+            date_histogram_interval("month"), {"calendar_interval": "month"}
+        )
+        self.assertEqual(date_histogram_interval("1h"), {"calendar_interval": "1h"})
+        self.assertEqual(date_histogram_interval("5m"), {"fixed_interval": "5m"})
+
+    def test_render_histogram(self):
+        buckets = [
+            {"key_as_string": "10:00", "doc_count": 10},
+            {"key_as_string": "10:05", "doc_count": 0},
+            {"key_as_string": "10:10", "doc_count": 1},
+            {"key_as_string": "10:15", "doc_count": 5},
+        ]
+
+        lines = render_histogram(buckets, width=10)
+
+        self.assertEqual(
+            lines,
+            [
+                "10:00 10 ##########",
+                "10:05  0",
+                "10:10  1 #",
+                "10:15  5 #####",
+            ],
+        )
+
+    def test_render_empty_histogram(self):
+        self.assertEqual(render_histogram([]), [])
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from elasticsearch_follow import HitCache
+
+QUERY = {"query": {"bool": {"must": []}}, "size": 1000}
+
+
+class TestHitCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_only_closed_absolute_ranges_are_cacheable(self):
+        cache = HitCache(self.directory.name, min_age=3600)
+        recent = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+        self.assertTrue(cache.is_cacheable("2019-01-01T10:00:00", "2019-01-01T12:00"))
+        self.assertTrue(cache.is_cacheable(None, "2019-01-01"))
+        self.assertFalse(cache.is_cacheable("2019-01-01T10:00:00", None))
+        self.assertFalse(cache.is_cacheable("now-2d", "now-1d"))
+        self.assertFalse(cache.is_cacheable("2019-01-01", "2019-01-01||+1d"))
+        self.assertFalse(cache.is_cacheable(None, recent.isoformat()))
+
+    @patch("elasticsearch_follow.hit_cache.time.time", return_value=1546392600)
+    def test_date_only_upper_bound_covers_the_whole_day(self, _):
+        # Now is 2019-01-02T01:30Z, so 2019-01-01 ended only 90 minutes ago.
+        self.assertTrue(
+            HitCache(self.directory.name, min_age=3600).is_cacheable(None, "2019-01-01")
+        )
+        self.assertFalse(
+            HitCache(self.directory.name, min_age=7200).is_cacheable(None, "2019-01-01")
+        )
+
+    def test_strings_of_digits_are_not_cacheable(self):
+        cache = HitCache(self.directory.name)
+
+        self.assertFalse(cache.is_cacheable(None, "2019"))
+        self.assertFalse(cache.is_cacheable(None, "1546336800000"))
+        self.assertFalse(cache.is_cacheable("1546336800000", "2019-01-01"))
+
+    def test_key_ignores_page_size_and_point_in_time(self):
+        cache = HitCache(self.directory.name)
+        query_with_pit = dict(QUERY, size=10, pit={"id": "pit_1"})
+
+        self.assertEqual(
+            cache.key("uuid", "index", QUERY),
+            cache.key("uuid", "index", query_with_pit),
+        )
+        self.assertNotEqual(
+            cache.key("uuid", "index", QUERY), cache.key("other", "index", QUERY)
+        )
+        self.assertNotEqual(
+            cache.key("uuid", "index", QUERY), cache.key("uuid", "other", QUERY)
+        )
+
+    def test_pages_are_stored_once_consumed(self):
+        cache = HitCache(self.directory.name)
+        pages = [[{"_source": {"msg": "a"}}], [{"_source": {"msg": "b"}}]]
+
+        self.assertIsNone(cache.get_pages("key"))
+        self.assertEqual(list(cache.store_pages("key", iter(pages))), pages)
+        self.assertEqual(list(cache.get_pages("key")), pages)
+
+    def test_partially_consumed_pages_are_not_stored(self):
+        cache = HitCache(self.directory.name)
+        stored = cache.store_pages("key", iter([[1], [2]]))
+
+        next(stored)
+        stored.close()
+
+        self.assertIsNone(cache.get_pages("key"))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = HitCache(self.directory.name, max_bytes=10**9)
+        for key in ["aaa", "bbb", "ccc"]:
+            list(cache.store_pages(key, iter([[key]])))
+        size = os.path.getsize(os.path.join(self.directory.name, "aaa.hits.gz"))
+        os.utime(os.path.join(self.directory.name, "aaa.hits.gz"), (1, 1))
+        os.utime(os.path.join(self.directory.name, "bbb.hits.gz"), (3, 3))
+        os.utime(os.path.join(self.directory.name, "ccc.hits.gz"), (2, 2))
+
+        cache.max_bytes = 2 * size
+        cache.evict()
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            ["bbb.hits.gz", "ccc.hits.gz"],
+        )
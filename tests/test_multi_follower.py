@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+
+from dateutil import tz
+
+import elasticsearch_follow
+from tests import generate_hit_entry, generate_query_response
+
+TIMESTAMP_ONE = datetime(year=2019, month=1, day=1, hour=10, minute=1, tzinfo=tz.UTC)
+TIMESTAMP_TWO = datetime(year=2019, month=1, day=1, hour=10, minute=2, tzinfo=tz.UTC)
+
+
+def follower_returning(lines, timestamp_field="@timestamp"):
+    es_follow = Mock()
+    es_follow.timestamp_field = timestamp_field
+    es_follow.get_new_lines.return_value = lines
+    return elasticsearch_follow.Follower(es_follow, "some_index", 120)
+
+
+class TestMultiFollower(unittest.TestCase):
+    def test_lines_are_merged_by_timestamp(self):
+        first = follower_returning(
+            [
+                {"msg": "a1", "@timestamp": "2019-01-01T10:01:00Z"},
+                {"msg": "a3", "@timestamp": "2019-01-01T10:03:00Z"},
+            ]
+        )
+        second = follower_returning(
+            [
+                {"msg": "b2", "ts": "2019-01-01T10:02:00+00:00"},
+                {"msg": "b4", "ts": "2019-01-01T10:04:00"},
+            ],
+            timestamp_field="ts",
+        )
+        multi_follower = elasticsearch_follow.MultiFollower([first, second])
+
+        result = list(multi_follower.generator())
+        multi_follower.close()
+
+        self.assertEqual([line["msg"] for line in result], ["a1", "b2", "a3", "b4"])
+
+    def test_equal_timestamps_keep_source_order(self):
+        first = follower_returning([{"msg": "a", "@timestamp": "2019-01-01T10:01:00Z"}])
+        second = follower_returning(
+            [{"msg": "b", "@timestamp": "2019-01-01T10:01:00Z"}]
+        )
+        multi_follower = elasticsearch_follow.MultiFollower([first, second])
+
+        result = list(multi_follower.generator())
+
+        self.assertEqual([line["msg"] for line in result], ["a", "b"])
+
+    def test_merged_lines_are_processed(self):
+        first = follower_returning([{"msg": "a", "@timestamp": "2019-01-01T10:01:00Z"}])
+        second = follower_returning(
+            [{"msg": "REMOVE", "@timestamp": "2019-01-01T10:02:00Z"}]
+        )
+        processor = Mock()
+        processor.process_line.side_effect = lambda line: (
+            None if line["msg"] == "REMOVE" else line["msg"]
+        )
+        scheduler = Mock()
+        multi_follower = elasticsearch_follow.MultiFollower(
+            [first, second], processor=processor, scheduler=scheduler
+        )
+
+        result = list(multi_follower.generator())
+
+        self.assertEqual(result, ["a"])
+        scheduler.record_poll.assert_called_once_with(2)
+
+    def test_projected_lines_keep_their_timestamp_for_merging(self):
+        def follower_of(hits):
+            es = Mock()
+            es.search.return_value = generate_query_response(hits)
+            es.scroll.return_value = generate_query_response([])
+            es_follow = elasticsearch_follow.ElasticsearchFollow(
+                es, source_fields=["msg"]
+            )
+            return es, elasticsearch_follow.Follower(es_follow, "some_index", 120)
+
+        first_es, first = follower_of(
+            [generate_hit_entry("a2", "a2", TIMESTAMP_TWO, sort=[2, 0])]
+        )
+        second_es, second = follower_of(
+            [generate_hit_entry("b1", "b1", TIMESTAMP_ONE, sort=[1, 0])]
+        )
+        multi_follower = elasticsearch_follow.MultiFollower([first, second])
+
+        result = list(multi_follower.generator())
+        multi_follower.close()
+
+        self.assertEqual([line["msg"] for line in result], ["b1", "a2"])
+        for es in [first_es, second_es]:
+            self.assertIn(
+                "@timestamp", es.search.call_args[1]["body"]["_source"]["includes"]
+            )
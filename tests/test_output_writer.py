@@ -0,0 +1,79 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from elasticsearch_follow.output_writer import OutputWriter
+
+
+class TerminalStream(io.TextIOWrapper):
+    def isatty(self):
+        return True
+
+
+class TestOutputWriter(unittest.TestCase):
+    def test_lines_are_buffered_until_buffer_is_full(self):
+        binary_stream = io.BytesIO()
+        stream = io.TextIOWrapper(binary_stream, encoding="utf-8")
+        output = OutputWriter(stream=stream, buffer_size=12)
+
+        output.write_line("line1")
+        self.assertEqual(binary_stream.getvalue(), b"")
+
+        output.write_line("line2")
+        self.assertEqual(binary_stream.getvalue(), b"line1\nline2\n")
+
+    def test_remaining_lines_are_written_on_close(self):
+        binary_stream = io.BytesIO()
+        stream = io.TextIOWrapper(binary_stream, encoding="utf-8")
+
+        with OutputWriter(stream=stream) as output:
+            output.write_line("line1")
+            output.poll_finished()
+            self.assertEqual(binary_stream.getvalue(), b"")
+            output.write_line(None)
+
+        self.assertEqual(binary_stream.getvalue(), b"line1\nNone\n")
+
+    def test_lines_are_encoded_with_encoding_of_stream(self):
+        binary_stream = io.BytesIO()
+        stream = io.TextIOWrapper(binary_stream, encoding="latin-1")
+
+        with OutputWriter(stream=stream) as output:
+            output.write_line("äöü")
+
+        self.assertEqual(binary_stream.getvalue(), "äöü\n".encode("latin-1"))
+
+    def test_terminal_is_written_after_every_poll(self):
+        binary_stream = io.BytesIO()
+        output = OutputWriter(stream=TerminalStream(binary_stream, encoding="utf-8"))
+
+        output.write_line("line1")
+        self.assertEqual(binary_stream.getvalue(), b"")
+        output.poll_finished()
+
+        self.assertEqual(binary_stream.getvalue(), b"line1\n")
+
+    @patch("elasticsearch_follow.output_writer.time.monotonic")
+    def test_terminal_is_written_after_max_latency(self, monotonic):
+        binary_stream = io.BytesIO()
+        output = OutputWriter(
+            stream=TerminalStream(binary_stream, encoding="utf-8"), max_latency=0.5
+        )
+
+        monotonic.return_value = 10.0
+        output.write_line("line1")
+        monotonic.return_value = 10.4
+        output.write_line("line2")
+        self.assertEqual(binary_stream.getvalue(), b"")
+
+        monotonic.return_value = 10.5
+        output.write_line("line3")
+        self.assertEqual(binary_stream.getvalue(), b"line1\nline2\nline3\n")
+
+    def test_text_streams_without_buffer_are_supported(self):
+        stream = io.StringIO()
+        output = OutputWriter(stream=stream, buffer_size=0)
+
+        output.write_line("line1")
+
+        self.assertEqual(stream.getvalue(), "line1\n")
@@ -0,0 +1,86 @@
+import threading
+import unittest
+
+from elasticsearch_follow import page_queue
+from tests.async_helpers import run_async
+
+
+class TestPageQueue(unittest.TestCase):
+    def test_interleave_yields_all_pages(self):
+        pages = list(page_queue.interleave([[[1], [2]], [[3]], []], max_pending=1))
+
+        self.assertEqual(sorted(pages), [[1], [2], [3]])
+
+    def test_merge_ordered(self):
+        items = list(
+            page_queue.merge_ordered(
+                [[[1, 4], [6]], [[2, 3], [5, 7]]], key=lambda item: item
+            )
+        )
+
+        self.assertEqual(items, [1, 2, 3, 4, 5, 6, 7])
+
+    def test_concatenate_keeps_order_of_iterables(self):
+        pages = list(
+            page_queue.concatenate([[[1], [2]], [], [[3], [4]], [[5]]], max_pending=1)
+        )
+
+        self.assertEqual(pages, [[1], [2], [3], [4], [5]])
+
+    def test_failures_are_raised_in_consumer(self):
+        def failing_pages():
+            yield [1]
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            list(page_queue.interleave([failing_pages()]))
+
+    def test_producers_are_closed_when_consumer_stops(self):
+        closed = threading.Event()
+
+        def endless_pages():
+            try:
+                while True:
+                    yield [1]
+            finally:
+                closed.set()
+
+        pages = page_queue.interleave([endless_pages()], max_pending=1)
+        next(pages)
+        pages.close()
+
+        self.assertTrue(closed.is_set())
+
+    def test_prefetch_keeps_order(self):
+        pages = list(page_queue.prefetch(iter([[1], [2], [3]]), max_pending=1))
+
+        self.assertEqual(pages, [[1], [2], [3]])
+
+    def test_prefetch_async(self):
+        async def pages():
+            for page in [[1], [2], [3]]:
+                yield page
+
+        async def collect():
+            return [page async for page in page_queue.prefetch_async(pages())]
+
+        self.assertEqual(run_async(collect()), [[1], [2], [3]])
+
+    def test_prefetch_async_closes_pages_when_consumer_stops(self):
+        closed = []
+
+        async def endless_pages():
+            try:
+                while True:
+                    yield [1]
+            finally:
+                closed.append(True)
+
+        async def consume_one():
+            prefetched = page_queue.prefetch_async(endless_pages(), max_pending=1)
+            page = await prefetched.__anext__()
+            await prefetched.aclose()
+            return page
+
+        self.assertEqual(run_async(consume_one()), [1])
+        self.assertEqual(closed, [True])
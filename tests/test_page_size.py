@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import Mock
+
+import elasticsearch_follow
+
+
+def generate_hits(number, message_length):
+    return [
+        {"_id": str(i), "_source": {"msg": "x" * message_length}} for i in range(number)
+    ]
+
+
+class TestPageSize(unittest.TestCase):
+    def test_fixed_page_size(self):
+        page_size = elasticsearch_follow.PageSize(200)
+        page_size.record_page({"took": 10000}, generate_hits(200, 10))
+
+        self.assertEqual(page_size.next_size(), 200)
+
+    def test_numbers_are_converted_to_page_sizes(self):
+        as_page_size = elasticsearch_follow.page_size.as_page_size
+
+        self.assertEqual(as_page_size(None).next_size(), 1000)
+        self.assertEqual(as_page_size(200).next_size(), 200)
+        self.assertEqual(as_page_size(200.0).next_size(), 200)
+        self.assertEqual(as_page_size("200").next_size(), 200)
+        adaptive = elasticsearch_follow.AdaptivePageSize()
+        self.assertIs(as_page_size(adaptive), adaptive)
+
+        with self.assertRaises(TypeError):
+            as_page_size([200])
+        with self.assertRaises(TypeError):
+            as_page_size("many")
+        with self.assertRaises(ValueError):
+            as_page_size(0)
+
+    def test_adaptive_page_size_grows_for_small_fast_pages(self):
+        page_size = elasticsearch_follow.AdaptivePageSize(size=1000)
+
+        page_size.record_page({"took": 5}, generate_hits(1000, 10))
+        self.assertEqual(page_size.next_size(), 2000)
+
+        for _ in range(10):
+            page_size.record_page({"took": 5}, generate_hits(1000, 10))
+        self.assertEqual(page_size.next_size(), 10000)
+
+    def test_adaptive_page_size_shrinks_for_large_pages(self):
+        page_size = elasticsearch_follow.AdaptivePageSize(
+            size=1000, target_bytes=100 * 1000
+        )
+
+        page_size.record_page({"took": 5}, generate_hits(1000, 1000))
+        self.assertEqual(page_size.next_size(), 500)
+
+        for _ in range(10):
+            page_size.record_page({"took": 5}, generate_hits(500, 1000))
+        self.assertEqual(page_size.next_size(), 100)
+
+    def test_adaptive_page_size_follows_target_latency(self):
+        page_size = elasticsearch_follow.AdaptivePageSize(size=1000, target_took=600)
+
+        page_size.record_page({"took": 500}, generate_hits(1000, 10))
+
+        self.assertEqual(page_size.next_size(), 1200)
+
+    def test_page_size_is_requested_and_adapted(self):
+        es = Mock()
+        es.search.return_value = {
+            "took": 1,
+            "_scroll_id": "scroll_1",
+            "hits": {"hits": generate_hits(10, 10)},
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll_1"}
+        page_size = elasticsearch_follow.AdaptivePageSize(size=10, min_size=10)
+        es_fetch = elasticsearch_follow.ElasticsearchFetch(es, page_size=page_size)
+
+        list(es_fetch.search_hits(index="test-index"))
+        list(es_fetch.search_hits(index="test-index"))
+
+        sizes = [call[1]["body"]["size"] for call in es.search.call_args_list]
+        self.assertEqual(sizes, [10, 20])
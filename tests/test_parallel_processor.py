@@ -0,0 +1,82 @@
+import pickle
+import unittest
+from unittest.mock import Mock
+
+import elasticsearch_follow
+from elasticsearch_follow.parallel_processor import ParallelProcessor
+
+
+class UppercaseProcessor:
+    fields = ["msg"]
+
+    def process_line(self, line):
+        if line["msg"] == "REMOVE":
+            return None
+        return line["msg"].upper()
+
+
+class TestParallelProcessor(unittest.TestCase):
+    def test_batches_keep_their_order(self):
+        batches = [[{"msg": "line_{}".format(i)}] * 3 for i in range(20)]
+
+        with ParallelProcessor(
+            UppercaseProcessor(), workers=4, use_processes=False
+        ) as processor:
+            processed_batches = list(processor.process_batches(batches))
+
+        self.assertEqual(
+            processed_batches, [["LINE_{}".format(i)] * 3 for i in range(20)]
+        )
+        self.assertEqual(processor.fields, ["msg"])
+
+    def test_pending_batches_are_bounded(self):
+        taken = []
+
+        def batches():
+            for i in range(10):
+                taken.append(i)
+                yield [{"msg": "line_{}".format(i)}]
+
+        with ParallelProcessor(
+            UppercaseProcessor(), workers=2, use_processes=False, max_pending=3
+        ) as processor:
+            processed_batches = processor.process_batches(batches())
+            next(processed_batches)
+
+            self.assertLessEqual(len(taken), 3)
+            self.assertEqual(len(list(processed_batches)), 9)
+
+    def test_lines_are_processed_in_worker_processes(self):
+        lines = [{"msg": "line_{}".format(i)} for i in range(10)]
+
+        with ParallelProcessor(
+            elasticsearch_follow.FormattingProcessor("-{msg}-"), workers=2
+        ) as processor:
+            processed_lines = processor.process_lines(lines)
+
+        self.assertEqual(processed_lines, ["-line_{}-".format(i) for i in range(10)])
+
+    def test_follower_with_parallel_processor(self):
+        es_follow = Mock()
+        es_follow.get_new_lines.return_value = [
+            {"msg": "line_1"},
+            {"msg": "REMOVE"},
+            {"msg": "line_3"},
+        ]
+
+        with ParallelProcessor(
+            UppercaseProcessor(), workers=2, use_processes=False
+        ) as processor:
+            follower = elasticsearch_follow.Follower(
+                es_follow, "some_index", 120, processor=processor, batch_size=1
+            )
+            result = list(follower.generator())
+
+        self.assertEqual(result, ["LINE_1", "LINE_3"])
+
+    def test_formatting_processor_can_be_pickled(self):
+        processor = pickle.loads(
+            pickle.dumps(elasticsearch_follow.FormattingProcessor("{a.b}"))
+        )
+
+        self.assertEqual(processor.process_line({"a": {"b": "c"}}), "c")
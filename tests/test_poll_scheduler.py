@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import patch
+
+import elasticsearch_follow
+
+
+class TestPollScheduler(unittest.TestCase):
+    @patch("elasticsearch_follow.poll_scheduler.time.sleep")
+    def test_fixed_interval(self, sleep):
+        scheduler = elasticsearch_follow.PollScheduler(interval=0.5)
+
+        scheduler.record_poll(0)
+        scheduler.wait()
+
+        sleep.assert_called_once_with(0.5)
+        self.assertEqual(scheduler.interval, 0.5)
+
+    def test_adaptive_backs_off_while_idle(self):
+        scheduler = elasticsearch_follow.AdaptivePollScheduler(
+            min_interval=0.1, max_interval=0.5, backoff_factor=2.0
+        )
+
+        scheduler.record_poll(0)
+        self.assertAlmostEqual(scheduler.interval, 0.2)
+        scheduler.record_poll(0)
+        self.assertAlmostEqual(scheduler.interval, 0.4)
+        scheduler.record_poll(0)
+        self.assertAlmostEqual(scheduler.interval, 0.5)
+
+    def test_adaptive_tightens_on_new_lines(self):
+        scheduler = elasticsearch_follow.AdaptivePollScheduler(
+            min_interval=0.1, max_interval=5.0
+        )
+
+        scheduler.record_poll(0)
+        scheduler.record_poll(0)
+        scheduler.record_poll(3)
+
+        self.assertEqual(scheduler.interval, 0.1)
+
+    @patch("elasticsearch_follow.poll_scheduler.time.sleep")
+    @patch("elasticsearch_follow.poll_scheduler.time.monotonic")
+    def test_max_requests_per_second_extends_wait(self, monotonic, sleep):
+        monotonic.side_effect = [10.0, 10.1, 10.6]
+        scheduler = elasticsearch_follow.PollScheduler(
+            interval=0.1, max_requests_per_second=2
+        )
+
+        scheduler.wait()
+        scheduler.wait()
+
+        self.assertEqual(sleep.call_args_list[0][0][0], 0.1)
+        self.assertAlmostEqual(sleep.call_args_list[1][0][0], 0.4)
@@ -0,0 +1,29 @@
+import unittest
+
+import elasticsearch_follow
+from elasticsearch_follow.processing import batched, process_lines
+
+
+class LineProcessor:
+    def process_line(self, line):
+        return line["msg"].upper()
+
+
+class TestProcessing(unittest.TestCase):
+    def test_process_lines_falls_back_to_process_line(self):
+        processed_lines = process_lines(
+            LineProcessor(), [{"msg": "line_1"}, {"msg": ""}, {"msg": "line_3"}]
+        )
+
+        self.assertEqual(processed_lines, ["LINE_1", "LINE_3"])
+
+    def test_process_lines_of_formatting_processor(self):
+        processor = elasticsearch_follow.FormattingProcessor("{msg}!")
+
+        processed_lines = process_lines(processor, [{"msg": "a"}, {}])
+
+        self.assertEqual(processed_lines, ["a!", "!"])
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(batched([], 2)), [])
@@ -0,0 +1,167 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from elasticsearch_follow import RateMeter
+
+NOW = 1546336835.5  # 2019-01-01T10:00:35.5Z
+
+
+class TestRateMeter(unittest.TestCase):
+    @patch("elasticsearch_follow.rate_meter.time.time", return_value=NOW)
+    def test_only_ended_buckets_are_yielded_once(self, _):
+        es = Mock()
+        es.search.return_value = {
+            "aggregations": {
+                "histogram": {
+                    "buckets": [
+                        {"key": 1546336810000, "doc_count": 20},
+                        {"key": 1546336820000, "doc_count": 5},
+                        {"key": 1546336830000, "doc_count": 3},
+                    ]
+                }
+            }
+        }
+        rate_meter = RateMeter(es, "test-index", interval=10, window=30, settle_delay=0)
+
+        lines = list(rate_meter.generator())
+
+        self.assertEqual(
+            lines,
+            ["2019-01-01T10:00:10+00:00 2.0/s", "2019-01-01T10:00:20+00:00 0.5/s"],
+        )
+        self.assertEqual(list(rate_meter.generator()), [])
+
+        body = es.search.call_args[1]["body"]
+        self.assertEqual(body["size"], 0)
+        self.assertEqual(
+            body["query"]["bool"]["must"][0]["range"]["@timestamp"],
+            {"gte": 1546336800000, "lt": 1546336830000, "format": "epoch_millis"},
+        )
+        self.assertEqual(
+            body["aggs"]["histogram"]["date_histogram"]["fixed_interval"], "10000ms"
+        )
+
+    @patch("elasticsearch_follow.rate_meter.time.time", return_value=NOW)
+    def test_rate_split_by_terms(self, _):
+        es = Mock()
+        es.search.return_value = {
+            "aggregations": {
+                "histogram": {
+                    "buckets": [
+                        {
+                            "key": 1546336820000,
+                            "doc_count": 30,
+                            "split": {
+                                "sum_other_doc_count": 10,
+                                "buckets": [
+                                    {"key": "info", "doc_count": 15},
+                                    {"key": "error", "doc_count": 5},
+                                ],
+                            },
+                        }
+                    ]
+                }
+            }
+        }
+        rate_meter = RateMeter(
+            es,
+            "test-index",
+            query_string="app:web",
+            interval=10,
+            settle_delay=0,
+            split_field="level",
+            max_terms=2,
+        )
+
+        rates = rate_meter.poll()
+
+        self.assertEqual(
+            rates,
+            [
+                {
+                    "timestamp": 1546336820000,
+                    "rate": 3.0,
+                    "terms": {"info": 1.5, "error": 0.5, "other": 1.0},
+                }
+            ],
+        )
+        self.assertEqual(
+            rate_meter.format_rate(rates[0]),
+            "2019-01-01T10:00:20+00:00 3.0/s level=info 1.5/s level=error 0.5/s "
+            "level=other 1.0/s",
+        )
+        body = es.search.call_args[1]["body"]
+        self.assertEqual(
+            body["aggs"]["histogram"]["aggs"],
+            {"split": {"terms": {"field": "level", "size": 2}}},
+        )
+        self.assertIn(
+            {"query_string": {"query": "app:web"}}, body["query"]["bool"]["must"]
+        )
+
+    @patch("elasticsearch_follow.rate_meter.time.time")
+    def test_buckets_are_yielded_once_settled(self, time_mock):
+        es = Mock()
+        es.search.return_value = {
+            "aggregations": {
+                "histogram": {
+                    "buckets": [
+                        {"key": 1546336800000, "doc_count": 10},
+                        {"key": 1546336810000, "doc_count": 20},
+                        {"key": 1546336820000, "doc_count": 5},
+                    ]
+                }
+            }
+        }
+        rate_meter = RateMeter(es, "test-index", interval=10, window=30)
+        self.assertEqual(rate_meter.settle_delay, 20)
+
+        time_mock.return_value = NOW
+        self.assertEqual(
+            list(rate_meter.generator()),
+            ["2019-01-01T10:00:00+00:00 1.0/s"],
+        )
+
+        # A late document raised the count of the bucket which was not yet settled.
+        es.search.return_value["aggregations"]["histogram"]["buckets"][1][
+            "doc_count"
+        ] = 30
+        time_mock.return_value = NOW + 10
+        self.assertEqual(
+            list(rate_meter.generator()), ["2019-01-01T10:00:10+00:00 3.0/s"]
+        )
+
+    @patch("elasticsearch_follow.rate_meter.time.time")
+    def test_no_bucket_is_skipped_when_polls_drift(self, time_mock):
+        def search(index, body, filter_path):
+            bounds = body["aggs"]["histogram"]["date_histogram"]["extended_bounds"]
+            keys = range(bounds["min"], bounds["max"] + 1, 10000)
+            buckets = [{"key": key, "doc_count": 10} for key in keys]
+            return {"aggregations": {"histogram": {"buckets": buckets}}}
+
+        es = Mock()
+        es.search.side_effect = search
+        rate_meter = RateMeter(es, "test-index", interval=10, window=60)
+
+        timestamps = []
+        for poll in range(200):
+            # Each poll waits one interval after a query taking 0.3 seconds.
+            time_mock.return_value = NOW + poll * 10.3
+            timestamps.extend(rate["timestamp"] for rate in rate_meter.poll())
+
+        self.assertGreater(len(timestamps), 190)
+        self.assertEqual(
+            timestamps, list(range(timestamps[0], timestamps[-1] + 1, 10000))
+        )
+
+    def test_window_covers_settle_delay(self):
+        rate_meter = RateMeter(Mock(), "test-index", interval=10, settle_delay=90)
+
+        self.assertEqual(rate_meter.window, 100)
+
+    def test_no_matches(self):
+        es = Mock()
+        es.search.return_value = {}
+        rate_meter = RateMeter(es, "test-index")
+
+        self.assertEqual(rate_meter.poll(), [])
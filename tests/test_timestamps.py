@@ -0,0 +1,40 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from dateutil import tz
+
+from elasticsearch_follow.timestamps import to_epoch_millis
+
+REFERENCE_MILLIS = 1546336860000
+
+
+class TestTimestamps(unittest.TestCase):
+    def test_iso_8601_strings(self):
+        self.assertEqual(to_epoch_millis("2019-01-01T10:01:00Z"), REFERENCE_MILLIS)
+        self.assertEqual(to_epoch_millis("2019-01-01T10:01:00"), REFERENCE_MILLIS)
+        self.assertEqual(
+            to_epoch_millis("2019-01-01T10:01:00.123456Z"), REFERENCE_MILLIS + 123
+        )
+        self.assertEqual(
+            to_epoch_millis("2019-01-01T12:01:00.5+02:00"), REFERENCE_MILLIS + 500
+        )
+        self.assertEqual(to_epoch_millis("2019-01-01T05:01:00-0500"), REFERENCE_MILLIS)
+
+    def test_other_formats_fall_back_to_dateutil(self):
+        self.assertEqual(to_epoch_millis("2019-01-01T10:01:00UTC"), REFERENCE_MILLIS)
+        self.assertEqual(to_epoch_millis("Jan 1 2019 10:01:00"), REFERENCE_MILLIS)
+
+    def test_datetimes_and_numbers(self):
+        self.assertEqual(
+            to_epoch_millis(datetime(2019, 1, 1, 10, 1, tzinfo=tz.UTC)),
+            REFERENCE_MILLIS,
+        )
+        self.assertEqual(
+            to_epoch_millis(
+                datetime(2019, 1, 1, 11, 1, tzinfo=timezone(timedelta(hours=1)))
+            ),
+            REFERENCE_MILLIS,
+        )
+        self.assertEqual(to_epoch_millis(datetime(2019, 1, 1, 10, 1)), REFERENCE_MILLIS)
+        self.assertEqual(to_epoch_millis(REFERENCE_MILLIS), REFERENCE_MILLIS)
+        self.assertEqual(to_epoch_millis(float(REFERENCE_MILLIS)), REFERENCE_MILLIS)